@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+bench.py — Fixed benchmark set for the built PRG, recorded per commit in
+a JSON history and checked for regressions against the previous entry.
+
+Usage:
+    python scripts/bench.py                     # measure, compare, record
+    python scripts/bench.py --threshold 0.05    # allow 5% growth
+    python scripts/bench.py --no-record         # compare only
+    python scripts/bench.py --show              # print the history
+
+Metrics (lower is better), all on the headless C64 (scripts/c64_machine.py):
+    cycles.boot                   Main.start until it reaches Main.main_loop
+                                  (needs a SKIP_SPLASH=1 build, like test.sh)
+    cycles.matrix_rain            MatrixRain.matrix_rain_transition, whole call
+    cycles.asm_view               AsmView.asm_view_render
+    cycles.codegen.<block>_x16    codegen_run on 16 slots of one block type
+                                  with its default param (generated program
+                                  not run)
+    bytes.<segment>               bytes used in each `.pc` segment: up to the
+                                  last non-zero PRG byte or last label in it,
+                                  whichever is higher; the `.assert` limit
+                                  is shown alongside
+matrix_rain and asm_view run after codegen of DEFAULT_PROGRAM.
+
+Each run is stored under its `git describe --always --dirty` name (a rerun
+on the same commit replaces its entry) in build/bench_history.json. A
+metric fails when it exceeds the latest entry for a different commit by
+more than --threshold (default 2%), or could not be measured; the exit
+status is then 1. A segment that outgrows its limit already fails the
+build on its `.assert`.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import kick_symbols
+from c64_machine import FRAME_CYCLES, MAX_SLOTS, PRG_PATH, Machine, block_types
+from mos6502 import CPUError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(ROOT, 'build', 'bench_history.json')
+DEFAULT_THRESHOLD = 0.02
+DEFAULT_PROGRAM = (('SET_BORDER', 2), ('SET_BG', 6), ('PRINT', 0x48),
+                   ('SHOW_SPRITE', 0), ('WAIT', 1), ('LOOP_BACK', 0))
+BOOT_LIMIT = 300 * FRAME_CYCLES
+
+
+def git_describe():
+    try:
+        out = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def cycles_metrics(m):
+    """{name: cycles or None} for the fixed scenarios; None = did not finish."""
+    metrics = {}
+    sym = lambda name: kick_symbols.lookup(m.symbols, f'BLOCK_{name}')
+
+    def measure(name, fn):
+        try:
+            metrics[name] = fn()
+        except (CPUError, KeyError) as e:
+            print(f"  {name}: {e}", file=sys.stderr)
+            metrics[name] = None
+
+    def boot():
+        m.reset()
+        m.cpu.pc = m.sym('Main.start')
+        m.cpu.run(m.sym('Main.main_loop'), max_cycles=BOOT_LIMIT)
+        return m.cpu.cycles
+
+    def after_codegen(label):
+        def run():
+            m.codegen([(sym(t), p) for t, p in DEFAULT_PROGRAM], execute=False)
+            return m.call(label, max_cycles=50_000_000)
+        return run
+
+    measure('cycles.boot', boot)
+    measure('cycles.matrix_rain', after_codegen('MatrixRain.matrix_rain_transition'))
+    measure('cycles.asm_view', after_codegen('AsmView.asm_view_render'))
+
+    defaults = m.sym('BlocksData.block_param_default')
+    for name, block in sorted(block_types(m.symbols).items(), key=lambda kv: kv[1]):
+        slots = [(block, m.image[defaults + block])] * MAX_SLOTS
+        measure(f'cycles.codegen.{name}_x16',
+                lambda: m.codegen(slots, execute=False, max_cycles=1_000_000).cycles)
+    return metrics
+
+
+def segment_usage(image, symbols, src_dir=kick_symbols.SRC_DIR):
+    """[(segment, used bytes, size)] from the PRG image and label addresses."""
+    labels = sorted({v for k, v in symbols.items() if '.' in k})   # code labels
+    usage = []
+    for seg in kick_symbols.segments(src_dir):
+        data = image[seg.start:seg.end + 1]
+        last = len(data.rstrip(b'\0'))
+        in_seg = [a for a in labels if seg.start <= a <= seg.end]
+        if in_seg:
+            last = max(last, in_seg[-1] - seg.start + 1)
+        usage.append((seg, last, seg.end - seg.start + 1))
+    return usage
+
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp, path)
+
+
+def compare(metrics, baseline, threshold):
+    """[(name, value, base, change, failed)] for every measured metric."""
+    rows = []
+    for name, value in metrics.items():
+        base = baseline.get(name) if baseline else None
+        change = (value - base) / base if value is not None and base else None
+        failed = value is None or (change is not None and change > threshold)
+        rows.append((name, value, base, change, failed))
+    return rows
+
+
+def show(history):
+    recent = history[-6:]
+    names = sorted({k for e in recent for k in e['metrics']})
+    print(f"  {'':36s} " + ' '.join(f"{e['commit'][:9]:>9s}" for e in recent))
+    for name in names:
+        values = ' '.join(f"{e['metrics'].get(name, '-')!s:>9s}" for e in recent)
+        print(f"  {name:36s} {values}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the PRG and check for cycle / size regressions.')
+    parser.add_argument('--prg', default=PRG_PATH)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH)
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed growth as a fraction (default 0.02)')
+    parser.add_argument('--no-record', dest='record', action='store_false',
+                        help='do not write this run to the history')
+    parser.add_argument('--show', action='store_true', help='print the history and exit')
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    if args.show:
+        show(history)
+        return
+
+    symbols = kick_symbols.symbol_index(args.sym)
+    try:
+        machine = Machine(args.prg, symbols)
+    except (OSError, KeyError, ValueError) as e:
+        sys.exit(f"cannot load {args.prg}: {e}")
+    commit = git_describe()
+
+    metrics = cycles_metrics(machine)
+    usage = segment_usage(machine.image, symbols)
+    for seg, used, size in usage:
+        metrics[f'bytes.{seg.name}'] = used
+
+    baseline = next((e for e in reversed(history) if e['commit'] != commit), None)
+    rows = compare(metrics, baseline and baseline['metrics'], args.threshold)
+    print(f"{commit} vs {baseline['commit'] if baseline else '(no baseline)'}")
+    for name, value, base, change, failed in rows:
+        delta = f"{change:+7.2%}" if change is not None else ''
+        print(f"{'!' if failed else ' '} {name:36s} {value!s:>10s} {base!s:>10s} {delta}")
+    for seg, used, size in usage:
+        print(f"  ${seg.start:04X} {seg.name:16s} {used:6d}/{size:<6d} "
+              f"{100 * used / size:5.1f}%{'' if seg.limited else '  (no .assert)'}")
+
+    if args.record:
+        with open(args.prg, 'rb') as f:
+            prg_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+        entry = {'commit': commit,
+                 'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'prg': prg_hash, 'metrics': metrics}
+        history = [e for e in history if e['commit'] != commit] + [entry]
+        save_history(args.history, history)
+
+    failed = [name for name, *_, bad in rows if bad]
+    if failed:
+        print(f"FAIL: {', '.join(failed)}")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+c64_machine.py — Headless C64 for running the tutor's own routines
+(Codegen.codegen_run and the code it generates) without VICE.
+
+    m = Machine()                               # build/main.prg + build/main.sym
+    r = m.codegen([(BLOCK_SET_BORDER, 2), (BLOCK_PRINT, 0x41)])
+    r.code      # bytes emitted at GEN_CODE_BUF
+    r.meta      # 6-byte ASM_META_BUF entries, one per instruction
+    r.io        # [(addr, value)] VIC register writes, in order
+    r.chrout    # bytes passed to KERNAL CHROUT ($FFD2)
+
+The PRG is loaded once into a pristine image; every scenario copies that
+image back into the CPU's 64 KB bytearray (scripts/mos6502.py), writes
+the slot array and zp_slots_used, and JSRs to codegen_run. Only what the
+tutor's code paths touch is modelled:
+  - VIC registers $D000-$D02E: writes are logged and stored, reads return
+    the stored value, except the raster line ($D012 and bit 7 of $D011),
+    which follows the cycle counter on a PAL frame of 312 x 63 cycles
+  - CIA1 ports $DC00/$DC01 read $FF: no joystick or key pressed
+  - CHROUT ($FFD2) is a trap that logs A; GETIN ($FFE4) returns A = 0
+  - zp_stop_flag reads $FF once `stop_after` cycles have passed, standing
+    in for the NMI that breaks a LOOP BACK program
+There is no Kernal/BASIC ROM and there are no interrupts. Raster timing is
+only the line number from the cycle counter: no badlines, no sprite DMA.
+
+execute=False traps GEN_CODE_BUF so codegen_run returns without running
+the program it built (WAIT blocks busy-loop ~1M cycles per second).
+
+Usage:
+    python scripts/c64_machine.py border:2 print:65 --execute
+"""
+
+import argparse
+import collections
+import os
+import sys
+
+import kick_symbols
+from mos6502 import CPU, CPUError, disassemble
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRG_PATH = os.path.join(ROOT, 'build', 'main.prg')
+
+VIC_REGS = (0xD000, 0xD02E)
+VIC_CTRL1 = 0xD011
+VIC_RASTER = 0xD012
+CIA1_PORTS = (0xDC00, 0xDC01)
+LINE_CYCLES = 63
+FRAME_LINES = 312
+FRAME_CYCLES = LINE_CYCLES * FRAME_LINES     # 19656, one PAL frame
+CHROUT = 0xFFD2
+GETIN = 0xFFE4
+META_SIZE = 6
+SLOT_SIZE = 3
+MAX_SLOTS = 16
+
+CodegenResult = collections.namedtuple('CodegenResult', 'code meta io chrout cycles')
+
+
+def load_prg(path=PRG_PATH):
+    """(load address, data) of a .prg file."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if len(raw) < 3:
+        raise ValueError(f"{path}: too short for a PRG")
+    return raw[0] | (raw[1] << 8), raw[2:]
+
+
+class Machine:
+    """A CPU loaded with the tutor's PRG plus the few C64 devices it uses."""
+
+    def __init__(self, prg=PRG_PATH, symbols=None):
+        self.symbols = kick_symbols.symbol_index() if symbols is None else symbols
+        if isinstance(prg, str):
+            prg = load_prg(prg)
+        load, data = prg
+        self.image = bytearray(65536)
+        self.image[load:load + len(data)] = data
+
+        self.codegen_run = self.sym('Codegen.codegen_run')
+        self.slot_array = self.sym('SLOT_ARRAY')
+        self.gen_code_buf = self.sym('GEN_CODE_BUF')
+        self.asm_meta_buf = self.sym('ASM_META_BUF')
+        self.zp_slots_used = self.sym('zp_slots_used')
+        self.zp_cg_ptr_lo = self.sym('zp_cg_ptr_lo')
+        self.zp_inst_count = self.sym('zp_asm_inst_count')
+        self.zp_stop_flag = self.sym('zp_stop_flag')
+
+        self.cpu = CPU()
+        self.io = []
+        self.chrout = []
+        self.stop_at = None
+        self.cpu.add_write_hook(*VIC_REGS, self._vic_write)
+        self.cpu.add_read_hook(VIC_CTRL1, VIC_RASTER, self._raster)
+        self.cpu.add_read_hook(*CIA1_PORTS, lambda addr: 0xFF)
+        self.cpu.add_read_hook(self.zp_stop_flag, self.zp_stop_flag, self._stop_flag)
+        self.cpu.traps[CHROUT] = self._chrout
+        self.cpu.traps[GETIN] = self._getin
+        self.reset()
+
+    def sym(self, name):
+        return kick_symbols.lookup(self.symbols, name)
+
+    def reset(self):
+        """Restore memory to the loaded PRG and clear registers and logs."""
+        cpu = self.cpu
+        cpu.mem[:] = self.image
+        cpu.a = cpu.x = cpu.y = 0
+        cpu.sp = 0xFF
+        cpu.p = 0x24
+        cpu.cycles = 0
+        self.io.clear()
+        self.chrout.clear()
+        self.stop_at = None
+
+    # -- devices ---------------------------------------------------------
+    def _vic_write(self, addr, value):
+        self.io.append((addr, value))
+        self.cpu.mem[addr] = value
+
+    def _raster(self, addr):
+        line = self.cpu.cycles % FRAME_CYCLES // LINE_CYCLES
+        if addr == VIC_RASTER:
+            return line & 0xFF
+        return (self.cpu.mem[addr] & 0x7F) | (line >> 1 & 0x80)
+
+    def _stop_flag(self, addr):
+        if self.stop_at is not None and self.cpu.cycles >= self.stop_at:
+            self.cpu.mem[addr] = 0xFF
+        return self.cpu.mem[addr]
+
+    def _chrout(self, cpu):
+        self.chrout.append(cpu.a)
+        cpu.return_from_subroutine()
+        return True
+
+    def _getin(self, cpu):
+        cpu.a = 0
+        cpu.return_from_subroutine()
+        return True
+
+    def _return(self, cpu):
+        cpu.return_from_subroutine()
+        return True
+
+    def stub(self, addr):
+        """Make the routine at addr (or a symbol name) return as soon as it is called."""
+        if isinstance(addr, str):
+            addr = self.sym(addr)
+        self.cpu.traps[addr] = self._return
+
+    # -- scenarios -------------------------------------------------------
+    def set_slots(self, slots):
+        """Write (type, param) pairs to the slot array and zp_slots_used."""
+        if len(slots) > MAX_SLOTS:
+            raise ValueError(f"{len(slots)} slots (max {MAX_SLOTS})")
+        mem = self.cpu.mem
+        for i, (block_type, param) in enumerate(slots):
+            base = self.slot_array + i * SLOT_SIZE
+            mem[base:base + SLOT_SIZE] = bytes((block_type, param, 0))
+        mem[self.zp_slots_used] = len(slots)
+
+    def call(self, addr, max_cycles=10_000_000):
+        """JSR to addr (or a symbol name) and run until it returns; cycles used."""
+        if isinstance(addr, str):
+            addr = self.sym(addr)
+        return self.cpu.call(addr, max_cycles=max_cycles)
+
+    def codegen(self, slots, execute=True, stop_after=None, max_cycles=10_000_000):
+        """Reset, fill the slots and run codegen_run; returns a CodegenResult.
+
+        stop_after sets zp_stop_flag that many cycles into the call;
+        CPUError is raised if codegen_run has not returned after max_cycles.
+        """
+        self.reset()
+        self.set_slots(slots)
+        if stop_after is not None:
+            self.stop_at = stop_after
+        if not execute:
+            self.stub(self.gen_code_buf)
+        try:
+            cycles = self.call(self.codegen_run, max_cycles)
+        finally:
+            self.cpu.traps.pop(self.gen_code_buf, None)
+        mem = self.cpu.mem
+        end = mem[self.zp_cg_ptr_lo] | (mem[self.zp_cg_ptr_lo + 1] << 8)
+        count = mem[self.zp_inst_count]
+        meta = bytes(mem[self.asm_meta_buf:self.asm_meta_buf + count * META_SIZE])
+        return CodegenResult(bytes(mem[self.gen_code_buf:end]), meta,
+                             list(self.io), bytes(self.chrout), cycles)
+
+
+def block_types(symbols):
+    """{'border': 0, 'bg': 1, ...} from the BLOCK_* labels."""
+    types = {}
+    for name, value in symbols.items():
+        short = name.rsplit('.', 1)[-1]
+        if short.startswith('BLOCK_'):
+            types[short[len('BLOCK_'):].lower().replace('set_', '')] = value
+    return types
+
+
+def parse_slot(text, types):
+    name, _, param = text.partition(':')
+    if name not in types:
+        raise ValueError(f"unknown block {name!r} (one of {', '.join(sorted(types))})")
+    value = kick_symbols.parse_value(param) if param else 0
+    if value is None or not 0 <= value <= 0xFF:
+        raise ValueError(f"bad param {param!r} for {name}")
+    return types[name], value
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run codegen_run headlessly for a list of blocks.')
+    parser.add_argument('blocks', nargs='+',
+                        help='block[:param], e.g. border:2 print:65 wait:1 loop_back')
+    parser.add_argument('--prg', default=PRG_PATH)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH)
+    parser.add_argument('--execute', action='store_true',
+                        help='also run the generated program')
+    parser.add_argument('--stop-after', type=int,
+                        help='set zp_stop_flag after this many cycles (LOOP BACK)')
+    args = parser.parse_args()
+
+    symbols = kick_symbols.symbol_index(args.sym)
+    types = block_types(symbols)
+    try:
+        slots = [parse_slot(b, types) for b in args.blocks]
+    except ValueError as e:
+        parser.error(str(e))
+    m = Machine(args.prg, symbols)
+    try:
+        r = m.codegen(slots, execute=args.execute, stop_after=args.stop_after)
+    except CPUError as e:
+        sys.exit(f"codegen_run: {e}")
+
+    addr = m.gen_code_buf
+    while addr < m.gen_code_buf + len(r.code):
+        text, length = disassemble(m.cpu.mem, addr)
+        print(f"${addr:04X}  {m.cpu.mem[addr:addr + length].hex(' '):8s}  {text}")
+        addr += length
+    print(f"{len(r.code)} bytes, {len(r.meta) // META_SIZE} instructions, "
+          f"{r.cycles} cycles")
+    for reg, value in r.io:
+        print(f"  ${reg:04X} <- ${value:02X}")
+    if r.chrout:
+        print(f"  CHROUT {r.chrout.hex(' ')}")
+
+
+if __name__ == '__main__':
+    main()
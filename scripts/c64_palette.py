@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+c64_palette.py — C64 palettes, colour-distance metrics and cached tables.
+
+Palettes:  vice (VICE default, used for the committed assets), pepto,
+           colodore
+Metrics:   rgb       squared Euclidean RGB
+           weighted  squared RGB with integer channel weights 2:4:3
+           yuv       squared Euclidean distance in BT.601 YUV
+           lab       CIE76 delta-E (Euclidean distance in CIELAB, D65)
+
+Every palette x metric pair gets:
+  - a 16x16 palette-to-palette distance matrix (computed once per process)
+  - a 16M-entry RGB -> palette index lookup table, generated once and
+    cached under build/cache/ (override with C64_LUT_CACHE), keyed by a
+    hash of the palette and the metric name
+
+Usage:
+    python scripts/c64_palette.py            # list palettes and metrics
+    python scripts/c64_palette.py --build    # pre-generate every LUT
+"""
+
+import argparse
+import functools
+import hashlib
+import os
+
+try:
+    import numpy as np
+except ImportError:  # palettes are still importable without NumPy
+    np = None
+
+# VICE default palette (RGB values for C64 colors 0-15)
+VICE_PALETTE = [
+    (0x00, 0x00, 0x00),  # 0  Black
+    (0xFF, 0xFF, 0xFF),  # 1  White
+    (0x9F, 0x4E, 0x44),  # 2  Red
+    (0x6A, 0xBF, 0xC6),  # 3  Cyan
+    (0xA0, 0x57, 0xA3),  # 4  Purple
+    (0x5C, 0xAB, 0x5E),  # 5  Green
+    (0x50, 0x45, 0x9B),  # 6  Blue
+    (0xC9, 0xD4, 0x87),  # 7  Yellow
+    (0xA1, 0x68, 0x3C),  # 8  Orange
+    (0x6D, 0x54, 0x12),  # 9  Brown
+    (0xCB, 0x7E, 0x75),  # 10 Light Red
+    (0x62, 0x62, 0x62),  # 11 Dark Grey
+    (0x89, 0x89, 0x89),  # 12 Medium Grey
+    (0x9A, 0xE2, 0x9B),  # 13 Light Green
+    (0x88, 0x7E, 0xCB),  # 14 Light Blue
+    (0xAD, 0xAD, 0xAD),  # 15 Light Grey
+]
+
+# Philip "Pepto" Timmermann's measured palette (2001)
+PEPTO_PALETTE = [
+    (0x00, 0x00, 0x00), (0xFF, 0xFF, 0xFF), (0x68, 0x37, 0x2B), (0x70, 0xA4, 0xB2),
+    (0x6F, 0x3D, 0x86), (0x58, 0x8D, 0x43), (0x35, 0x28, 0x79), (0xB8, 0xC7, 0x6F),
+    (0x6F, 0x4F, 0x25), (0x43, 0x39, 0x00), (0x9A, 0x67, 0x59), (0x44, 0x44, 0x44),
+    (0x6C, 0x6C, 0x6C), (0x9A, 0xD2, 0x84), (0x6C, 0x5E, 0xB5), (0x95, 0x95, 0x95),
+]
+
+# Pepto's revised "Colodore" palette (2017)
+COLODORE_PALETTE = [
+    (0x00, 0x00, 0x00), (0xFF, 0xFF, 0xFF), (0x81, 0x33, 0x38), (0x75, 0xCE, 0xC8),
+    (0x8E, 0x3C, 0x97), (0x56, 0xAC, 0x4D), (0x2E, 0x2C, 0x9B), (0xED, 0xF1, 0x71),
+    (0x8E, 0x50, 0x29), (0x55, 0x38, 0x00), (0xC4, 0x6C, 0x71), (0x4A, 0x4A, 0x4A),
+    (0x7B, 0x7B, 0x7B), (0xA9, 0xFF, 0x9F), (0x70, 0x6D, 0xEB), (0xB2, 0xB2, 0xB2),
+]
+
+PALETTES = {
+    'vice': VICE_PALETTE,
+    'pepto': PEPTO_PALETTE,
+    'colodore': COLODORE_PALETTE,
+}
+
+METRICS = ('rgb', 'weighted', 'yuv', 'lab')
+
+# Integer channel weights for the 'weighted' metric
+RGB_WEIGHTS = (2, 4, 3)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LUT_CACHE_DIR = os.environ.get('C64_LUT_CACHE',
+                               os.path.join(ROOT, 'build', 'cache'))
+
+
+def get_palette(palette):
+    """Accept a palette name or a list of 16 RGB tuples."""
+    if isinstance(palette, str):
+        if palette not in PALETTES:
+            raise ValueError(f"Unknown palette {palette!r} "
+                             f"(choose from {', '.join(PALETTES)})")
+        return PALETTES[palette]
+    return [tuple(int(v) for v in rgb) for rgb in palette]
+
+
+def check_metric(metric):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r} "
+                         f"(choose from {', '.join(METRICS)})")
+
+
+# ------------------------------------------------------------
+# Colour space transforms (NumPy)
+# ------------------------------------------------------------
+# Each metric is squared Euclidean distance after a transform, so
+# one LUT builder and one distance routine serve all of them.
+
+_YUV = [[0.299, 0.587, 0.114],
+        [-0.14713, -0.28886, 0.436],
+        [0.615, -0.51499, -0.10001]]
+
+_XYZ = [[0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041]]
+
+_D65 = (0.95047, 1.0, 1.08883)
+
+
+def rgb_to_lab(rgb):
+    """(..., 3) sRGB 0-255 -> (..., 3) CIELAB (D65)."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array(_XYZ).T / np.array(_D65)
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz),
+                 xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def transform(rgb, metric):
+    """Map (..., 3) RGB into the space where `metric` is Euclidean."""
+    check_metric(metric)
+    x = np.asarray(rgb, dtype=np.float64)
+    if metric == 'rgb':
+        return x
+    if metric == 'weighted':
+        return x * np.sqrt(np.array(RGB_WEIGHTS, dtype=np.float64))
+    if metric == 'yuv':
+        return x @ np.array(_YUV).T
+    return rgb_to_lab(x)
+
+
+def pixel_distances(rgb, palette='vice', metric='rgb'):
+    """(..., 3) RGB -> (..., 16) distances to every palette entry."""
+    pal = transform(get_palette(palette), metric)
+    x = transform(rgb, metric)
+    diff = x[..., None, :] - pal
+    return (diff * diff).sum(axis=-1)
+
+
+@functools.lru_cache(maxsize=None)
+def _distance_matrix(palette, metric):
+    pal = np.array(palette)
+    if metric in ('rgb', 'weighted'):
+        # Exact integers, so ties match the per-pixel reference code
+        w = np.array(RGB_WEIGHTS if metric == 'weighted' else (1, 1, 1))
+        diff = pal[:, None, :].astype(np.int64) - pal[None, :, :]
+        m = (diff * diff * w).sum(axis=-1)
+    else:
+        m = pixel_distances(pal, palette, metric)
+    m.setflags(write=False)
+    return m
+
+
+def distance_matrix(palette='vice', metric='rgb'):
+    """16x16 palette-to-palette distance matrix, cached per process."""
+    check_metric(metric)
+    pal = tuple(get_palette(palette))
+    return _distance_matrix(pal, metric)
+
+
+# ------------------------------------------------------------
+# RGB -> palette index lookup table
+# ------------------------------------------------------------
+
+def palette_key(palette, metric='rgb'):
+    """Short stable hash of a palette + metric, used to key cache files."""
+    raw = bytes(v for rgb in get_palette(palette) for v in rgb) + metric.encode()
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def lut_path(palette='vice', metric='rgb'):
+    key = palette_key(palette, metric)
+    return os.path.join(LUT_CACHE_DIR, f'rgb_lut_{metric}_{key}.bin')
+
+
+def build_lut(palette='vice', metric='rgb'):
+    """Nearest palette index for every 24-bit RGB value, as a flat uint8 array.
+
+    rgb and weighted distances are separable per channel, so each red
+    plane is one exact integer argmin over precomputed green+blue terms.
+    yuv and lab are evaluated in float blocks of 16 red planes. Ties
+    resolve to the lowest palette index.
+    """
+    check_metric(metric)
+    palette = get_palette(palette)
+    lut = np.empty((256, 65536), dtype=np.uint8)
+
+    if metric in ('rgb', 'weighted'):
+        pal = np.array(palette, dtype=np.int64)
+        w = RGB_WEIGHTS if metric == 'weighted' else (1, 1, 1)
+        ramp = np.arange(256, dtype=np.int64)[:, None]
+        dr, dg, db = (w[ch] * (ramp - pal[:, ch]) ** 2 for ch in range(3))
+        gb = (dg[:, None, :] + db[None, :, :]).reshape(65536, len(palette))
+        for r in range(256):
+            lut[r] = (gb + dr[r]).argmin(axis=1)
+        return lut.reshape(-1)
+
+    # |x - p|^2 = |x|^2 - 2 x.p + |p|^2; |x|^2 is constant per pixel,
+    # so the argmin only needs one small matmul per block
+    pal = transform(palette, metric)
+    weights = (-2 * pal.T).astype(np.float32)
+    bias = (pal * pal).sum(axis=1).astype(np.float32)
+    g, b = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+    gb = np.stack([g.ravel(), b.ravel()], axis=1)
+    block = 16
+    for r0 in range(0, 256, block):
+        reds = np.repeat(np.arange(r0, r0 + block), 65536)[:, None]
+        rgb = np.hstack([reds, np.tile(gb, (block, 1))])
+        x = transform(rgb, metric).astype(np.float32)
+        lut[r0:r0 + block] = (x @ weights + bias).argmin(axis=1).reshape(block, 65536)
+    return lut.reshape(-1)
+
+
+def ensure_lut(palette='vice', metric='rgb'):
+    """Return the cache path for a palette/metric LUT, generating it if missing."""
+    path = lut_path(palette, metric)
+    if not os.path.exists(path):
+        if np is None:
+            raise RuntimeError("generating the RGB lookup table needs numpy")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        build_lut(palette, metric).tofile(tmp)
+        os.replace(tmp, path)   # atomic: concurrent runs never see a partial file
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def _load_lut(path):
+    return np.memmap(path, dtype=np.uint8, mode='r', shape=(256, 256, 256))
+
+
+def load_lut(palette='vice', metric='rgb'):
+    """Memory-map a palette/metric LUT as a (256, 256, 256) uint8 array."""
+    return _load_lut(ensure_lut(palette, metric))
+
+
+def map_to_palette(rgb, palette='vice', metric='rgb'):
+    """Map an (..., 3) uint8 RGB array to nearest palette indices (one gather)."""
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    lut = load_lut(palette, metric)
+    return lut[rgb[..., 0], rgb[..., 1], rgb[..., 2]]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='List C64 palettes/metrics and pre-generate lookup tables.')
+    parser.add_argument('--build', action='store_true',
+                        help='generate the LUT for every palette x metric')
+    args = parser.parse_args()
+    for name, pal in PALETTES.items():
+        print(f"{name:9s} " + ' '.join(f'{r:02X}{g:02X}{b:02X}' for r, g, b in pal))
+    print(f"metrics:  {', '.join(METRICS)}")
+    if args.build:
+        for name in PALETTES:
+            for metric in METRICS:
+                print(f"LUT {name}/{metric}: {ensure_lut(name, metric)}")
+
+
+if __name__ == '__main__':
+    main()
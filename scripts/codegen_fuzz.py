@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+codegen_fuzz.py — Check Codegen.codegen_run against a Python model of
+every emit_* routine, over enumerated and random slot programs.
+
+Usage:
+    python scripts/codegen_fuzz.py                    # all programs up to 2 slots + 100k random
+    python scripts/codegen_fuzz.py --exhaustive 3 -n 1000000 -j 8
+    python scripts/codegen_fuzz.py --seed 7 --show 5
+
+Programs hold 0..16 slots; each slot is a block type from the BLOCK_*
+labels with a param in block_param_min..block_param_max, read from the
+BlocksData tables in the loaded PRG. Every program runs on the headless
+C64 (scripts/c64_machine.py, execute=False) and is checked for:
+  crash     codegen_run hit an unsupported opcode or did not return
+  code      bytes at GEN_CODE_BUF differ from the model
+  count     zp_asm_inst_count differs from the model's instruction count
+  meta      an ASM_META_BUF entry differs from the model: source slot
+            (or $FF for SEI/CLI/RTS), MN_* id, three zero stub bytes,
+            offset of the instruction's first byte from GEN_CODE_BUF
+  overflow  the model needs more metadata than ASM_META_BUF holds
+            (480 bytes, 80 entries); checked without running anything
+
+--exhaustive N enumerates every program of 0..N slots (69**N at length N);
+-n adds random programs of 0..16 slots. Work is split into chunks over a
+process pool, each worker loading its own Machine. Failures are grouped
+by kind and the shortest programs are printed.
+"""
+
+import argparse
+import collections
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import kick_symbols
+from c64_machine import MAX_SLOTS, META_SIZE, PRG_PATH, Machine, block_types
+from mos6502 import CPUError
+
+META_CAPACITY = 480 // META_SIZE    # ASM_META_BUF size from constants.asm
+SYSTEM_SOURCE = 0xFF                # source_block_idx for SEI / CLI / RTS
+CHUNK = 2000
+MAX_CYCLES = 100_000       # a full 16-slot program needs well under 30k
+
+
+class Model:
+    """Python reference for codegen_run: slots -> (code, meta entries)."""
+
+    def __init__(self, symbols):
+        sym = lambda name: kick_symbols.lookup(symbols, name)
+        self.base = sym('GEN_CODE_BUF')
+        mn = {name: sym(f'MN_{name}') for name in (
+            'SEI', 'CLI', 'RTS', 'LDA_IMM', 'LDA_ZP', 'STA_ABS', 'STA_ZP', 'LDX_IMM',
+            'DEX', 'DEC_ZP', 'BNE_REL', 'JSR_ABS', 'JMP_ABS')}
+        self.mn = mn
+
+        def sta(reg):
+            return mn['STA_ABS'], (0x8D, reg & 0xFF, reg >> 8)
+
+        def lda(value):
+            return mn['LDA_IMM'], (0xA9, value)
+
+        chrout = sym('KERNAL_CHROUT')
+        stop = sym('zp_stop_flag')
+        self.emitters = {
+            sym('BLOCK_SET_BORDER'): lambda p: [lda(p), sta(sym('VIC_BORDER'))],
+            sym('BLOCK_SET_BG'): lambda p: [lda(p), sta(sym('VIC_BG0'))],
+            sym('BLOCK_PRINT'): lambda p: [
+                lda(p), (mn['JSR_ABS'], (0x20, chrout & 0xFF, chrout >> 8))],
+            sym('BLOCK_SHOW_SPRITE'): lambda p: [
+                lda(1), sta(sym('VIC_SPR_ENA')), lda(150), sta(sym('VIC_SPR0_X')),
+                lda(130), sta(sym('VIC_SPR0_Y')), lda(14), sta(sym('VIC_SPR0_COLOR'))],
+            sym('BLOCK_WAIT'): lambda p: [
+                lda(0), (mn['STA_ZP'], (0x85, 0xFE)),
+                lda(p * 3 & 0xFF), (mn['STA_ZP'], (0x85, 0xFF)),
+                (mn['LDX_IMM'], (0xA2, 0xFF)), (mn['DEX'], (0xCA,)),
+                (mn['BNE_REL'], (0xD0, 0xFD)),
+                (mn['DEC_ZP'], (0xC6, 0xFE)), (mn['BNE_REL'], (0xD0, 0xF7)),
+                (mn['DEC_ZP'], (0xC6, 0xFF)), (mn['BNE_REL'], (0xD0, 0xF3))],
+            sym('BLOCK_LOOP_BACK'): lambda p: [
+                (mn['LDA_ZP'], (0xA5, stop)), (mn['BNE_REL'], (0xD0, 0x03)),
+                (mn['JMP_ABS'], (0x4C, self.base & 0xFF, self.base >> 8))],
+        }
+
+    def build(self, slots):
+        """(code bytes, [6-byte meta entries]) the slots should produce."""
+        instructions = [(SYSTEM_SOURCE, self.mn['SEI'], (0x78,))]
+        for index, (block_type, param) in enumerate(slots):
+            instructions += [(index, mn, ops)
+                             for mn, ops in self.emitters[block_type](param)]
+        instructions += [(SYSTEM_SOURCE, self.mn['CLI'], (0x58,)),
+                         (SYSTEM_SOURCE, self.mn['RTS'], (0x60,))]
+        code, meta = bytearray(), []
+        for source, mn, ops in instructions:
+            meta.append(bytes((source, mn, 0, 0, 0, len(code) & 0xFF)))
+            code += bytes(ops)
+        return bytes(code), meta
+
+
+def param_ranges(machine):
+    """[(block_type, [params])] from BlocksData.block_param_min/max in the PRG."""
+    lo = machine.sym('BlocksData.block_param_min')
+    hi = machine.sym('BlocksData.block_param_max')
+    types = sorted(block_types(machine.symbols).values())
+    return [(t, list(range(machine.image[lo + t], machine.image[hi + t] + 1)))
+            for t in types]
+
+
+def all_slots(ranges):
+    return [(t, p) for t, params in ranges for p in params]
+
+
+def check(machine, model, slots):
+    """List of (kind, detail) problems for one program."""
+    code, meta = model.build(slots)
+    problems = []
+    if len(meta) > META_CAPACITY:
+        problems.append(('overflow', f"{len(meta)} entries > {META_CAPACITY}"))
+    try:
+        r = machine.codegen(slots, execute=False, max_cycles=MAX_CYCLES)
+    except CPUError as e:
+        return problems + [('crash', str(e))]
+    if r.code != code:
+        at = next((i for i, (a, b) in enumerate(zip(r.code, code)) if a != b),
+                  min(len(r.code), len(code)))
+        problems.append(('code', f"differs at +{at}: got {r.code[at:at + 4].hex(' ')}, "
+                                 f"want {code[at:at + 4].hex(' ')} "
+                                 f"({len(r.code)} vs {len(code)} bytes)"))
+    count = machine.cpu.mem[machine.zp_inst_count]
+    if count != len(meta) & 0xFF:
+        problems.append(('count', f"zp_asm_inst_count {count}, want {len(meta)}"))
+    got = [r.meta[i:i + META_SIZE] for i in range(0, len(r.meta), META_SIZE)]
+    for i, (a, b) in enumerate(zip(got, meta)):
+        if a != b:
+            problems.append(('meta', f"entry {i}: got {a.hex(' ')}, want {b.hex(' ')}"))
+            break
+    return problems
+
+
+# -- process pool -----------------------------------------------------------
+_worker = {}
+
+
+def _init(prg, sym):
+    symbols = kick_symbols.symbol_index(sym)
+    machine = Machine(prg, symbols)
+    _worker.update(machine=machine, model=Model(symbols),
+                   slots=all_slots(param_ranges(machine)))
+
+
+def programs(task, choices):
+    """Yield the slot programs of one task: an enumerated range or a seeded random batch."""
+    kind, a, b, c = task
+    if kind == 'enum':            # length a, indices b .. b+c-1 in mixed radix
+        n = len(choices)
+        for index in range(b, b + c):
+            program = []
+            for _ in range(a):
+                index, digit = divmod(index, n)
+                program.append(choices[digit])
+            yield program
+    else:                         # c random programs from seed b
+        rng = random.Random(b)
+        for _ in range(c):
+            yield [rng.choice(choices) for _ in range(rng.randint(0, MAX_SLOTS))]
+
+
+def _run(task, keep=3):
+    counts = collections.Counter()
+    examples = collections.defaultdict(list)
+    checked = 0
+    for slots in programs(task, _worker['slots']):
+        checked += 1
+        for kind, detail in check(_worker['machine'], _worker['model'], slots):
+            counts[kind] += 1
+            if len(examples[kind]) < keep:
+                examples[kind].append((slots, detail))
+    return checked, counts, dict(examples)
+
+
+def tasks(choices, exhaustive, count, seed):
+    for length in range(exhaustive + 1):
+        total = choices ** length
+        for start in range(0, total, CHUNK):
+            yield ('enum', length, start, min(CHUNK, total - start))
+    for start in range(0, count, CHUNK):
+        yield ('random', 0, seed * 1_000_003 + start, min(CHUNK, count - start))
+
+
+def describe(slots, names):
+    return ' '.join(f"{names[t]}:{p}" for t, p in slots) or '(empty)'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Fuzz codegen_run against a Python model of the emitters.')
+    parser.add_argument('--prg', default=PRG_PATH)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH)
+    parser.add_argument('--exhaustive', type=int, default=2, metavar='N',
+                        help='enumerate every program of up to N slots (default 2)')
+    parser.add_argument('-n', '--random', type=int, default=100_000,
+                        help='random programs of 0-16 slots (default 100000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--show', type=int, default=3,
+                        help='failing programs to print per kind (default 3)')
+    args = parser.parse_args()
+
+    symbols = kick_symbols.symbol_index(args.sym)
+    names = {t: n for n, t in block_types(symbols).items()}
+    try:
+        ranges = param_ranges(Machine(args.prg, symbols))
+    except (OSError, KeyError, ValueError) as e:
+        sys.exit(f"cannot load {args.prg}: {e}")
+    choices = len(all_slots(ranges))
+    for t, params in ranges:
+        print(f"{names[t]:12s} params {params[0]}..{params[-1]}")
+
+    t0 = time.monotonic()
+    checked, counts = 0, collections.Counter()
+    examples = collections.defaultdict(list)
+    with ProcessPoolExecutor(args.jobs, initializer=_init,
+                             initargs=(args.prg, args.sym)) as pool:
+        for n, c, ex in pool.map(_run, tasks(choices, args.exhaustive,
+                                             args.random, args.seed)):
+            checked += n
+            counts.update(c)
+            for kind, items in ex.items():
+                examples[kind].extend(items)
+    elapsed = time.monotonic() - t0
+
+    print(f"{checked} programs in {elapsed:.1f}s ({checked / max(elapsed, 1e-9):.0f}/s)")
+    for kind, n in counts.most_common():
+        print(f"\n{kind}: {n} programs")
+        shortest = sorted(examples[kind], key=lambda e: len(e[0]))[:args.show]
+        for slots, detail in shortest:
+            print(f"  {describe(slots, names)}\n      {detail}")
+    sys.exit(1 if counts else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+convert_anim.py — Convert an animated GIF or image sequence to a C64
+keyframe plus per-frame delta stream.
+
+Usage:
+    python scripts/convert_anim.py anim.gif build/anim/
+    python scripts/convert_anim.py "frames/*.png" build/anim/ --mode hires
+    python scripts/convert_anim.py anim.gif build/anim/ --loop --report anim.json
+
+Frames are streamed: each one is read, encoded with convert_splash.py
+(same --mode/--palette/--metric/--encoder/--dither options) and diffed
+against the previous frame, so only two encoded frames (about 10 KB
+each) are held at a time, never the whole animation.
+
+Outputs:
+    <output_dir>/splash_*.bin     first frame, the normal convert_splash files
+    <output_dir>/anim_delta.bin   delta stream for every following frame
+
+Delta stream format
+-------------------
+Offsets address the mode's output files laid end to end: for multicolor
+the bitmap is 0-7999, screen RAM 8000-8999 and color RAM 9000-9999
+(hires: bitmap + screen, 9000 bytes; fli: bitmap, 8 screen banks, color
+RAM, 17192 bytes).
+
+    stream = frame* $FE
+    frame  = bg run* $00
+    bg     = $00-$0F  new background colour ($D021)
+             $FF      background unchanged
+    run    = count (1-255), offset lo, offset hi, count new bytes
+
+Changed bytes separated by at most MERGE_GAP unchanged bytes share one
+run: re-writing a 1-2 byte gap is cheaper than another 3-byte run header
+in both stream size and apply time. With --loop a final frame returns
+the last frame to the first so the animation can repeat.
+
+Budget
+------
+Every frame is costed with a simple (zp),y apply loop (see
+APPLY_CYCLES) against one PAL frame of 19656 cycles minus the 25 bitmap
+badlines and --reserve cycles for other per-frame work (music, IRQs).
+Frames that do not fit are flagged, with the number of video frames
+their update would need.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+import convert_splash
+from c64_palette import METRICS, PALETTES
+from pack_asset import CYCLES_PER_FRAME
+
+DELTA_NAME = 'anim_delta.bin'
+END_OF_STREAM = 0xFE
+BG_UNCHANGED = 0xFF
+MAX_RUN = 255
+MERGE_GAP = 2
+
+BADLINE_CYCLES = 25 * 40       # cycles stolen by the VIC-II on bitmap badlines
+
+# Estimated 6502 cycles to apply one delta frame:
+#   frame: read the bg byte, optionally store $D021, read the terminator
+#   run:   read count + offset, form the destination pointer, loop setup
+#   byte:  lda (src),y  sta (dst),y  iny  dex  bne
+APPLY_CYCLES = {'frame': 25, 'run': 40, 'byte': 18}
+
+
+def iter_frames(source):
+    """Yield (PIL image, duration ms or None) for a GIF, image, directory or glob."""
+    if os.path.isfile(source):
+        with Image.open(source) as img:
+            for frame in ImageSequence.Iterator(img):
+                yield frame.convert('RGB'), frame.info.get('duration')
+        return
+    paths = convert_splash.find_inputs(source)
+    if not paths:
+        raise FileNotFoundError(f"No images match {source!r}")
+    for path in paths:
+        with Image.open(path) as img:
+            yield img.convert('RGB'), None
+
+
+def encode_frame(img, options):
+    """Encode one frame; returns (combined uint8 array, (bitmap, screen, color, bg_color))."""
+    mode = options['mode']
+    img = convert_splash.fit_image(img, convert_splash.MODES[mode]['size'])
+    bitmap, screen, color, bg_color = convert_splash.encode(
+        img, 'numpy', options['palette'], options['metric'], options['encoder'],
+        options['dither'], options['strength'], mode)
+    parts = [bytes(p) for p in (bitmap, screen, color) if p is not None]
+    return np.frombuffer(b''.join(parts), dtype=np.uint8), (bitmap, screen, color,
+                                                            bg_color)
+
+
+def delta_runs(prev, cur, gap=MERGE_GAP):
+    """Changed bytes of cur against prev as [(offset, bytes)], run-grouped."""
+    changed = np.flatnonzero(prev != cur)
+    if not len(changed):
+        return []
+    breaks = np.flatnonzero(np.diff(changed) > gap + 1) + 1
+    starts = changed[np.r_[0, breaks]]
+    ends = changed[np.r_[breaks - 1, len(changed) - 1]] + 1
+    runs = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        for offset in range(start, end, MAX_RUN):
+            stop = min(offset + MAX_RUN, end)
+            runs.append((offset, cur[offset:stop].tobytes()))
+    return runs
+
+
+def frame_bytes(bg_color, runs):
+    """Serialise one delta frame (bg is None when unchanged)."""
+    out = bytearray((BG_UNCHANGED if bg_color is None else bg_color,))
+    for offset, data in runs:
+        out += bytes((len(data), offset & 0xFF, offset >> 8))
+        out += data
+    out.append(0)
+    return bytes(out)
+
+
+def apply_deltas(state, stream):
+    """Replay a delta stream over a keyframe; yields (state copy, bg or None) per frame."""
+    state = bytearray(state)
+    i = 0
+    while stream[i] != END_OF_STREAM:
+        bg = stream[i]
+        i += 1
+        while stream[i]:
+            count, offset = stream[i], stream[i + 1] | (stream[i + 2] << 8)
+            state[offset:offset + count] = stream[i + 3:i + 3 + count]
+            i += 3 + count
+        i += 1
+        yield bytes(state), None if bg == BG_UNCHANGED else bg
+
+
+def frame_cost(runs):
+    """(bytes written, estimated apply cycles) for one delta frame."""
+    written = sum(len(data) for _, data in runs)
+    cycles = (APPLY_CYCLES['frame'] + APPLY_CYCLES['run'] * len(runs)
+              + APPLY_CYCLES['byte'] * written)
+    return written, cycles
+
+
+def frame_budget(reserve=0):
+    """Cycles available for a delta update in one PAL frame (compared with
+    frame_cost, which includes the per-frame overhead), and the bytes a
+    frame could write in them."""
+    cycles = CYCLES_PER_FRAME - BADLINE_CYCLES - reserve
+    return cycles, (cycles - APPLY_CYCLES['frame']) // APPLY_CYCLES['byte']
+
+
+def convert_anim(source, output_dir, mode='multicolor', palette='vice',
+                 metric='rgb', encoder='greedy', dither='none', strength=48,
+                 loop=False, reserve=0, gap=MERGE_GAP):
+    """Stream frames from source into a keyframe and delta stream.
+
+    Returns the per-frame report rows.
+    """
+    if convert_splash.np is None:
+        raise RuntimeError("convert_anim needs numpy")
+    options = {'mode': mode, 'palette': palette, 'metric': metric,
+               'encoder': encoder, 'dither': dither, 'strength': strength}
+    budget_cycles, budget_bytes = frame_budget(reserve)
+    os.makedirs(output_dir, exist_ok=True)
+    delta_path = os.path.join(output_dir, DELTA_NAME)
+    tmp = f'{delta_path}.{os.getpid()}.tmp'
+
+    rows = []
+    first = prev = None
+    prev_bg = None
+
+    def add_frame(out, cur, bg_color, duration):
+        runs = delta_runs(prev, cur, gap)
+        new_bg = bg_color if bg_color != prev_bg else None
+        data = frame_bytes(new_bg, runs)
+        out.write(data)
+        written, cycles = frame_cost(runs)
+        rows.append({'frame': len(rows) + 1, 'runs': len(runs),
+                     'changed': int((prev != cur).sum()), 'written': written,
+                     'stream_bytes': len(data), 'cycles': cycles,
+                     'fits': cycles <= budget_cycles,
+                     'frames_needed': -(-cycles // budget_cycles),
+                     'duration_ms': duration})
+
+    try:
+        with open(tmp, 'wb') as out:
+            for img, duration in iter_frames(source):
+                cur, (bitmap, screen, color, bg_color) = encode_frame(img, options)
+                if first is None:
+                    first, first_bg = cur, bg_color
+                    convert_splash.write_outputs(output_dir, bitmap, screen, color, mode)
+                else:
+                    add_frame(out, cur, bg_color, duration)
+                prev, prev_bg = cur, bg_color
+            if first is None:
+                raise ValueError(f"{source!r} has no frames")
+            if loop and rows:
+                add_frame(out, first, first_bg, None)
+            out.write(bytes((END_OF_STREAM,)))
+        os.replace(tmp, delta_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    print(f"Keyframe written to {output_dir} "
+          f"({', '.join(n for n in convert_splash.MODES[mode]['files'] if n)})")
+    print(f"Delta stream: {delta_path} ({os.path.getsize(delta_path)} bytes, "
+          f"{len(rows)} frames)")
+    print(f"Budget per PAL frame: {budget_cycles} cycles, "
+          f"~{budget_bytes} changed bytes")
+    return rows
+
+
+def print_report(rows):
+    print(f"{'frame':>5s} {'runs':>5s} {'changed':>7s} {'written':>7s} "
+          f"{'stream':>6s} {'cycles':>7s}  fit")
+    for r in rows:
+        fit = 'ok' if r['fits'] else f"OVER ({r['frames_needed']} frames)"
+        print(f"{r['frame']:5d} {r['runs']:5d} {r['changed']:7d} {r['written']:7d} "
+              f"{r['stream_bytes']:6d} {r['cycles']:7d}  {fit}")
+    over = sum(not r['fits'] for r in rows)
+    if rows:
+        worst = max(rows, key=lambda r: r['cycles'])
+        print(f"{over} of {len(rows)} frames over budget; worst is frame "
+              f"{worst['frame']} ({worst['cycles']} cycles)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert an animated GIF or image sequence to C64 frame deltas.')
+    parser.add_argument('input', help='animated GIF, image, directory or glob')
+    parser.add_argument('output_dir', help='directory for the keyframe and deltas')
+    parser.add_argument('--mode', choices=tuple(convert_splash.MODES),
+                        default='multicolor')
+    parser.add_argument('--palette', choices=tuple(PALETTES), default='vice')
+    parser.add_argument('--metric', choices=METRICS, default='rgb')
+    parser.add_argument('--encoder', choices=convert_splash.ENCODERS,
+                        default='greedy')
+    parser.add_argument('--dither', choices=convert_splash.DITHERS, default='none')
+    parser.add_argument('--strength', type=float, default=48)
+    parser.add_argument('--loop', action='store_true',
+                        help='append a delta from the last frame back to the first')
+    parser.add_argument('--reserve', type=int, default=0,
+                        help='cycles per frame kept for other work (music, IRQs)')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write the per-frame report as JSON')
+    args = parser.parse_args()
+
+    rows = convert_anim(args.input, args.output_dir, args.mode, args.palette,
+                        args.metric, args.encoder, args.dither, args.strength,
+                        args.loop, args.reserve)
+    print_report(rows)
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        convert_splash.write_atomic(args.report, json.dumps(rows, indent=2).encode())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+decode_splash.py — Render C64 bitmap data back to a PNG (what the VIC-II
+will show) and measure it against the source image, without VICE.
+
+Usage:
+    python scripts/decode_splash.py assets/ -o build/splash_preview.png
+    python scripts/decode_splash.py assets/ --source docs/c64_tutor_splash_main.png.png \\
+        --error-map build/splash_error.png
+    python scripts/decode_splash.py build/hires/ --mode hires --scale 2
+
+The input directory holds the files convert_splash.py writes for --mode
+(multicolor: splash_bitmap.bin / splash_screen.bin / splash_color.bin).
+The background colour is not stored in the .bin files; pass --bg (the
+value convert_splash.py prints).
+
+Decoding is vectorized: np.unpackbits splits the bitmap into pixel bits,
+each cell's colour slots are gathered from screen / color RAM, and one
+palette gather produces the 320x200 RGB image (multicolor pixels are
+two hires pixels wide).
+
+--source computes the CIE76 delta-E of every pixel against the source
+image (resized exactly as the converter does), prints mean / 95th
+percentile / max, and --error-map writes it as a black-red-yellow-white
+heatmap.
+
+Library use:
+    from decode_splash import decode_dir, render, error_map
+"""
+
+import argparse
+import os
+
+import numpy as np
+from PIL import Image
+
+import c64_palette
+import convert_splash
+from c64_palette import PALETTES
+
+# Heatmap ramp: (delta-E fraction of the scale, RGB)
+HEAT_STOPS = ((0.0, (0, 0, 0)), (0.33, (200, 0, 0)),
+              (0.66, (255, 200, 0)), (1.0, (255, 255, 255)))
+
+
+def load_bins(directory, mode='multicolor'):
+    """Read a mode's (bitmap, screen, color) files; None for files the mode lacks."""
+    data = []
+    for name in convert_splash.MODES[mode]['files']:
+        if name is None:
+            data.append(None)
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            data.append(f.read())
+    return tuple(data)
+
+
+def decode(bitmap, screen, color=None, bg_color=0, mode='multicolor'):
+    """Palette index of every pixel, (200, 160) or (200, 320) for hires."""
+    return convert_splash.MODES[mode]['decode'](bitmap, screen, color, bg_color)
+
+
+def render(indices, palette='vice'):
+    """Palette indices -> (200, 320, 3) uint8 RGB, wide pixels doubled."""
+    pal = np.array(c64_palette.get_palette(palette), dtype=np.uint8)
+    rgb = pal[indices]
+    return np.repeat(rgb, 320 // indices.shape[1], axis=1)
+
+
+def decode_dir(directory, mode='multicolor', bg_color=0, palette='vice'):
+    """Decode a directory of .bin files; returns (indices, PIL image 320x200)."""
+    indices = decode(*load_bins(directory, mode), bg_color=bg_color, mode=mode)
+    return indices, Image.fromarray(render(indices, palette))
+
+
+def error_map(source, indices, palette='vice'):
+    """Per-pixel CIE76 delta-E between a source image and decoded indices.
+
+    source is a PIL image or path; it is resized to the indices'
+    resolution with convert_splash.fit_image().
+    """
+    if not isinstance(source, Image.Image):
+        source = Image.open(source)
+    h, w = indices.shape
+    src = np.asarray(convert_splash.fit_image(source, (w, h)), dtype=np.uint8)
+    pal = c64_palette.rgb_to_lab(c64_palette.get_palette(palette))
+    diff = c64_palette.rgb_to_lab(src) - pal[indices]
+    return np.sqrt((diff * diff).sum(axis=-1))
+
+
+def error_stats(err):
+    return {'mean': float(err.mean()), 'p95': float(np.percentile(err, 95)),
+            'max': float(err.max())}
+
+
+def heatmap(err, scale=None):
+    """Delta-E array -> (200, 320, 3) uint8 heatmap; scale is the white point."""
+    scale = scale or max(float(err.max()), 1e-9)
+    t = np.clip(err / scale, 0, 1)
+    stops = np.array([s for s, _ in HEAT_STOPS])
+    colours = np.array([c for _, c in HEAT_STOPS], dtype=np.float64)
+    rgb = np.stack([np.interp(t, stops, colours[:, ch]) for ch in range(3)], axis=-1)
+    return np.repeat(rgb.astype(np.uint8), 320 // err.shape[1], axis=1)
+
+
+def save_png(path, rgb, scale=1):
+    img = Image.fromarray(rgb)
+    if scale > 1:
+        img = img.resize((img.width * scale, img.height * scale), Image.NEAREST)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    img.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Render C64 bitmap .bin files to PNG and compare with the source.')
+    parser.add_argument('input_dir', help='directory holding the .bin files')
+    parser.add_argument('-o', '--output', default='splash_preview.png',
+                        help='decoded PNG (default: splash_preview.png)')
+    parser.add_argument('--mode', choices=tuple(convert_splash.MODES),
+                        default='multicolor')
+    parser.add_argument('--bg', type=int, default=0,
+                        help='background colour index (multicolor / fli)')
+    parser.add_argument('--palette', choices=tuple(PALETTES), default='vice')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='integer upscale for the written PNGs')
+    parser.add_argument('--source', help='source image to measure against')
+    parser.add_argument('--error-map', metavar='PNG',
+                        help='write the per-pixel delta-E heatmap (needs --source)')
+    parser.add_argument('--error-scale', type=float,
+                        help='delta-E shown as white in the heatmap (default: max)')
+    args = parser.parse_args()
+    if args.error_map and not args.source:
+        parser.error("--error-map needs --source")
+
+    indices, img = decode_dir(args.input_dir, args.mode, args.bg, args.palette)
+    save_png(args.output, np.asarray(img), args.scale)
+    print(f"Written: {args.output} ({img.width}x{img.height}"
+          f"{f' x{args.scale}' if args.scale > 1 else ''})")
+
+    if args.source:
+        err = error_map(args.source, indices, args.palette)
+        stats = error_stats(err)
+        print(f"delta-E vs {args.source}: mean {stats['mean']:.2f}, "
+              f"p95 {stats['p95']:.2f}, max {stats['max']:.2f}")
+        if args.error_map:
+            save_png(args.error_map, heatmap(err, args.error_scale), args.scale)
+            print(f"Written: {args.error_map}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+image_diff.py — Compare VICE screenshots against golden PNGs as arrays.
+
+Usage:
+    python scripts/image_diff.py build/test_golden.png build/test_last.png
+    python scripts/image_diff.py a.png b.png --region 32 35 320 200
+    python scripts/image_diff.py a.png b.png --palette vice --mask-border \\
+        --heatmap build/test_diff.png --json build/test_diff.json
+    python scripts/image_diff.py --dir goldens/ tmp/ --max-percent 0.5
+
+A single pair prints one line in the format the shell scripts parse:
+    DIFF <differing pixels> <compared pixels>
+    SIZE_MISMATCH
+    ERROR
+--dir compares every PNG in the golden directory with the same name in
+the actual directory on a thread pool (PNG decode and the NumPy compare
+release the GIL), printing `name: DIFF N TOTAL` per pair.
+
+Pixels are equal when:
+  - default: every RGB channel is within --tolerance (0 = exact, like
+    the old per-pixel GetPixel loop)
+  - --palette NAME: both map to the same C64 colour index (c64_palette
+    LUT, --metric), so palette and filter differences between VICE
+    builds don't count
+--region X Y W H crops both images first (W/H of 0 = whole image).
+--mask-border leaves out everything outside the 320x200 text screen,
+which starts at (32, 35) in VICE's 384x272 PAL screenshots (another
+capture size: --screen-origin); masked pixels are not in the total
+either. With --region the origin is taken relative to the crop.
+
+--heatmap writes the actual image dimmed to grey with differing pixels
+in red; --json writes the report (one object, or a list with --dir).
+--max-percent makes the exit status 1 when any pair differs by more.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import c64_palette
+
+SCREEN_SIZE = (320, 200)    # visible text screen inside the border
+SCREEN_ORIGIN = (32, 35)    # its top-left pixel in a VICE PAL screenshot
+
+
+def load(path, region=None):
+    """(H, W, 3) uint8 RGB array, cropped to region (x, y, w, h) if given."""
+    with Image.open(path) as img:
+        rgb = np.asarray(img.convert('RGB'))
+    if region and region[2] > 0 and region[3] > 0:
+        x, y, w, h = region
+        if x + w > rgb.shape[1] or y + h > rgb.shape[0]:
+            raise ValueError(f"region {region} outside {rgb.shape[1]}x{rgb.shape[0]} image")
+        rgb = rgb[y:y + h, x:x + w]
+    return rgb
+
+
+def border_mask(shape, origin=SCREEN_ORIGIN):
+    """Boolean (H, W) mask, True inside the 320x200 screen at origin (x, y),
+    clipped to the image."""
+    x, y = origin
+    mask = np.zeros(shape[:2], dtype=bool)
+    mask[max(y, 0):max(y + SCREEN_SIZE[1], 0), max(x, 0):max(x + SCREEN_SIZE[0], 0)] = True
+    return mask
+
+
+def diff_mask(a, b, tolerance=0, palette=None, metric='rgb'):
+    """Boolean (H, W) array, True where the pixels count as different."""
+    if palette:
+        return (c64_palette.map_to_palette(a, palette, metric)
+                != c64_palette.map_to_palette(b, palette, metric))
+    if tolerance:
+        delta = np.abs(a.astype(np.int16) - b.astype(np.int16))
+        return (delta > tolerance).any(axis=2)
+    return (a != b).any(axis=2)
+
+
+def heatmap(actual, diff, mask=None):
+    """RGB array: actual in dim grey, differing pixels red, masked area darker."""
+    grey = (actual.astype(np.uint16) @ np.array([77, 150, 29], dtype=np.uint16)) >> 8
+    grey = (grey * 2 // 5).astype(np.uint8)
+    if mask is not None:
+        grey[~mask] //= 3
+    out = np.repeat(grey[:, :, None], 3, axis=2)
+    out[diff] = (255, 0, 0)
+    return out
+
+
+def compare(golden, actual, region=None, tolerance=0, palette=None, metric='rgb',
+            mask_border=False, screen_origin=SCREEN_ORIGIN, heatmap_path=None):
+    """Report dict: status, diff, total, percent, bbox (x0, y0, x1, y1) or None."""
+    report = {'golden': golden, 'actual': actual, 'status': 'ERROR',
+              'diff': None, 'total': None, 'percent': None, 'bbox': None}
+    try:
+        a, b = load(golden, region), load(actual, region)
+    except (OSError, ValueError) as e:
+        report['error'] = str(e)
+        return report
+    if a.shape != b.shape:
+        report['status'] = 'SIZE_MISMATCH'
+        report['error'] = f"{a.shape[1]}x{a.shape[0]} vs {b.shape[1]}x{b.shape[0]}"
+        return report
+    diff = diff_mask(a, b, tolerance, palette, metric)
+    mask = None
+    if mask_border:
+        x, y = screen_origin
+        if region and region[2] > 0 and region[3] > 0:
+            x, y = x - region[0], y - region[1]
+        mask = border_mask(a.shape, (x, y))
+    if mask is not None:
+        diff &= mask
+    total = int(mask.sum()) if mask is not None else diff.size
+    count = int(diff.sum())
+    ys, xs = np.nonzero(diff)
+    report.update(status='DIFF', diff=count, total=total,
+                  percent=round(100.0 * count / total, 4) if total else 0.0,
+                  bbox=[int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())]
+                  if count else None)
+    if heatmap_path:
+        os.makedirs(os.path.dirname(os.path.abspath(heatmap_path)), exist_ok=True)
+        Image.fromarray(heatmap(b, diff, mask)).save(heatmap_path)
+        report['heatmap'] = heatmap_path
+    return report
+
+
+def compare_dirs(golden_dir, actual_dir, heatmap_dir=None, jobs=None, **options):
+    """compare() every *.png in golden_dir with its namesake in actual_dir."""
+    names = sorted(n for n in os.listdir(golden_dir) if n.lower().endswith('.png'))
+
+    def one(name):
+        heat = os.path.join(heatmap_dir, name) if heatmap_dir else None
+        return compare(os.path.join(golden_dir, name), os.path.join(actual_dir, name),
+                       heatmap_path=heat, **options)
+
+    with ThreadPoolExecutor(max_workers=jobs or min(32, (os.cpu_count() or 1) + 4)) as pool:
+        return list(pool.map(one, names))
+
+
+def status_line(report):
+    if report['status'] == 'DIFF':
+        return f"DIFF {report['diff']} {report['total']}"
+    return report['status']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pixel-diff screenshots against golden PNGs.')
+    parser.add_argument('golden', help='golden PNG (or directory with --dir)')
+    parser.add_argument('actual', help='actual PNG (or directory with --dir)')
+    parser.add_argument('--dir', action='store_true',
+                        help='compare every PNG in the two directories')
+    parser.add_argument('--region', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'))
+    parser.add_argument('--tolerance', type=int, default=0,
+                        help='max per-channel RGB difference still counted equal')
+    parser.add_argument('--palette', choices=sorted(c64_palette.PALETTES),
+                        help='compare C64 palette indices')
+    parser.add_argument('--metric', default='rgb', choices=c64_palette.METRICS,
+                        help='palette metric (default rgb)')
+    parser.add_argument('--mask-border', action='store_true',
+                        help='ignore pixels outside the 320x200 screen')
+    parser.add_argument('--screen-origin', type=int, nargs=2, metavar=('X', 'Y'),
+                        default=SCREEN_ORIGIN,
+                        help='top-left of the screen in the capture (default 32 35)')
+    parser.add_argument('--heatmap', help='diff heatmap PNG (a directory with --dir)')
+    parser.add_argument('--json', help='write the report as JSON')
+    parser.add_argument('--max-percent', type=float,
+                        help='exit 1 if any pair differs by more than this')
+    parser.add_argument('-j', '--jobs', type=int)
+    args = parser.parse_args()
+
+    options = dict(region=args.region, tolerance=args.tolerance, palette=args.palette,
+                   metric=args.metric, mask_border=args.mask_border,
+                   screen_origin=tuple(args.screen_origin))
+    if args.dir:
+        reports = compare_dirs(args.golden, args.actual, args.heatmap, args.jobs, **options)
+        for r in reports:
+            print(f"{os.path.basename(r['golden'])}: {status_line(r)}")
+    else:
+        reports = [compare(args.golden, args.actual, heatmap_path=args.heatmap, **options)]
+        print(status_line(reports[0]))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports if args.dir else reports[0], f, indent=2)
+    if args.max_percent is not None and any(
+            r['status'] != 'DIFF' or r['percent'] > args.max_percent for r in reports):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -62,34 +62,9 @@ summary() {
 # If crop_w/h are 0, compares whole images.
 # Returns: "DIFF N TOTAL" or "SIZE_MISMATCH" or "ERROR"
 pixel_diff_region() {
-    local a_win; a_win=$(cygpath -w "$1")
-    local b_win; b_win=$(cygpath -w "$2")
     local cx="${3:-0}" cy="${4:-0}" cw="${5:-0}" ch="${6:-0}"
-    local a_ps="${a_win//\\/\\\\}"
-    local b_ps="${b_win//\\/\\\\}"
-    powershell.exe -NoProfile -Command "
-Add-Type -AssemblyName System.Drawing
-try {
-    \$a = [System.Drawing.Bitmap]::FromFile('${a_ps}')
-    \$b = [System.Drawing.Bitmap]::FromFile('${b_ps}')
-    if ($cw -gt 0 -and $ch -gt 0) {
-        \$rect = New-Object System.Drawing.Rectangle($cx, $cy, $cw, $ch)
-        \$a = \$a.Clone(\$rect, \$a.PixelFormat)
-        \$b = \$b.Clone(\$rect, \$b.PixelFormat)
-    }
-    if (\$a.Width -ne \$b.Width -or \$a.Height -ne \$b.Height) {
-        Write-Output 'SIZE_MISMATCH'
-    } else {
-        \$diff = 0
-        for (\$y = 0; \$y -lt \$a.Height; \$y++) {
-            for (\$x = 0; \$x -lt \$a.Width; \$x++) {
-                if (\$a.GetPixel(\$x,\$y) -ne \$b.GetPixel(\$x,\$y)) { \$diff++ }
-            }
-        }
-        Write-Output \"DIFF \$diff \$(\$a.Width * \$a.Height)\"
-    }
-} catch { Write-Output 'ERROR' }
-" 2>/dev/null | tr -d '\r\n' && echo
+    python "$ROOT/scripts/image_diff.py" "$1" "$2" --region "$cx" "$cy" "$cw" "$ch" \
+        2>/dev/null || echo "ERROR"
 }
 
 # ── pixel_diff: whole-image comparison ───────────────────────
@@ -117,7 +92,7 @@ eval_diff_result() {
                 fi
             fi ;;
         "ERROR")
-            warn "Image loading error for $label — check cygpath and file existence" ;;
+            warn "Image loading error for $label — check file existence" ;;
         *)
             warn "Unexpected diff result for $label: $dr" ;;
     esac
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+kick_symbols.py — Read KickAssembler symbol files and the segment layout
+declared in src/*.asm.
+
+    parse_sym(path)           build/main.sym (written by -symbolfile)
+                              -> {name: value}, namespaced as
+                              'Codegen.codegen_run'
+    source_labels(src_dir)    `.label NAME = value` lines in the sources,
+                              same naming; works before anything is built
+    symbol_index()            both merged (.sym wins), cached in memory and
+                              in build/symbols.json; reparsed only when the
+                              mtime/size of the .sym or a source changes
+    segments(src_dir)         every `.pc = $XXXX "Name"` with the limit
+                              from the `.assert "...", * <= $YYYY, true`
+                              that closes it (or the next segment's start)
+
+Usage:
+    python scripts/kick_symbols.py                 # segment table
+    python scripts/kick_symbols.py --sym build/main.sym codegen_run
+    python scripts/kick_symbols.py Main.state_palette zp_joy_edge
+"""
+
+import argparse
+import collections
+import glob
+import json
+import os
+import re
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, 'src')
+SYM_PATH = os.path.join(ROOT, 'build', 'main.sym')
+CACHE_PATH = os.path.join(ROOT, 'build', 'symbols.json')
+
+# end is inclusive; limited is False when the end was inferred from the
+# next segment rather than an .assert
+Segment = collections.namedtuple('Segment', 'name start end file limited')
+
+_LABEL = re.compile(r'^\s*\.(?:label|const|var)\s+([A-Za-z_]\w*)\s*=\s*([^\s/;]+)')
+_NAMESPACE = re.compile(r'^\s*\.namespace\s+(\w+)\s*\{')
+_FILENAMESPACE = re.compile(r'^\s*\.filenamespace\s+(\w+)')
+_PC = re.compile(r'^\s*\.pc\s*=\s*(\$[0-9A-Fa-f]+|\d+)\s*(?:"([^"]*)")?')
+_ASSERT_LIMIT = re.compile(r'^\s*\.assert\s+"[^"]*"\s*,\s*\*\s*<=\s*(\$[0-9A-Fa-f]+|\d+)')
+
+
+def parse_value(text):
+    """'$1F' / '%101' / '42' -> int; None for anything else (expressions)."""
+    try:
+        if text.startswith('$'):
+            return int(text[1:], 16)
+        if text.startswith('%'):
+            return int(text[1:], 2)
+        return int(text)
+    except ValueError:
+        return None
+
+
+def parse_sym(path=SYM_PATH):
+    """Parse a KickAssembler .sym file into {qualified name: value}."""
+    symbols = {}
+    scope = []
+    with open(path) as f:
+        for line in f:
+            m = _NAMESPACE.match(line)
+            if m:
+                scope.append(m.group(1))
+                continue
+            if line.strip() == '}' and scope:
+                scope.pop()
+                continue
+            m = _LABEL.match(line)
+            if m:
+                value = parse_value(m.group(2))
+                if value is not None:
+                    symbols['.'.join(scope + [m.group(1)])] = value
+    return symbols
+
+
+def _source_files(src_dir):
+    return sorted(glob.glob(os.path.join(src_dir, '*.asm')))
+
+
+def source_labels(src_dir=SRC_DIR):
+    """Numeric `.label` definitions from the sources, namespaced like parse_sym()."""
+    labels = {}
+    for path in _source_files(src_dir):
+        namespace = None
+        with open(path) as f:
+            for line in f:
+                m = _FILENAMESPACE.match(line)
+                if m:
+                    namespace = m.group(1)
+                    continue
+                m = _LABEL.match(line)
+                if m:
+                    value = parse_value(m.group(2))
+                    if value is not None:
+                        name = m.group(1)
+                        labels[f'{namespace}.{name}' if namespace else name] = value
+    return labels
+
+
+def segments(src_dir=SRC_DIR):
+    """All .pc segments in the sources, sorted by start address."""
+    found = []
+    for path in _source_files(src_dir):
+        with open(path) as f:
+            for line in f:
+                m = _PC.match(line)
+                if m:
+                    found.append([m.group(2) or f'${parse_value(m.group(1)):04X}',
+                                  parse_value(m.group(1)), None,
+                                  os.path.basename(path)])
+                    continue
+                m = _ASSERT_LIMIT.match(line)
+                if m and found and found[-1][3] == os.path.basename(path):
+                    found[-1][2] = parse_value(m.group(1)) - 1
+    found.sort(key=lambda s: s[1])
+    result = []
+    for i, (name, start, end, file) in enumerate(found):
+        limited = end is not None
+        if not limited:
+            end = found[i + 1][1] - 1 if i + 1 < len(found) else 0xFFFF
+        result.append(Segment(name, start, end, file, limited))
+    return result
+
+
+def _stamps(sym_path, src_dir):
+    """{path: [mtime_ns, size]} for every file the index is built from."""
+    paths = _source_files(src_dir)
+    if os.path.exists(sym_path):
+        paths.append(sym_path)
+    stamps = {}
+    for path in paths:
+        st = os.stat(path)
+        stamps[os.path.abspath(path)] = [st.st_mtime_ns, st.st_size]
+    return stamps
+
+
+_index_memo = {}
+
+
+def symbol_index(sym_path=SYM_PATH, src_dir=SRC_DIR, cache_path=CACHE_PATH):
+    """{qualified name: value} from source `.label` lines and the .sym file.
+
+    The .sym values overwrite the source ones, and code labels (which
+    only the .sym has) are added. The result is kept per process and
+    written to cache_path; both are reused while every input file keeps
+    its mtime and size, so a rebuild invalidates them and a rerun does
+    not parse anything.
+    """
+    stamps = _stamps(sym_path, src_dir)
+    key = (os.path.abspath(sym_path), os.path.abspath(src_dir))
+    memo = _index_memo.get(key)
+    if memo and memo[0] == stamps:
+        return memo[1]
+    symbols = None
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('stamps') == stamps:
+                symbols = cached['symbols']
+        except (OSError, ValueError, KeyError):
+            pass
+    if symbols is None:
+        symbols = source_labels(src_dir)
+        if os.path.exists(sym_path):
+            symbols.update(parse_sym(sym_path))
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp = f'{cache_path}.{os.getpid()}.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump({'stamps': stamps, 'symbols': symbols}, f)
+                os.replace(tmp, cache_path)
+            except OSError:
+                pass
+    _index_memo[key] = (stamps, symbols)
+    return symbols
+
+
+def lookup(symbols, name):
+    """Find a symbol by exact qualified name or by unique short name.
+
+    A short name defined in several scopes with the same value (e.g. a
+    constant seen both at the root of the .sym and in the sources) is
+    not ambiguous.
+    """
+    if name in symbols:
+        return symbols[name]
+    hits = {v for k, v in symbols.items() if k.rsplit('.', 1)[-1] == name}
+    if len(hits) == 1:
+        return hits.pop()
+    raise KeyError(f"{name!r} is {'ambiguous' if hits else 'not defined'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Show the segment layout or look up KickAssembler symbols.')
+    parser.add_argument('names', nargs='*', help='symbols to look up')
+    parser.add_argument('--sym', default=SYM_PATH,
+                        help='symbol file (default: build/main.sym, '
+                             'falls back to .label lines in src/)')
+    args = parser.parse_args()
+
+    if not args.names:
+        for s in segments():
+            kind = 'assert' if s.limited else 'next'
+            print(f"${s.start:04X}-${s.end:04X}  {s.name:16s} {s.file:18s} ({kind})")
+        return
+    symbols = symbol_index(args.sym)
+    for name in args.names:
+        print(f"{name} = ${lookup(symbols, name):04X}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+mos6502.py — Table-driven NMOS 6502 core with cycle counting, I/O hooks
+and PC traps, for running C64 code headlessly from the Python tools.
+
+    cpu = CPU()
+    cpu.load(0x9000, data)
+    cpu.add_write_hook(0xD400, 0xD41C, lambda addr, value: ...)
+    cpu.traps[0xFFD2] = lambda cpu: ... or True   # True = handled, skip opcode
+    cpu.call(0xC000, a=0)                         # JSR and run until it returns
+
+OPCODES holds (mnemonic, mode, cycles, page_penalty) for every opcode:
+all documented instructions plus the stable undocumented ones SID
+players use (LAX, SAX, DCP, ISC, SLO, RLA, SRE, RRA, ANC, ALR, ARR, SBX,
+multi-byte NOPs). The remaining unstable / JAM opcodes raise CPUError.
+Cycle counts include page-crossing and taken-branch penalties; dummy
+reads and writes of read-modify-write instructions are not modelled.
+
+cpu.tracer, if set, is called as tracer(cpu, opcode, ea) before every
+instruction executes (ea is the effective address, None for implied /
+accumulator modes).
+
+disassemble(mem, addr) returns (text, length) from the same table.
+"""
+
+C_FLAG, Z_FLAG, I_FLAG, D_FLAG, B_FLAG, U_FLAG, V_FLAG, N_FLAG = (
+    0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80)
+
+# Addressing modes
+(IMP, ACC, IMM, ZP, ZPX, ZPY, ABS, ABX, ABY, IND, IZX, IZY, REL) = range(13)
+MODE_NAMES = ('imp', 'acc', 'imm', 'zp', 'zpx', 'zpy', 'abs', 'abx', 'aby',
+              'ind', 'izx', 'izy', 'rel')
+MODE_SIZE = (1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 2, 2, 2)
+ABSOLUTE_MODES = (ABS, ABX, ABY, IND)
+
+RETURN_SENTINEL = 0x0000     # call() returns when PC reaches this address
+
+
+class CPUError(Exception):
+    pass
+
+
+def _table():
+    t = [None] * 256
+
+    def op(name, *entries):
+        for code, mode, cycles, *penalty in entries:
+            t[code] = (name, mode, cycles, 1 if penalty else 0)
+
+    # Standard operand groups: imm zp zpx abs abx* aby* izx izy*
+    def alu(name, base):
+        op(name, (base + 0x09, IMM, 2), (base + 0x05, ZP, 3), (base + 0x15, ZPX, 4),
+           (base + 0x0D, ABS, 4), (base + 0x1D, ABX, 4, 1), (base + 0x19, ABY, 4, 1),
+           (base + 0x01, IZX, 6), (base + 0x11, IZY, 5, 1))
+
+    def shift(name, base):
+        op(name, (base + 0x0A, ACC, 2), (base + 0x06, ZP, 5), (base + 0x16, ZPX, 6),
+           (base + 0x0E, ABS, 6), (base + 0x1E, ABX, 7))
+
+    def rmw_combo(name, base):     # undocumented read-modify-write + ALU
+        op(name, (base + 0x07, ZP, 5), (base + 0x17, ZPX, 6), (base + 0x0F, ABS, 6),
+           (base + 0x1F, ABX, 7), (base + 0x1B, ABY, 7), (base + 0x03, IZX, 8),
+           (base + 0x13, IZY, 8))
+
+    alu('ORA', 0x00); alu('AND', 0x20); alu('EOR', 0x40); alu('ADC', 0x60)
+    alu('LDA', 0xA0); alu('CMP', 0xC0); alu('SBC', 0xE0)
+    op('STA', (0x85, ZP, 3), (0x95, ZPX, 4), (0x8D, ABS, 4), (0x9D, ABX, 5),
+       (0x99, ABY, 5), (0x81, IZX, 6), (0x91, IZY, 6))
+    shift('ASL', 0x00); shift('ROL', 0x20); shift('LSR', 0x40); shift('ROR', 0x60)
+    op('LDX', (0xA2, IMM, 2), (0xA6, ZP, 3), (0xB6, ZPY, 4), (0xAE, ABS, 4),
+       (0xBE, ABY, 4, 1))
+    op('LDY', (0xA0, IMM, 2), (0xA4, ZP, 3), (0xB4, ZPX, 4), (0xAC, ABS, 4),
+       (0xBC, ABX, 4, 1))
+    op('STX', (0x86, ZP, 3), (0x96, ZPY, 4), (0x8E, ABS, 4))
+    op('STY', (0x84, ZP, 3), (0x94, ZPX, 4), (0x8C, ABS, 4))
+    op('CPX', (0xE0, IMM, 2), (0xE4, ZP, 3), (0xEC, ABS, 4))
+    op('CPY', (0xC0, IMM, 2), (0xC4, ZP, 3), (0xCC, ABS, 4))
+    op('INC', (0xE6, ZP, 5), (0xF6, ZPX, 6), (0xEE, ABS, 6), (0xFE, ABX, 7))
+    op('DEC', (0xC6, ZP, 5), (0xD6, ZPX, 6), (0xCE, ABS, 6), (0xDE, ABX, 7))
+    op('BIT', (0x24, ZP, 3), (0x2C, ABS, 4))
+    op('JMP', (0x4C, ABS, 3), (0x6C, IND, 5))
+    op('JSR', (0x20, ABS, 6))
+    for name, code in (('BPL', 0x10), ('BMI', 0x30), ('BVC', 0x50), ('BVS', 0x70),
+                       ('BCC', 0x90), ('BCS', 0xB0), ('BNE', 0xD0), ('BEQ', 0xF0)):
+        op(name, (code, REL, 2))
+    for name, code, cycles in (
+            ('BRK', 0x00, 7), ('RTI', 0x40, 6), ('RTS', 0x60, 6),
+            ('PHP', 0x08, 3), ('PLP', 0x28, 4), ('PHA', 0x48, 3), ('PLA', 0x68, 4),
+            ('CLC', 0x18, 2), ('SEC', 0x38, 2), ('CLI', 0x58, 2), ('SEI', 0x78, 2),
+            ('CLV', 0xB8, 2), ('CLD', 0xD8, 2), ('SED', 0xF8, 2),
+            ('DEY', 0x88, 2), ('TXA', 0x8A, 2), ('TYA', 0x98, 2), ('TXS', 0x9A, 2),
+            ('TAY', 0xA8, 2), ('TAX', 0xAA, 2), ('TSX', 0xBA, 2), ('INY', 0xC8, 2),
+            ('DEX', 0xCA, 2), ('INX', 0xE8, 2), ('NOP', 0xEA, 2)):
+        op(name, (code, IMP, cycles))
+
+    # Undocumented, stable
+    rmw_combo('SLO', 0x00); rmw_combo('RLA', 0x20); rmw_combo('SRE', 0x40)
+    rmw_combo('RRA', 0x60); rmw_combo('DCP', 0xC0); rmw_combo('ISC', 0xE0)
+    op('LAX', (0xA7, ZP, 3), (0xB7, ZPY, 4), (0xAF, ABS, 4), (0xBF, ABY, 4, 1),
+       (0xA3, IZX, 6), (0xB3, IZY, 5, 1), (0xAB, IMM, 2))
+    op('SAX', (0x87, ZP, 3), (0x97, ZPY, 4), (0x8F, ABS, 4), (0x83, IZX, 6))
+    op('ANC', (0x0B, IMM, 2), (0x2B, IMM, 2))
+    op('ALR', (0x4B, IMM, 2))
+    op('ARR', (0x6B, IMM, 2))
+    op('SBX', (0xCB, IMM, 2))
+    op('SBC', (0xEB, IMM, 2))
+    op('NOP', *[(c, IMP, 2) for c in (0x1A, 0x3A, 0x5A, 0x7A, 0xDA, 0xFA)],
+       *[(c, IMM, 2) for c in (0x80, 0x82, 0x89, 0xC2, 0xE2)],
+       *[(c, ZP, 3) for c in (0x04, 0x44, 0x64)],
+       *[(c, ZPX, 4) for c in (0x14, 0x34, 0x54, 0x74, 0xD4, 0xF4)],
+       (0x0C, ABS, 4),
+       *[(c, ABX, 4, 1) for c in (0x1C, 0x3C, 0x5C, 0x7C, 0xDC, 0xFC)])
+    return tuple(t)
+
+
+OPCODES = _table()
+
+BRANCH_FLAGS = {'BPL': (N_FLAG, 0), 'BMI': (N_FLAG, N_FLAG),
+                'BVC': (V_FLAG, 0), 'BVS': (V_FLAG, V_FLAG),
+                'BCC': (C_FLAG, 0), 'BCS': (C_FLAG, C_FLAG),
+                'BNE': (Z_FLAG, 0), 'BEQ': (Z_FLAG, Z_FLAG)}
+
+
+def disassemble(mem, addr):
+    """One instruction at addr -> (text, length); '.byte $xx' for unknown opcodes."""
+    op = mem[addr & 0xFFFF]
+    entry = OPCODES[op]
+    if entry is None:
+        return f'.byte ${op:02X}', 1
+    name, mode, _, _ = entry
+    lo = mem[(addr + 1) & 0xFFFF]
+    word = lo | (mem[(addr + 2) & 0xFFFF] << 8)
+    operand = {
+        IMP: '', ACC: ' A', IMM: f' #${lo:02X}', ZP: f' ${lo:02X}',
+        ZPX: f' ${lo:02X},X', ZPY: f' ${lo:02X},Y', ABS: f' ${word:04X}',
+        ABX: f' ${word:04X},X', ABY: f' ${word:04X},Y', IND: f' (${word:04X})',
+        IZX: f' (${lo:02X},X)', IZY: f' (${lo:02X}),Y',
+        REL: f' ${(addr + 2 + (lo - 256 if lo & 0x80 else lo)) & 0xFFFF:04X}',
+    }[mode]
+    return name + operand, MODE_SIZE[mode]
+
+
+class CPU:
+    """NMOS 6502 with a flat 64 KB memory, hooks and traps."""
+
+    def __init__(self, memory=None):
+        self.mem = bytearray(65536) if memory is None else memory
+        self.a = self.x = self.y = 0
+        self.sp = 0xFF
+        self.p = U_FLAG | I_FLAG
+        self.pc = 0
+        self.cycles = 0
+        self.read_hooks = {}
+        self.write_hooks = {}
+        self._hooked_read = bytearray(256)
+        self._hooked_write = bytearray(256)
+        self.traps = {}
+        self.tracer = None
+        self._dispatch = {name: getattr(self, f'_op_{name}')
+                          for name in {e[0] for e in OPCODES if e}}
+
+    # -- memory -------------------------------------------------------
+    def load(self, addr, data):
+        self.mem[addr:addr + len(data)] = data
+
+    def add_read_hook(self, start, end, fn):
+        """fn(addr) -> value replaces reads of start..end (inclusive)."""
+        for addr in range(start, end + 1):
+            self.read_hooks[addr] = fn
+            self._hooked_read[addr >> 8] = 1
+
+    def add_write_hook(self, start, end, fn):
+        """fn(addr, value) is called instead of storing to start..end (inclusive)."""
+        for addr in range(start, end + 1):
+            self.write_hooks[addr] = fn
+            self._hooked_write[addr >> 8] = 1
+
+    def read(self, addr):
+        if self._hooked_read[addr >> 8]:
+            fn = self.read_hooks.get(addr)
+            if fn is not None:
+                return fn(addr) & 0xFF
+        return self.mem[addr]
+
+    def write(self, addr, value):
+        if self._hooked_write[addr >> 8]:
+            fn = self.write_hooks.get(addr)
+            if fn is not None:
+                fn(addr, value)
+                return
+        self.mem[addr] = value
+
+    def read_word(self, addr):
+        return self.read(addr) | (self.read((addr + 1) & 0xFFFF) << 8)
+
+    # -- stack ----------------------------------------------------------
+    def push(self, value):
+        self.mem[0x100 | self.sp] = value & 0xFF
+        self.sp = (self.sp - 1) & 0xFF
+
+    def pull(self):
+        self.sp = (self.sp + 1) & 0xFF
+        return self.mem[0x100 | self.sp]
+
+    def return_from_subroutine(self):
+        """Perform an RTS (for traps that emulate a subroutine)."""
+        lo = self.pull()
+        self.pc = ((self.pull() << 8) | lo) + 1 & 0xFFFF
+        self.cycles += 6
+
+    # -- execution -----------------------------------------------------
+    def _address(self, mode):
+        """Effective address and page-cross flag; advances PC past the operand."""
+        pc = self.pc
+        mem = self.mem
+        if mode == IMP or mode == ACC:
+            self.pc = pc + 1 & 0xFFFF
+            return None, 0
+        if mode == IMM:
+            self.pc = pc + 2 & 0xFFFF
+            return pc + 1 & 0xFFFF, 0
+        lo = mem[pc + 1 & 0xFFFF]
+        if mode == ZP:
+            self.pc = pc + 2 & 0xFFFF
+            return lo, 0
+        if mode == ZPX:
+            self.pc = pc + 2 & 0xFFFF
+            return (lo + self.x) & 0xFF, 0
+        if mode == ZPY:
+            self.pc = pc + 2 & 0xFFFF
+            return (lo + self.y) & 0xFF, 0
+        if mode == REL:
+            self.pc = pc + 2 & 0xFFFF
+            return (self.pc + (lo - 256 if lo & 0x80 else lo)) & 0xFFFF, 0
+        if mode == IZX:
+            self.pc = pc + 2 & 0xFFFF
+            z = (lo + self.x) & 0xFF
+            return mem[z] | (mem[(z + 1) & 0xFF] << 8), 0
+        if mode == IZY:
+            self.pc = pc + 2 & 0xFFFF
+            base = mem[lo] | (mem[(lo + 1) & 0xFF] << 8)
+            ea = (base + self.y) & 0xFFFF
+            return ea, (base ^ ea) >> 8 != 0
+        word = lo | (mem[pc + 2 & 0xFFFF] << 8)
+        self.pc = pc + 3 & 0xFFFF
+        if mode == ABS:
+            return word, 0
+        if mode == ABX:
+            ea = (word + self.x) & 0xFFFF
+            return ea, (word ^ ea) >> 8 != 0
+        if mode == ABY:
+            ea = (word + self.y) & 0xFFFF
+            return ea, (word ^ ea) >> 8 != 0
+        # IND: JMP ($xxFF) wraps within the page (NMOS bug)
+        hi_addr = (word & 0xFF00) | ((word + 1) & 0xFF)
+        return self.read(word) | (self.read(hi_addr) << 8), 0
+
+    def step(self):
+        """Execute one instruction (or a trap); returns cycles used."""
+        start = self.cycles
+        trap = self.traps.get(self.pc)
+        if trap is not None and trap(self):
+            return self.cycles - start
+        op = self.mem[self.pc]
+        entry = OPCODES[op]
+        if entry is None:
+            raise CPUError(f"unsupported opcode ${op:02X} at ${self.pc:04X}")
+        name, mode, cycles, penalty = entry
+        pc = self.pc
+        ea, crossed = self._address(mode)
+        if self.tracer is not None:
+            next_pc, self.pc = self.pc, pc
+            self.tracer(self, op, ea)
+            self.pc = next_pc
+        self.cycles += cycles + (penalty and crossed)
+        self._dispatch[name](mode, ea)
+        return self.cycles - start
+
+    def run(self, until, max_cycles=10_000_000):
+        """Step until PC == until; raises CPUError if max_cycles pass first."""
+        limit = self.cycles + max_cycles
+        while self.pc != until:
+            if self.cycles > limit:
+                raise CPUError(f"no return to ${until:04X} within {max_cycles} cycles "
+                               f"(PC ${self.pc:04X})")
+            self.step()
+
+    def call(self, addr, a=None, x=None, y=None, max_cycles=10_000_000):
+        """JSR to addr and run until it returns; returns cycles used."""
+        if a is not None:
+            self.a = a & 0xFF
+        if x is not None:
+            self.x = x & 0xFF
+        if y is not None:
+            self.y = y & 0xFF
+        ret = (RETURN_SENTINEL - 1) & 0xFFFF
+        self.push(ret >> 8)
+        self.push(ret)
+        self.pc = addr
+        start = self.cycles
+        self.run(RETURN_SENTINEL, max_cycles)
+        return self.cycles - start
+
+    # -- flag helpers ----------------------------------------------------
+    def _nz(self, v):
+        self.p = (self.p & 0x7D) | (v & 0x80) | (0 if v else Z_FLAG)
+        return v
+
+    def _set(self, flag, on):
+        self.p = self.p | flag if on else self.p & ~flag
+
+    def _adc(self, v):
+        a, c = self.a, self.p & C_FLAG
+        t = a + v + c
+        if self.p & D_FLAG:
+            lo = (a & 0x0F) + (v & 0x0F) + c
+            if lo > 9:
+                lo += 6
+            hi = (a >> 4) + (v >> 4) + (lo > 0x0F)
+            self._set(Z_FLAG, not t & 0xFF)
+            self._set(N_FLAG, hi & 0x08)
+            self._set(V_FLAG, ~(a ^ v) & (a ^ (hi << 4)) & 0x80)
+            if hi > 9:
+                hi += 6
+            self._set(C_FLAG, hi > 0x0F)
+            self.a = ((hi << 4) | (lo & 0x0F)) & 0xFF
+            return
+        self._set(V_FLAG, ~(a ^ v) & (a ^ t) & 0x80)
+        self._set(C_FLAG, t > 0xFF)
+        self.a = self._nz(t & 0xFF)
+
+    def _sbc(self, v):
+        if not self.p & D_FLAG:
+            self._adc(v ^ 0xFF)
+            return
+        a, borrow = self.a, 1 - (self.p & C_FLAG)
+        t = a - v - borrow
+        lo = (a & 0x0F) - (v & 0x0F) - borrow
+        hi = (a >> 4) - (v >> 4)
+        if lo & 0x10:
+            lo -= 6
+            hi -= 1
+        if hi & 0x10:
+            hi -= 6
+        self._set(V_FLAG, (a ^ v) & (a ^ t) & 0x80)
+        self._set(C_FLAG, t >= 0)
+        self._nz(t & 0xFF)
+        self.a = ((hi << 4) | (lo & 0x0F)) & 0xFF
+
+    def _compare(self, reg, v):
+        t = reg - v
+        self._set(C_FLAG, t >= 0)
+        self._nz(t & 0xFF)
+
+    def _modify(self, mode, ea, fn):
+        """Read-modify-write on A or memory; returns the new value."""
+        if mode == ACC:
+            self.a = fn(self.a)
+            return self.a
+        v = fn(self.read(ea))
+        self.write(ea, v)
+        return v
+
+    def _asl(self, v):
+        self._set(C_FLAG, v & 0x80)
+        return self._nz((v << 1) & 0xFF)
+
+    def _lsr(self, v):
+        self._set(C_FLAG, v & 1)
+        return self._nz(v >> 1)
+
+    def _rol(self, v):
+        c = self.p & C_FLAG
+        self._set(C_FLAG, v & 0x80)
+        return self._nz(((v << 1) | c) & 0xFF)
+
+    def _ror(self, v):
+        c = self.p & C_FLAG
+        self._set(C_FLAG, v & 1)
+        return self._nz((v >> 1) | (c << 7))
+
+    # -- instructions ------------------------------------------------------
+    def _op_LDA(self, mode, ea): self.a = self._nz(self.read(ea))
+    def _op_LDX(self, mode, ea): self.x = self._nz(self.read(ea))
+    def _op_LDY(self, mode, ea): self.y = self._nz(self.read(ea))
+    def _op_STA(self, mode, ea): self.write(ea, self.a)
+    def _op_STX(self, mode, ea): self.write(ea, self.x)
+    def _op_STY(self, mode, ea): self.write(ea, self.y)
+    def _op_ORA(self, mode, ea): self.a = self._nz(self.a | self.read(ea))
+    def _op_AND(self, mode, ea): self.a = self._nz(self.a & self.read(ea))
+    def _op_EOR(self, mode, ea): self.a = self._nz(self.a ^ self.read(ea))
+    def _op_ADC(self, mode, ea): self._adc(self.read(ea))
+    def _op_SBC(self, mode, ea): self._sbc(self.read(ea))
+    def _op_CMP(self, mode, ea): self._compare(self.a, self.read(ea))
+    def _op_CPX(self, mode, ea): self._compare(self.x, self.read(ea))
+    def _op_CPY(self, mode, ea): self._compare(self.y, self.read(ea))
+    def _op_ASL(self, mode, ea): self._modify(mode, ea, self._asl)
+    def _op_LSR(self, mode, ea): self._modify(mode, ea, self._lsr)
+    def _op_ROL(self, mode, ea): self._modify(mode, ea, self._rol)
+    def _op_ROR(self, mode, ea): self._modify(mode, ea, self._ror)
+    def _op_INC(self, mode, ea): self._modify(mode, ea, lambda v: self._nz(v + 1 & 0xFF))
+    def _op_DEC(self, mode, ea): self._modify(mode, ea, lambda v: self._nz(v - 1 & 0xFF))
+    def _op_INX(self, mode, ea): self.x = self._nz(self.x + 1 & 0xFF)
+    def _op_INY(self, mode, ea): self.y = self._nz(self.y + 1 & 0xFF)
+    def _op_DEX(self, mode, ea): self.x = self._nz(self.x - 1 & 0xFF)
+    def _op_DEY(self, mode, ea): self.y = self._nz(self.y - 1 & 0xFF)
+    def _op_TAX(self, mode, ea): self.x = self._nz(self.a)
+    def _op_TAY(self, mode, ea): self.y = self._nz(self.a)
+    def _op_TXA(self, mode, ea): self.a = self._nz(self.x)
+    def _op_TYA(self, mode, ea): self.a = self._nz(self.y)
+    def _op_TSX(self, mode, ea): self.x = self._nz(self.sp)
+    def _op_TXS(self, mode, ea): self.sp = self.x
+    def _op_PHA(self, mode, ea): self.push(self.a)
+    def _op_PHP(self, mode, ea): self.push(self.p | B_FLAG | U_FLAG)
+    def _op_PLA(self, mode, ea): self.a = self._nz(self.pull())
+    def _op_PLP(self, mode, ea): self.p = (self.pull() & ~B_FLAG) | U_FLAG
+    def _op_CLC(self, mode, ea): self.p &= ~C_FLAG
+    def _op_SEC(self, mode, ea): self.p |= C_FLAG
+    def _op_CLI(self, mode, ea): self.p &= ~I_FLAG
+    def _op_SEI(self, mode, ea): self.p |= I_FLAG
+    def _op_CLV(self, mode, ea): self.p &= ~V_FLAG
+    def _op_CLD(self, mode, ea): self.p &= ~D_FLAG
+    def _op_SED(self, mode, ea): self.p |= D_FLAG
+    def _op_NOP(self, mode, ea): pass
+
+    def _op_BIT(self, mode, ea):
+        v = self.read(ea)
+        self.p = (self.p & 0x3D) | (v & 0xC0) | (0 if v & self.a else Z_FLAG)
+
+    def _branch(self, mode, ea):
+        flag, want = BRANCH_FLAGS[OPCODES[self.mem[self.pc - 2 & 0xFFFF]][0]]
+        if self.p & flag == want:
+            self.cycles += 1 + ((self.pc ^ ea) >> 8 != 0)
+            self.pc = ea
+
+    _op_BPL = _op_BMI = _op_BVC = _op_BVS = _branch
+    _op_BCC = _op_BCS = _op_BNE = _op_BEQ = _branch
+
+    def _op_JMP(self, mode, ea): self.pc = ea
+
+    def _op_JSR(self, mode, ea):
+        ret = self.pc - 1 & 0xFFFF
+        self.push(ret >> 8)
+        self.push(ret)
+        self.pc = ea
+
+    def _op_RTS(self, mode, ea):
+        lo = self.pull()
+        self.pc = ((self.pull() << 8) | lo) + 1 & 0xFFFF
+
+    def _op_RTI(self, mode, ea):
+        self.p = (self.pull() & ~B_FLAG) | U_FLAG
+        lo = self.pull()
+        self.pc = (self.pull() << 8) | lo
+
+    def _op_BRK(self, mode, ea):
+        ret = self.pc + 1 & 0xFFFF
+        self.push(ret >> 8)
+        self.push(ret)
+        self.push(self.p | B_FLAG | U_FLAG)
+        self.p |= I_FLAG
+        self.pc = self.read_word(0xFFFE)
+
+    # undocumented
+    def _op_LAX(self, mode, ea): self.a = self.x = self._nz(self.read(ea))
+    def _op_SAX(self, mode, ea): self.write(ea, self.a & self.x)
+
+    def _op_SLO(self, mode, ea):
+        self.a = self._nz(self.a | self._modify(mode, ea, self._asl))
+
+    def _op_RLA(self, mode, ea):
+        self.a = self._nz(self.a & self._modify(mode, ea, self._rol))
+
+    def _op_SRE(self, mode, ea):
+        self.a = self._nz(self.a ^ self._modify(mode, ea, self._lsr))
+
+    def _op_RRA(self, mode, ea):
+        self._adc(self._modify(mode, ea, self._ror))
+
+    def _op_DCP(self, mode, ea):
+        self._compare(self.a, self._modify(mode, ea, lambda v: v - 1 & 0xFF))
+
+    def _op_ISC(self, mode, ea):
+        self._sbc(self._modify(mode, ea, lambda v: v + 1 & 0xFF))
+
+    def _op_ANC(self, mode, ea):
+        self.a = self._nz(self.a & self.read(ea))
+        self._set(C_FLAG, self.a & 0x80)
+
+    def _op_ALR(self, mode, ea):
+        self.a = self._lsr(self.a & self.read(ea))
+
+    def _op_ARR(self, mode, ea):
+        c = self.p & C_FLAG
+        self.a = self._nz(((self.a & self.read(ea)) >> 1) | (c << 7))
+        self._set(C_FLAG, self.a & 0x40)
+        self._set(V_FLAG, ((self.a >> 6) ^ (self.a >> 5)) & 1)
+
+    def _op_SBX(self, mode, ea):
+        t = (self.a & self.x) - self.read(ea)
+        self._set(C_FLAG, t >= 0)
+        self.x = self._nz(t & 0xFF)
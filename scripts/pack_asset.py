@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+pack_asset.py — Pack binary assets (splash bitmaps, SID payload) with
+byte-RLE or a small LZ77, and report ratio and estimated depack time.
+
+Usage:
+    python scripts/pack_asset.py assets/splash_*.bin assets/swamp_sollies.bin
+    python scripts/pack_asset.py --format lz -o build/packed assets/swamp_sollies.bin
+    python scripts/pack_asset.py --no-write assets/*.bin     # report only
+
+Packed files are written to build/packed/<stem>.rle / <stem>.lz unless
+-o is given. Every stream is unpacked again and compared before it is
+written.
+
+Stream formats
+--------------
+Both formats are a sequence of tokens, each starting with a control
+byte c, read from the packed stream in order. Output is written forward
+from the destination address the caller passes to the depacker; the
+stream carries no header and no length.
+
+RLE (.rle)
+    c = $00-$7F   literal:  copy the next c+1 bytes (1-128) to the output
+    c = $80-$FE   run:      write the next byte c-$7D times (3-129)
+    c = $FF       end of stream
+
+LZ (.lz)
+    c = $00-$7F   literal:  copy the next c+1 bytes (1-128) to the output
+    c = $80-$FE   match:    two bytes follow, offset lo then offset hi;
+                            copy (c-$80)+3 bytes (3-129) from
+                            output_pointer - offset, one byte at a time,
+                            lowest address first
+    c = $FF       end of stream
+
+LZ offsets are 1-$FFFF and always point into bytes already written.
+An offset smaller than the length is legal: the copy re-reads bytes it
+has just written, so offset 1 repeats the previous byte (this is how LZ
+encodes runs). A depacker must therefore copy forwards byte by byte,
+never with a block move that reads ahead.
+
+The RLE packer is greedy (runs of 3+ become run tokens). The LZ packer
+picks the byte-optimal token sequence (dynamic programming over hash
+chain matches), so the .lz stream is never longer than needed for the
+format.
+
+Depack time
+-----------
+Estimated from the per-token and per-byte cost of a straightforward
+(zp),y depacker; see DEPACK_CYCLES. Reported in CPU cycles and PAL
+frames (19656 cycles each) with the screen on and no interrupts.
+"""
+
+import argparse
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, 'build', 'packed')
+
+FORMATS = ('rle', 'lz')
+
+END = 0xFF
+MAX_LITERAL = 128
+MIN_RUN = 3
+MAX_RUN = 0xFE - 0x7D          # 129
+MIN_MATCH = 3
+MAX_MATCH = 0xFE - 0x80 + 3    # 129
+MAX_OFFSET = 0xFFFF
+MAX_CHAIN = 64                 # match candidates tried per position
+
+CYCLES_PER_FRAME = 19656       # PAL: 312 lines x 63 cycles
+
+# Estimated 6502 cycles for a depacker using lda (src),y / sta (dst),y:
+#   token: fetch control byte, classify, set up the count, then add Y
+#          back into the source/destination pointers after the loop
+#   byte:  the inner loop body, including dex / bne
+#   match: extra for reading the 2 offset bytes and forming the
+#          16-bit copy pointer (dst - offset)
+DEPACK_CYCLES = {
+    'token': 45,
+    'literal_byte': 18,        # lda (src),y  sta (dst),y  iny  dex  bne
+    'run_byte': 13,            # sta (dst),y  iny  dex  bne
+    'match_byte': 18,          # lda (ref),y  sta (dst),y  iny  dex  bne
+    'match_setup': 30,
+    'end': 10,
+}
+
+
+# ------------------------------------------------------------
+# RLE
+# ------------------------------------------------------------
+
+def _emit_literals(out, data, start, end):
+    while start < end:
+        n = min(MAX_LITERAL, end - start)
+        out.append(n - 1)
+        out += data[start:start + n]
+        start += n
+
+
+def pack_rle(data):
+    """Byte-RLE pack data; returns bytes ending with $FF."""
+    data = bytes(data)
+    out = bytearray()
+    lit_start = i = 0
+    n = len(data)
+    while i < n:
+        run = 1
+        while i + run < n and run < MAX_RUN and data[i + run] == data[i]:
+            run += 1
+        if run >= MIN_RUN:
+            _emit_literals(out, data, lit_start, i)
+            out += bytes((run + 0x7D, data[i]))
+            i += run
+            lit_start = i
+        else:
+            i += run
+    _emit_literals(out, data, lit_start, n)
+    out.append(END)
+    return bytes(out)
+
+
+def unpack_rle(packed):
+    """Inverse of pack_rle(); raises ValueError on a malformed stream."""
+    out = bytearray()
+    i = 0
+    try:
+        while True:
+            c = packed[i]
+            i += 1
+            if c == END:
+                return bytes(out)
+            if c < 0x80:
+                chunk = packed[i:i + c + 1]
+                if len(chunk) != c + 1:
+                    raise IndexError
+                out += chunk
+                i += c + 1
+            else:
+                out += bytes((packed[i],)) * (c - 0x7D)
+                i += 1
+    except IndexError:
+        raise ValueError("RLE stream ends without $FF terminator") from None
+
+
+# ------------------------------------------------------------
+# LZ
+# ------------------------------------------------------------
+
+def _longest_matches(data, max_chain=MAX_CHAIN):
+    """For every position, (length, offset) of the longest earlier match.
+
+    Candidates come from a hash chain on the next 3 bytes, most recent
+    first; lengths are found by binary search on slice equality, which
+    is valid for overlapping matches because the source is the original
+    data.
+    """
+    n = len(data)
+    chains = {}
+    best = [(0, 0)] * n
+    for i in range(n - MIN_MATCH + 1):
+        key = data[i:i + MIN_MATCH]
+        limit = min(MAX_MATCH, n - i)
+        best_len = best_off = 0
+        for p in reversed(chains.get(key, ())[-max_chain:]):
+            if i - p > MAX_OFFSET:
+                break
+            lo, hi = MIN_MATCH, limit
+            if data[p:p + hi] == data[i:i + hi]:
+                lo = hi
+            else:
+                while lo < hi - 1:
+                    mid = (lo + hi) // 2
+                    if data[p:p + mid] == data[i:i + mid]:
+                        lo = mid
+                    else:
+                        hi = mid
+            if lo > best_len:
+                best_len, best_off = lo, i - p
+                if lo == limit:
+                    break
+        best[i] = (best_len, best_off)
+        chains.setdefault(key, []).append(i)
+    return best
+
+
+def pack_lz(data, max_chain=MAX_CHAIN):
+    """LZ pack data with a byte-optimal parse; returns bytes ending with $FF."""
+    data = bytes(data)
+    n = len(data)
+    matches = _longest_matches(data, max_chain)
+
+    # cost[i] = fewest bytes to encode data[i:]; walk backwards.
+    # A literal run i..j costs 1 + (j - i) + cost[j], so its best end is
+    # the minimum of (j + cost[j]) over the next 128 positions.
+    cost = [0] * (n + 1)
+    lit_key = [0] * (n + 1)
+    lit_key[n] = n
+    choice = [None] * n
+    for i in range(n - 1, -1, -1):
+        window = lit_key[i + 1:i + 1 + MAX_LITERAL]
+        k = min(window)
+        best = 1 + k - i
+        pick = ('lit', window.index(k) + 1)
+        length, offset = matches[i]
+        if length >= MIN_MATCH:
+            tail = cost[i + MIN_MATCH:i + length + 1]
+            m = min(tail)
+            if 3 + m < best:
+                best = 3 + m
+                pick = ('match', tail.index(m) + MIN_MATCH, offset)
+        cost[i] = best
+        lit_key[i] = i + best
+        choice[i] = pick
+
+    out = bytearray()
+    i = 0
+    while i < n:
+        pick = choice[i]
+        if pick[0] == 'lit':
+            out.append(pick[1] - 1)
+            out += data[i:i + pick[1]]
+        else:
+            _, length, offset = pick
+            out += bytes((length - MIN_MATCH + 0x80, offset & 0xFF, offset >> 8))
+        i += pick[1]
+    out.append(END)
+    return bytes(out)
+
+
+def unpack_lz(packed):
+    """Inverse of pack_lz(); raises ValueError on a malformed stream."""
+    out = bytearray()
+    i = 0
+    try:
+        while True:
+            c = packed[i]
+            i += 1
+            if c == END:
+                return bytes(out)
+            if c < 0x80:
+                chunk = packed[i:i + c + 1]
+                if len(chunk) != c + 1:
+                    raise IndexError
+                out += chunk
+                i += c + 1
+            else:
+                offset = packed[i] | (packed[i + 1] << 8)
+                i += 2
+                src = len(out) - offset
+                if offset == 0 or src < 0:
+                    raise ValueError(f"LZ offset {offset} out of range at {i - 3}")
+                for k in range(c - 0x80 + MIN_MATCH):
+                    out.append(out[src + k])
+    except IndexError:
+        raise ValueError("LZ stream ends without $FF terminator") from None
+
+
+PACKERS = {'rle': pack_rle, 'lz': pack_lz}
+UNPACKERS = {'rle': unpack_rle, 'lz': unpack_lz}
+
+
+def pack(data, fmt):
+    """Pack data and check it round-trips; returns the packed bytes."""
+    packed = PACKERS[fmt](data)
+    if UNPACKERS[fmt](packed) != bytes(data):
+        raise AssertionError(f"{fmt} round trip failed")
+    return packed
+
+
+# ------------------------------------------------------------
+# Depack cost model
+# ------------------------------------------------------------
+
+def token_stats(packed, fmt):
+    """Count tokens and bytes produced per token kind in a packed stream."""
+    stats = {'literal': 0, 'literal_bytes': 0, 'run': 0, 'run_bytes': 0,
+             'match': 0, 'match_bytes': 0}
+    i = 0
+    while packed[i] != END:
+        c = packed[i]
+        if c < 0x80:
+            stats['literal'] += 1
+            stats['literal_bytes'] += c + 1
+            i += c + 2
+        elif fmt == 'rle':
+            stats['run'] += 1
+            stats['run_bytes'] += c - 0x7D
+            i += 2
+        else:
+            stats['match'] += 1
+            stats['match_bytes'] += c - 0x80 + MIN_MATCH
+            i += 3
+    return stats
+
+
+def depack_cycles(packed, fmt):
+    """Estimated 6502 cycles to depack a stream (see DEPACK_CYCLES)."""
+    s = token_stats(packed, fmt)
+    c = DEPACK_CYCLES
+    return (c['token'] * (s['literal'] + s['run'] + s['match'])
+            + c['literal_byte'] * s['literal_bytes']
+            + c['run_byte'] * s['run_bytes']
+            + (c['match_byte'] * s['match_bytes'] + c['match_setup'] * s['match'])
+            + c['end'])
+
+
+def report_row(name, data, packed, fmt):
+    """Report dict for one packed stream."""
+    cycles = depack_cycles(packed, fmt)
+    return {'stream': name, 'format': fmt, 'raw': len(data),
+            'packed': len(packed), 'ratio': len(packed) / max(len(data), 1),
+            'cycles': cycles, 'frames': cycles / CYCLES_PER_FRAME}
+
+
+def print_report(rows):
+    print(f"{'stream':28s} {'fmt':3s} {'raw':>6s} {'packed':>6s} "
+          f"{'ratio':>6s} {'cycles':>8s} {'frames':>6s}")
+    for r in rows:
+        print(f"{r['stream']:28s} {r['format']:3s} {r['raw']:6d} {r['packed']:6d} "
+              f"{r['ratio']:6.1%} {r['cycles']:8d} {r['frames']:6.1f}")
+    for fmt in FORMATS:
+        sel = [r for r in rows if r['format'] == fmt]
+        if len(sel) > 1:
+            raw = sum(r['raw'] for r in sel)
+            packed = sum(r['packed'] for r in sel)
+            cycles = sum(r['cycles'] for r in sel)
+            print(f"{'total':28s} {fmt:3s} {raw:6d} {packed:6d} "
+                  f"{packed / raw:6.1%} {cycles:8d} {cycles / CYCLES_PER_FRAME:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack C64 assets with RLE/LZ and report ratio and depack time.')
+    parser.add_argument('inputs', nargs='+', help='raw binary files')
+    parser.add_argument('--format', choices=FORMATS + ('both',), default='both')
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUT,
+                        help='where packed files go (default: build/packed)')
+    parser.add_argument('--no-write', action='store_true',
+                        help='only print the report')
+    args = parser.parse_args()
+
+    formats = FORMATS if args.format == 'both' else (args.format,)
+    rows = []
+    for path in args.inputs:
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for fmt in formats:
+            packed = pack(data, fmt)
+            rows.append(report_row(os.path.basename(path), data, packed, fmt))
+            if not args.no_write:
+                os.makedirs(args.output_dir, exist_ok=True)
+                with open(os.path.join(args.output_dir, f'{stem}.{fmt}'), 'wb') as f:
+                    f.write(packed)
+    print_report(rows)
+    if not args.no_write:
+        print(f"\nPacked files written to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+profile_routines.py — Cycle profile per routine of the tutor on the
+headless C64 (scripts/c64_machine.py), checked against the PAL frame.
+
+Usage:
+    python scripts/profile_routines.py                        # every scenario
+    python scripts/profile_routines.py matrix_rain --collapsed build/rain.folded
+    python scripts/profile_routines.py main_loop --frames 100
+    python scripts/profile_routines.py codegen --blocks wait:2 print:72 loop_back
+    flamegraph.pl build/rain.folded > build/rain.svg
+
+Scenarios:
+    codegen      Codegen.codegen_run on --blocks (generated program not run)
+    asm_view     AsmView.asm_view_render after codegen
+    matrix_rain  MatrixRain.matrix_rain_transition after codegen (update_columns,
+                 settle_cell, colorize_code_area, ... and its $D012 waits)
+    main_loop    Main.main_loop idling in the palette for --frames frames,
+                 after running Main.start (needs a SKIP_SPLASH=1 build)
+
+Every JSR opens a frame named after its target in build/main.sym; a
+routine reached by JMP (the codegen emitters, the state handlers) counts
+as part of its caller. A frame closes as soon as SP rises above its
+return address, which also covers Kernal traps and routines that drop
+their return address. Columns:
+    calls       JSRs to the routine
+    incl        cycles from the JSR until it returns
+    excl        cycles with the routine on top of the stack
+    max/call    longest single call
+    peak/frame  most inclusive cycles inside one PAL frame (19656 cycles,
+                counted from power-on like the raster line)
+Routines with a call longer than one frame are flagged with '!': they
+cannot run once per frame, by design (frame loops) or not.
+
+--collapsed writes folded stacks (`scenario;caller;callee cycles`, with
+exclusive cycles), the input format of flamegraph.pl and speedscope.
+"""
+
+import argparse
+import collections
+import sys
+
+import kick_symbols
+from c64_machine import FRAME_CYCLES, PRG_PATH, Machine, block_types, parse_slot
+from mos6502 import CPUError, RETURN_SENTINEL
+
+OP_JSR = 0x20
+DEFAULT_BLOCKS = ('border:2', 'bg:6', 'print:72', 'show_sprite', 'wait:1', 'loop_back')
+
+
+class Stat:
+    __slots__ = ('calls', 'incl', 'excl', 'max_call', 'peak', 'frame', 'acc', 'depth')
+
+    def __init__(self):
+        self.calls = self.incl = self.excl = self.max_call = 0
+        self.peak = self.acc = self.depth = 0
+        self.frame = -1
+
+    def close_frame(self):
+        self.peak = max(self.peak, self.acc)
+        self.acc = 0
+
+
+def routine_names(symbols):
+    """{address: name}, preferring namespaced (code) labels to root constants."""
+    names = {}
+    for name in sorted(symbols, key=lambda n: ('.' not in n, len(n), n)):
+        names.setdefault(symbols[name], name)
+    return names
+
+
+class Profiler:
+    """cpu.tracer that keeps a shadow call stack and charges cycles to it."""
+
+    def __init__(self, names):
+        self.names = names
+        self.stats = {}
+        self.folded = collections.Counter()
+        self.stack = []          # (stat, sp at entry, entry cycles)
+        self.path = ()
+        self.active = []         # distinct Stats on the stack
+        self.last = 0
+
+    def name(self, addr):
+        return self.names.get(addr) or f'${addr:04X}'
+
+    def enter(self, name, sp, now):
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = Stat()
+        st.calls += 1
+        st.depth += 1
+        self.stack.append((st, sp, now))
+        self.path += (name,)
+        if st.depth == 1:
+            self.active.append(st)
+
+    def leave(self, now):
+        st, _, start = self.stack.pop()
+        self.path = self.path[:-1]
+        st.depth -= 1
+        if st.depth == 0:
+            duration = now - start
+            st.incl += duration
+            st.max_call = max(st.max_call, duration)
+            self.active.remove(st)
+
+    def charge(self, now):
+        delta = now - self.last
+        if delta and self.stack:
+            self.stack[-1][0].excl += delta
+            self.folded[self.path] += delta
+            frame = self.last // FRAME_CYCLES
+            for st in self.active:
+                if st.frame != frame:
+                    st.close_frame()
+                    st.frame = frame
+                st.acc += delta
+        self.last = now
+
+    def __call__(self, cpu, op, ea):
+        now = cpu.cycles
+        self.charge(now)
+        sp = cpu.sp
+        while self.stack and sp > self.stack[-1][1]:
+            self.leave(now)
+        if op == OP_JSR:
+            self.enter(self.name(ea), (sp - 2) & 0xFF, now)
+
+    def start(self, cpu, name):
+        self.last = cpu.cycles
+        self.enter(name, cpu.sp, cpu.cycles)
+
+    def finish(self, now):
+        self.charge(now)
+        while self.stack:
+            self.leave(now)
+        for st in self.stats.values():
+            st.close_frame()
+
+
+def profile(machine, name, addr, call=True, frames=None, max_cycles=50_000_000):
+    """Run addr under a Profiler: until it returns (call) or for `frames` frames."""
+    cpu = machine.cpu
+    if call:
+        ret = (RETURN_SENTINEL - 1) & 0xFFFF
+        cpu.push(ret >> 8)
+        cpu.push(ret)
+    cpu.pc = addr
+    prof = Profiler(routine_names(machine.symbols))
+    limit = cpu.cycles + (frames * FRAME_CYCLES if frames else max_cycles)
+    prof.start(cpu, name)
+    cpu.tracer = prof
+    try:
+        while cpu.pc != RETURN_SENTINEL:
+            if cpu.cycles >= limit:
+                if frames:
+                    break
+                raise CPUError(f"{name} did not return within {max_cycles} cycles "
+                               f"(PC ${cpu.pc:04X})")
+            cpu.step()
+    finally:
+        cpu.tracer = None
+    prof.finish(cpu.cycles)
+    return prof
+
+
+# -- scenarios -----------------------------------------------------------------
+def run_codegen(m, slots, frames):
+    m.reset()
+    m.set_slots(slots)
+    m.stub(m.gen_code_buf)
+    try:
+        return profile(m, 'Codegen.codegen_run', m.codegen_run)
+    finally:
+        m.cpu.traps.pop(m.gen_code_buf, None)
+
+
+def after_codegen(label):
+    def run(m, slots, frames):
+        m.codegen(slots, execute=False)
+        return profile(m, label, m.sym(label))
+    return run
+
+
+def run_main_loop(m, slots, frames):
+    m.reset()
+    main_loop = m.sym('Main.main_loop')
+    m.cpu.pc = m.sym('Main.start')
+    m.cpu.run(main_loop, max_cycles=200 * FRAME_CYCLES)
+    return profile(m, 'Main.main_loop', main_loop, call=False, frames=frames)
+
+
+SCENARIOS = {
+    'codegen': run_codegen,
+    'asm_view': after_codegen('AsmView.asm_view_render'),
+    'matrix_rain': after_codegen('MatrixRain.matrix_rain_transition'),
+    'main_loop': run_main_loop,
+}
+
+
+def report(scenario, prof, limit):
+    total = sum(prof.folded.values())
+    print(f"\n== {scenario}: {total} cycles ({total / FRAME_CYCLES:.2f} frames)")
+    print(f"  {'routine':36s} {'calls':>6s} {'incl':>10s} {'excl':>10s} "
+          f"{'max/call':>9s} {'peak/frame':>10s}")
+    rows = sorted(prof.stats.items(), key=lambda kv: -kv[1].incl)[:limit]
+    for name, st in rows:
+        flag = '!' if st.max_call > FRAME_CYCLES else ' '
+        print(f"{flag} {name[:36]:36s} {st.calls:6d} {st.incl:10d} {st.excl:10d} "
+              f"{st.max_call:9d} {st.peak:6d} {100 * st.peak / FRAME_CYCLES:3.0f}%")
+    over = [name for name, st in prof.stats.items() if st.max_call > FRAME_CYCLES]
+    if over:
+        print(f"  over the {FRAME_CYCLES}-cycle frame budget in one call: {', '.join(over)}")
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Cycle profile per routine on the headless C64.')
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"default: all ({', '.join(SCENARIOS)})")
+    parser.add_argument('--prg', default=PRG_PATH)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH)
+    parser.add_argument('--blocks', nargs='+', default=list(DEFAULT_BLOCKS),
+                        help='program compiled before codegen / asm_view / matrix_rain')
+    parser.add_argument('--frames', type=int, default=50,
+                        help='frames of main_loop to profile (default 50)')
+    parser.add_argument('--collapsed', help='write folded stacks for flamegraph.pl')
+    parser.add_argument('--limit', type=int, default=25, help='rows per scenario')
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(sorted(unknown))}")
+    symbols = kick_symbols.symbol_index(args.sym)
+    types = block_types(symbols)
+    try:
+        slots = [parse_slot(b, types) for b in args.blocks]
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        machine = Machine(args.prg, symbols)
+    except (OSError, KeyError, ValueError) as e:
+        sys.exit(f"cannot load {args.prg}: {e}")
+
+    folded = collections.Counter()
+    failed = False
+    for scenario in args.scenarios or SCENARIOS:
+        try:
+            prof = SCENARIOS[scenario](machine, slots, args.frames)
+        except (CPUError, KeyError) as e:
+            print(f"\n== {scenario}: {e}")
+            failed = True
+            continue
+        report(scenario, prof, args.limit)
+        for path, cycles in prof.folded.items():
+            folded[(scenario,) + path] += cycles
+
+    if args.collapsed:
+        with open(args.collapsed, 'w') as f:
+            for path, cycles in sorted(folded.items()):
+                f.write(f"{';'.join(path)} {cycles}\n")
+        print(f"\nfolded stacks -> {args.collapsed}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
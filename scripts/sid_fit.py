@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+sid_fit.py — Check SID tunes against the program's memory map and rank
+the ones that fit without relocation.
+
+Usage:
+    python scripts/sid_fit.py                       # tunes in the sid_index.py index
+    python scripts/sid_fit.py ~/HVSC/C64Music/MUSICIANS/B
+    python scripts/sid_fit.py assets/Swamp_Sollies.sid --verbose
+    python scripts/sid_fit.py --map                 # occupied / free ranges only
+
+The occupied map is built from:
+  - every `.pc` segment in src/*.asm, up to its `.assert * <= limit`
+    (kick_symbols.segments); the segment being replaced, "SID Music
+    Data" by default (--replace), is left free
+  - runtime buffers that have no segment (GEN_CODE_BUF, ASM_META_BUF,
+    SHADOW_SCREEN, RAIN_COL_STATE), addresses from build/main.sym when
+    it exists, else from the `.label` lines in the sources
+  - fixed system areas: zero page / stack / Kernal work area, screen
+    RAM, the BASIC upstart stub, I/O and Kernal ROM
+
+$A000-$BFFF is reported as a warning, not a conflict: the program leaves
+BASIC ROM banked in, so a tune placed there must bank it out ($01) to
+read its own data.
+
+Tunes come from paths given on the command line (headers read on a
+thread pool) or, with no paths, from the sid_index.py SQLite index.
+Fitting tunes are ranked: no warnings first, then smallest footprint.
+"""
+
+import argparse
+import bisect
+import collections
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import kick_symbols
+import sid_index
+from strip_sid_header import read_sid_header
+
+Region = collections.namedtuple('Region', 'start end name kind')   # end inclusive
+
+SYSTEM_REGIONS = (
+    Region(0x0000, 0x03FF, 'zero page / stack / Kernal work area', 'used'),
+    Region(0x0400, 0x07FF, 'screen RAM + sprite pointers', 'used'),
+    Region(0x0801, 0x080F, 'BASIC upstart', 'used'),
+    Region(0xA000, 0xBFFF, 'BASIC ROM (banked in)', 'warn'),
+    Region(0xD000, 0xDFFF, 'I/O', 'used'),
+    Region(0xE000, 0xFFFF, 'Kernal ROM', 'used'),
+)
+
+# Runtime buffers declared only as labels in constants.asm, with sizes
+# from their comments (GEN_CODE_BUF may grow up to ASM_META_BUF)
+RUNTIME_BUFFERS = {
+    'GEN_CODE_BUF': 0x1000,
+    'ASM_META_BUF': 480,
+    'SHADOW_SCREEN': 1000,
+    'RAIN_COL_STATE': 160,
+}
+
+DEFAULT_REPLACE = 'SID Music Data'
+
+
+class IntervalIndex:
+    """Static interval index: regions sorted by start with a running max end.
+
+    overlaps() bisects to the last region starting at or before hi, then
+    walks back only while the running max end can still reach lo.
+    """
+
+    def __init__(self, regions):
+        self.regions = sorted(regions, key=lambda r: (r.start, r.end))
+        self.starts = [r.start for r in self.regions]
+        self.max_end = []
+        running = -1
+        for r in self.regions:
+            running = max(running, r.end)
+            self.max_end.append(running)
+
+    def overlaps(self, lo, hi):
+        """Regions intersecting [lo, hi], in address order."""
+        hits = []
+        i = bisect.bisect_right(self.starts, hi) - 1
+        while i >= 0 and self.max_end[i] >= lo:
+            if self.regions[i].end >= lo:
+                hits.append(self.regions[i])
+            i -= 1
+        return hits[::-1]
+
+    def free(self, kinds=('used',)):
+        """Gaps not covered by regions of the given kinds, as (start, end)."""
+        gaps, pos = [], 0
+        for r in self.regions:
+            if r.kind not in kinds:
+                continue
+            if r.start > pos:
+                gaps.append((pos, r.start - 1))
+            pos = max(pos, r.end + 1)
+        if pos <= 0xFFFF:
+            gaps.append((pos, 0xFFFF))
+        return gaps
+
+
+def load_symbols(sym_path=kick_symbols.SYM_PATH, src_dir=kick_symbols.SRC_DIR):
+    return kick_symbols.symbol_index(sym_path, src_dir)
+
+
+def memory_map(replace=DEFAULT_REPLACE, sym_path=kick_symbols.SYM_PATH,
+               src_dir=kick_symbols.SRC_DIR):
+    """IntervalIndex of every occupied range in the program's layout."""
+    regions = list(SYSTEM_REGIONS)
+    for seg in kick_symbols.segments(src_dir):
+        if seg.name != replace:
+            regions.append(Region(seg.start, seg.end, seg.name, 'used'))
+    symbols = load_symbols(sym_path, src_dir)
+    for name, size in RUNTIME_BUFFERS.items():
+        start = kick_symbols.lookup(symbols, name)
+        regions.append(Region(start, start + size - 1, name, 'used'))
+    return IntervalIndex(regions)
+
+
+def check_tune(index, info):
+    """(conflicts, warnings) for one parsed header dict."""
+    problems = []
+    hits = index.overlaps(info['load_addr'], info['load_end'])
+    conflicts = [r.name for r in hits if r.kind == 'used']
+    warnings = [r.name for r in hits if r.kind == 'warn']
+    for key in ('init_addr', 'play_addr'):
+        addr = info[key]
+        if addr and not info['load_addr'] <= addr <= info['load_end']:
+            problems.append(f"{key[:4]} ${addr:04X} outside data")
+    if info['load_end'] > 0xFFFF:
+        problems.append('data runs past $FFFF')
+    return conflicts + problems, warnings
+
+
+def tunes_from_paths(paths, workers=16):
+    """Parse headers for .sid files and directories; yields (path, info)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(p for p, _, _ in sid_index.walk_sids(path))
+        else:
+            files.append(os.path.abspath(path))
+
+    def parse(path):
+        try:
+            return path, read_sid_header(path)
+        except (OSError, ValueError):
+            return path, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, info in pool.map(parse, files):
+            if info is not None:
+                yield path, info
+
+
+def tunes_from_index(db_path=sid_index.DEFAULT_DB):
+    for row in sid_index.query(db_path, limit=-1):
+        yield row['path'], dict(row)
+
+
+def rank(index, tunes):
+    """Split tunes into (fitting rows ranked, rejected rows)."""
+    fits, rejected = [], []
+    for path, info in tunes:
+        conflicts, warnings = check_tune(index, info)
+        row = (path, info, conflicts, warnings)
+        (rejected if conflicts else fits).append(row)
+    fits.sort(key=lambda r: (bool(r[3]), r[1]['data_size'], r[0]))
+    return fits, rejected
+
+
+def print_map(index):
+    for r in index.regions:
+        print(f"${r.start:04X}-${r.end:04X}  {r.kind:4s}  {r.name}")
+    print("free: " + ', '.join(f"${a:04X}-${b:04X} ({b - a + 1})"
+                               for a, b in index.free()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Rank SID tunes that fit the program memory map unrelocated.')
+    parser.add_argument('paths', nargs='*',
+                        help='.sid files or directories (default: the sid_index db)')
+    parser.add_argument('--db', default=sid_index.DEFAULT_DB)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH,
+                        help='KickAss symbol file (default: build/main.sym)')
+    parser.add_argument('--replace', default=DEFAULT_REPLACE,
+                        help='segment the tune replaces (default: "SID Music Data")')
+    parser.add_argument('--map', action='store_true', help='print the memory map')
+    parser.add_argument('--limit', type=int, default=25)
+    parser.add_argument('--verbose', action='store_true',
+                        help='also list rejected tunes and why')
+    args = parser.parse_args()
+
+    index = memory_map(args.replace, args.sym)
+    if args.map:
+        print_map(index)
+        if not args.paths:
+            return
+    tunes = tunes_from_paths(args.paths) if args.paths else tunes_from_index(args.db)
+    fits, rejected = rank(index, tunes)
+
+    for path, info, _, warnings in fits[:args.limit]:
+        note = f"  (warn: {', '.join(warnings)})" if warnings else ''
+        print(f"${info['load_addr']:04X}-${info['load_end']:04X} "
+              f"{info['data_size']:6d}  {info['name'][:32]:32s} {path}{note}")
+    print(f"{len(fits)} fit, {len(rejected)} rejected")
+    if args.verbose:
+        for path, info, conflicts, _ in rejected:
+            print(f"  ${info['load_addr']:04X}-${info['load_end']:04X} {path}: "
+                  f"{', '.join(conflicts)}")
+    else:
+        reasons = collections.Counter(c for _, _, conflicts, _ in rejected
+                                      for c in conflicts)
+        if reasons:
+            print("top conflicts: " + ', '.join(f"{name} ({n})"
+                                                for name, n in reasons.most_common(5)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+sid_index.py — Index a collection of .sid tunes in SQLite and query it.
+
+Usage:
+    python scripts/sid_index.py build ~/HVSC/C64Music
+    python scripts/sid_index.py query --fits 9000-CFFF
+    python scripts/sid_index.py query --author banana --max-size 8000 --clock PAL
+
+build walks the directory, reads only each file's header (one bounded
+read via strip_sid_header.read_sid_header) on a thread pool, and stores
+the fields in build/sid_index.sqlite (override with --db). Re-running it
+only re-parses files whose mtime or size changed and drops rows for
+files that are gone, so refreshing a large collection takes seconds.
+
+query filters on the indexed columns; --fits START-END (hex) keeps tunes
+whose whole load range lies inside that window, e.g. 9000-CFFF for the
+SID area in this project's memory map (see README).
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from strip_sid_header import read_sid_header
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(ROOT, 'build', 'sid_index.sqlite')
+
+# Indexed header fields, in table column order
+FIELDS = ('magic', 'version', 'load_addr', 'load_end', 'data_size', 'init_addr',
+          'play_addr', 'songs', 'start_song', 'speed', 'name', 'author',
+          'released', 'flags', 'clock', 'sid_model', 'start_page', 'page_length')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sids (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT,
+    {', '.join(FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS sids_load ON sids (load_addr, load_end);
+CREATE INDEX IF NOT EXISTS sids_size ON sids (data_size);
+"""
+
+
+def connect(db_path=DEFAULT_DB):
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+def walk_sids(root):
+    """Yield (path, mtime_ns, size) for every .sid file under root."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith('.sid'):
+                    st = entry.stat()
+                    yield os.path.abspath(entry.path), st.st_mtime_ns, st.st_size
+
+
+def _parse(item):
+    path, mtime_ns, size = item
+    try:
+        info = read_sid_header(path)
+        return (path, mtime_ns, size, None) + tuple(info[f] for f in FIELDS)
+    except (OSError, ValueError) as e:
+        return (path, mtime_ns, size, str(e)) + (None,) * len(FIELDS)
+
+
+def build_index(root, db_path=DEFAULT_DB, workers=16):
+    """Incrementally (re)index root; returns (parsed, unchanged, removed) counts."""
+    db = connect(db_path)
+    prefix = os.path.join(os.path.abspath(root), '')
+    known = {row['path']: (row['mtime_ns'], row['size']) for row in
+             db.execute("SELECT path, mtime_ns, size FROM sids")
+             if row['path'].startswith(prefix)}
+    todo, seen = [], set()
+    for path, mtime_ns, size in walk_sids(root):
+        seen.add(path)
+        if known.get(path) != (mtime_ns, size):
+            todo.append((path, mtime_ns, size))
+    removed = [p for p in known if p not in seen]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(_parse, todo))
+    placeholders = ', '.join('?' * (4 + len(FIELDS)))
+    with db:
+        db.executemany("DELETE FROM sids WHERE path = ?", ((p,) for p in removed))
+        db.executemany(f"INSERT OR REPLACE INTO sids VALUES ({placeholders})", rows)
+    db.close()
+    return len(todo), len(seen) - len(todo), len(removed)
+
+
+def parse_range(text):
+    """'9000-CFFF' -> (0x9000, 0xCFFF)."""
+    start, _, end = text.partition('-')
+    return int(start.lstrip('$'), 16), int(end.lstrip('$'), 16)
+
+
+def query(db_path=DEFAULT_DB, fits=None, min_size=None, max_size=None,
+          author=None, name=None, clock=None, limit=50):
+    """Return matching rows (sqlite3.Row), smallest tunes first."""
+    where, args = ["error IS NULL"], []
+    if fits:
+        where.append("load_addr >= ? AND load_end <= ?")
+        args += list(fits)
+    if min_size is not None:
+        where.append("data_size >= ?")
+        args.append(min_size)
+    if max_size is not None:
+        where.append("data_size <= ?")
+        args.append(max_size)
+    if author:
+        where.append("author LIKE ?")
+        args.append(f'%{author}%')
+    if name:
+        where.append("name LIKE ?")
+        args.append(f'%{name}%')
+    if clock:
+        where.append("clock LIKE ?")
+        args.append(f'%{clock}%')
+    sql = (f"SELECT * FROM sids WHERE {' AND '.join(where)} "
+           f"ORDER BY data_size, path LIMIT ?")
+    db = connect(db_path)
+    rows = db.execute(sql, args + [limit]).fetchall()
+    db.close()
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'load':>11s} {'size':>6s} {'init':>5s} {'play':>5s} {'songs':>5s} "
+          f"{'clock':8s} {'name':32s} author")
+    for r in rows:
+        print(f"${r['load_addr']:04X}-${r['load_end']:04X} {r['data_size']:6d} "
+              f"${r['init_addr']:04X} ${r['play_addr']:04X} {r['songs']:5d} "
+              f"{r['clock']:8s} {r['name'][:32]:32s} {r['author']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index and query .sid tunes.')
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help='index file (default: build/sid_index.sqlite)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='index (or refresh) a directory of .sid files')
+    p.add_argument('root')
+    p.add_argument('--workers', type=int, default=16)
+
+    q = sub.add_parser('query', help='list indexed tunes matching filters')
+    q.add_argument('--fits', type=parse_range, metavar='START-END',
+                   help='load range must lie inside this hex window, e.g. 9000-CFFF')
+    q.add_argument('--min-size', type=int)
+    q.add_argument('--max-size', type=int)
+    q.add_argument('--author')
+    q.add_argument('--name')
+    q.add_argument('--clock', help='PAL or NTSC')
+    q.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.command == 'build':
+        parsed, unchanged, removed = build_index(args.root, args.db, args.workers)
+        print(f"{parsed} parsed, {unchanged} unchanged, {removed} removed "
+              f"({time.perf_counter() - t0:.2f}s) -> {args.db}")
+        return
+    rows = query(args.db, args.fits, args.min_size, args.max_size, args.author,
+                 args.name, args.clock, args.limit)
+    print_rows(rows)
+    print(f"{len(rows)} tune(s) ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+
+if __name__ == '__main__':
+    main()
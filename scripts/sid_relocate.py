@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+sid_relocate.py — Relocate a SID tune to another page and verify it by
+emulation.
+
+Usage:
+    python scripts/sid_relocate.py assets/Swamp_Sollies.sid --base 4000
+    python scripts/sid_relocate.py assets/Swamp_Sollies.sid --base auto --replace "Splash"
+    python scripts/sid_relocate.py assets/swamp_sollies.bin --base 4000 -o build/sid_4000.bin
+
+Relocation is page-aligned: the tune moves by whole pages, so only the
+high bytes of addresses inside the tune change. Those bytes are found
+two ways and the union is patched:
+
+  static    recursive disassembly from init/play (mos6502.disassemble);
+            every absolute / indirect operand whose page lies in the tune
+  dynamic   init + play calls per subtune on mos6502.CPU, until the song
+            loops or --frames have been played, with a taint tracer: each byte in registers and RAM remembers which
+            tune byte (table entry, `lda #>label` operand, ...) it was
+            copied from, and when a (zp),y / (zp,x) / jmp () pointer, a
+            pushed RTS address or a self-modified operand points into
+            the tune, that origin byte is marked
+
+Static operands on bytes the trace read as data are dropped (they were
+mis-disassembled tables). Operands in reachable code the trace never ran
+are patched on static analysis alone and reported.
+
+The song loops when the whole 64 KB RAM after a play call equals the RAM
+after an earlier one: from then on the player only repeats itself, so
+the trace has seen every state it will ever reach. The relocated tune is
+then run and every SID register write ($D400-$D41C) and the cycles of
+each init/play call are compared with the original's:
+  - looped: up to the repeat, and the relocated tune must repeat on the
+    same frame. This covers the whole song (from this init, with no
+    input: a player that reads the SID or a CIA as input can still
+    differ on a real C64)
+  - no loop within --frames: over VERIFY_FACTOR times the traced frames,
+    so code the trace missed but the next frames reach still shows up.
+    This is a spot check: later frames remain unchecked
+Any difference is an error and nothing is written. Swamp Sollies loops
+after ~25700 frames, traced and checked in about a minute; a smaller
+--frames is quicker but only a partial check.
+
+A passed check is cached under build/cache/, keyed by the input's
+SHA-256, the base, the songs and --frames (plus the sources of this tool
+and mos6502.py). This is what makes relocation a build step: the first
+run of a tune at a base pays for the full loop check, every later run
+with the same input and base only patches the cached offsets and writes
+the output in well under a second. --force ignores the cache.
+
+--base auto picks the first page-aligned gap in sid_fit.memory_map(),
+with --replace naming the segment the tune may overwrite. Output is a
+.sid with updated load/init/play when the input is a .sid, else a raw
+.bin like strip_sid_header.py writes (default: build/<name>_<base>.*).
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import struct
+import time
+
+import mos6502
+import sid_fit
+from mos6502 import OPCODES, ABS, IND, IZX, IZY, REL, MODE_SIZE, ABSOLUTE_MODES
+from strip_sid_header import parse_sid_header
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(ROOT, 'build')
+CACHE_DIR = os.path.join(BUILD_DIR, 'cache')
+
+# The project's SID layout (README memory map), used for raw .bin input
+BIN_DEFAULTS = {'load': 0x9000, 'init': 0xC000, 'play': 0xC475}
+
+SID_REGS = (0xD400, 0xD41C)
+KERNAL_IRQ_EXITS = (0xEA31, 0xEA81)   # IRQ handlers installed by RSID-style init
+DEFAULT_FRAMES = 30000                 # trace limit per subtune: 10 min of PAL frames
+VERIFY_FACTOR = 2                      # check window / traced frames for unlooped songs
+
+Tune = collections.namedtuple('Tune', 'data load init play songs start_song header')
+
+LOADS = {'LDA', 'LDX', 'LDY', 'LAX'}
+STORES = {'STA': 'a', 'STX': 'x', 'STY': 'y'}
+ALU = {'ADC', 'SBC', 'AND', 'ORA', 'EOR'}
+SHIFTS = {'ASL', 'LSR', 'ROL', 'ROR', 'SLO', 'RLA', 'SRE', 'RRA'}
+TRANSFERS = {'TAX': ('x', 'a'), 'TAY': ('y', 'a'), 'TXA': ('a', 'x'), 'TYA': ('a', 'y')}
+STOPS = {'RTS', 'RTI', 'BRK', 'JMP'}
+
+
+def load_tune(path, load=None, init=None, play=None):
+    """Read a .sid (header fields) or a raw .bin (addresses from args/defaults)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] in (b'PSID', b'RSID'):
+        info = parse_sid_header(data, len(data))
+        # init 0 means "init at the load address" (PSID spec)
+        return Tune(data[info['data_start']:], info['load_addr'],
+                    info['init_addr'] or info['load_addr'],
+                    info['play_addr'], info['songs'], info['start_song'],
+                    data[:info['data_start']])
+    return Tune(data, load if load is not None else BIN_DEFAULTS['load'],
+                init if init is not None else BIN_DEFAULTS['init'],
+                play if play is not None else BIN_DEFAULTS['play'], 1, 1, None)
+
+
+def page_range(tune):
+    return tune.load >> 8, (tune.load + len(tune.data) - 1) >> 8
+
+
+def static_scan(mem, entries, pages):
+    """Recursive disassembly from entries.
+
+    Returns ({instruction address: size}, {operand hi-byte address}) for
+    instructions reachable inside the tune whose absolute operand points
+    into it.
+    """
+    lo_page, hi_page = pages
+    code, operands = {}, set()
+    todo = [e for e in entries if lo_page <= e >> 8 <= hi_page]
+    while todo:
+        pc = todo.pop()
+        while lo_page <= pc >> 8 <= hi_page and pc not in code:
+            entry = OPCODES[mem[pc]]
+            if entry is None:
+                break
+            name, mode, _, _ = entry
+            size = MODE_SIZE[mode]
+            code[pc] = size
+            if mode in ABSOLUTE_MODES and lo_page <= mem[pc + 2] <= hi_page:
+                operands.add(pc + 2)
+                if name in ('JSR', 'JMP') and mode == ABS:
+                    todo.append(mem[pc + 1] | (mem[pc + 2] << 8))
+            if mode == REL:
+                off = mem[pc + 1]
+                todo.append((pc + 2 + (off - 256 if off & 0x80 else off)) & 0xFFFF)
+            if name in STOPS:
+                break
+            pc += size
+    return code, operands
+
+
+class TaintTracer:
+    """mos6502 tracer marking tune bytes used as address high bytes.
+
+    taint[addr] is the tune byte a RAM byte's value was copied from (-1
+    if none); tune bytes start out as their own origin.
+    """
+
+    def __init__(self, tune):
+        self.lo_page, self.hi_page = page_range(tune)
+        self.start, self.end = tune.load, tune.load + len(tune.data) - 1
+        self.taint = [-1] * 65536
+        self.taint[self.start:self.end + 1] = range(self.start, self.end + 1)
+        self.reg = {'a': -1, 'x': -1, 'y': -1}
+        self.marked = set()
+        self.executed = set()
+        self.data_reads = set()
+        self.zp_writes = set()
+
+    def _mark(self, origin, hi_value):
+        if origin >= 0 and self.lo_page <= hi_value <= self.hi_page:
+            self.marked.add(origin)
+
+    def __call__(self, cpu, op, ea):
+        name, mode, _, _ = OPCODES[op]
+        mem, taint, reg = cpu.mem, self.taint, self.reg
+        pc = cpu.pc
+        self.executed.add(pc)
+
+        # Pointer uses: the high byte's origin is an address high byte
+        if mode == IZY or mode == IZX:
+            z = mem[pc + 1] + (cpu.x if mode == IZX else 0) + 1 & 0xFF
+            self._mark(taint[z], mem[z])
+        elif mode == IND:
+            word = mem[pc + 1] | (mem[pc + 2] << 8)
+            hi_addr = (word & 0xFF00) | (word + 1 & 0xFF)
+            self._mark(taint[hi_addr], mem[hi_addr])
+        if mode in ABSOLUTE_MODES:
+            self._mark(taint[pc + 2], mem[pc + 2])
+        if name == 'RTS' or name == 'RTI':
+            hi_addr = 0x100 | (cpu.sp + (2 if name == 'RTS' else 3) & 0xFF)
+            self._mark(taint[hi_addr], mem[hi_addr])
+
+        if ea is not None and mode != REL and name not in ('JMP', 'JSR'):
+            src = taint[ea]
+            if self.start <= ea <= self.end and name not in STORES:
+                self.data_reads.add(ea)
+        else:
+            src = -1
+
+        # Propagation
+        if name in LOADS:
+            reg['a' if name != 'LDX' and name != 'LDY' else name[2].lower()] = src
+            if name == 'LAX':
+                reg['x'] = src
+        elif name in STORES:
+            taint[ea] = reg[STORES[name]]
+            if ea < 0x100:
+                self.zp_writes.add(ea)
+        elif name == 'SAX':
+            taint[ea] = reg['a'] if reg['a'] >= 0 else reg['x']
+        elif name in ALU:
+            if reg['a'] < 0:
+                reg['a'] = src
+        elif name in TRANSFERS:
+            dst, s = TRANSFERS[name]
+            reg[dst] = reg[s]
+        elif name == 'PHA':
+            taint[0x100 | cpu.sp] = reg['a']
+        elif name == 'PLA':
+            reg['a'] = taint[0x100 | (cpu.sp + 1 & 0xFF)]
+        elif name in ('PHP', 'JSR', 'BRK'):
+            for i in range(3):
+                taint[0x100 | (cpu.sp - i & 0xFF)] = -1
+        elif name in SHIFTS or name in ('DCP', 'ISC'):
+            if mode == mos6502.ACC:
+                reg['a'] = -1
+            else:
+                taint[ea] = -1
+                if name not in ('DCP', 'ISC'):
+                    reg['a'] = -1
+        elif name in ('TSX', 'ANC', 'ALR', 'ARR'):
+            reg['x' if name == 'TSX' else 'a'] = -1
+        elif name == 'SBX':
+            reg['x'] = -1
+
+
+def new_cpu(tune, writes=None):
+    cpu = mos6502.CPU()
+    cpu.load(tune.load, tune.data)
+    if writes is not None:
+        cpu.add_write_hook(*SID_REGS, lambda addr, value: writes.append((addr, value)))
+    for addr in KERNAL_IRQ_EXITS:
+        cpu.traps[addr] = lambda c: c.return_from_subroutine() or True
+    return cpu
+
+
+def run_tune(tune, song, frames, tracer=None, writes=None, until_loop=False):
+    """init(song) + up to frames play calls.
+
+    Returns (cycles of every call, loop). With until_loop, loop is
+    (first, repeat) once the RAM after play call `repeat` equals the RAM
+    after call `first` (0 = after init), and the run stops there; else
+    loop is None.
+    """
+    cpu = new_cpu(tune, writes)
+    cpu.tracer = tracer
+    calls = [cpu.call(tune.init, a=song - 1, x=0, y=0)]
+    play = tune.play or cpu.mem[0x0314] | (cpu.mem[0x0315] << 8)
+    seen = {}
+    for frame in range(frames + 1):
+        if until_loop:
+            state = hashlib.blake2b(cpu.mem, digest_size=16).digest()
+            if state in seen:
+                return calls, (seen[state], frame)
+            seen[state] = frame
+        if frame == frames:
+            break
+        calls.append(cpu.call(play))
+        if writes is not None:
+            writes.append(None)        # frame boundary
+    return calls, None
+
+
+def songs_to_run(tune, song):
+    return [song] if song else list(range(1, tune.songs + 1))
+
+
+def find_relocations(tune, frames, songs):
+    """Tune-relative offsets of every address high byte, plus scan stats.
+
+    stats['reference'] holds each song's (SID writes, call cycles, loop)
+    from the traced run, for verify(); stats['untraced'] the patched
+    static operands whose instruction the trace never executed.
+    """
+    tracer = TaintTracer(tune)
+    reference = {}
+    for song in songs:
+        writes = []
+        calls, loop = run_tune(tune, song, frames, tracer, writes, until_loop=True)
+        reference[song] = writes, calls, loop
+        tracer.taint[tune.load:tune.load + len(tune.data)] = \
+            range(tune.load, tune.load + len(tune.data))
+        tracer.reg = dict.fromkeys(tracer.reg, -1)
+
+    mem = bytearray(65536)
+    mem[tune.load:tune.load + len(tune.data)] = tune.data
+    code, operands = static_scan(mem, [tune.init, tune.play], page_range(tune))
+    dropped = {o for o in operands
+               if any(b in tracer.data_reads for b in range(o - 2, o + 1))}
+    static = operands - dropped
+    stats = {'static': len(static), 'dynamic': len(tracer.marked),
+             'dynamic_only': len(tracer.marked - static), 'dropped': len(dropped),
+             'zp': sorted(tracer.zp_writes), 'reference': reference,
+             'untraced': sorted(o for o in static if o - 2 not in tracer.executed),
+             'coverage': (len(code.keys() & tracer.executed), len(code))}
+    return sorted(a - tune.load for a in static | tracer.marked), stats
+
+
+def relocate(tune, offsets, base):
+    """Copy of tune moved to base (same low byte as the load address)."""
+    delta = (base - tune.load) >> 8
+    data = bytearray(tune.data)
+    for off in offsets:
+        data[off] = data[off] + delta & 0xFF
+    shift = delta << 8 & 0xFFFF
+    return tune._replace(data=bytes(data), load=base, init=tune.init + shift & 0xFFFF,
+                         play=tune.play + shift & 0xFFFF if tune.play else 0)
+
+
+def verify(tune, moved, reference):
+    """Compare SID writes and per-call cycles with the original's (see the
+    module docstring for the window); returns (writes compared, error or None)."""
+    total = 0
+    for song, (a, ca, loop) in reference.items():
+        frames = len(ca) - 1
+        if loop is None:
+            frames *= VERIFY_FACTOR
+            a = []
+            ca, _ = run_tune(tune, song, frames, writes=a)
+        b = []
+        cb, moved_loop = run_tune(moved, song, frames, writes=b, until_loop=loop is not None)
+        hint = '' if loop else ' (the trace did not reach it: raise --frames)'
+        if a != b:
+            i = next(i for i, (x, y) in enumerate(zip(a + [0], b + [0])) if x != y)
+            frame = a[:i].count(None)
+            return total, f"song {song}: SID writes differ at frame {frame} (write #{i}){hint}"
+        if ca != cb:
+            i = next(i for i, (x, y) in enumerate(zip(ca, cb)) if x != y)
+            return total, f"song {song}: call {i} took {cb[i]} cycles, not {ca[i]}{hint}"
+        if moved_loop != loop:
+            return total, (f"song {song}: the original repeats frame {loop[0]} at "
+                           f"frame {loop[1]}, the relocated tune does not")
+        total += len(a) - frames
+    return total, None
+
+
+def check_relocation(tune, base, songs, frames):
+    """Trace, relocate and verify; returns (offsets, untraced operands, report lines).
+
+    Exits with the first difference when the check fails.
+    """
+    offsets, stats = find_relocations(tune, frames, songs)
+    moved = relocate(tune, offsets, base)
+    report = [f"${tune.load:04X}-${tune.load + len(tune.data) - 1:04X} -> "
+              f"${base:04X}-${base + len(tune.data) - 1:04X}: {len(offsets)} bytes patched "
+              f"({stats['static']} static operands, {stats['dynamic']} traced, "
+              f"{stats['dynamic_only']} trace-only, {stats['dropped']} static dropped as data)"]
+    if stats['zp']:
+        report.append("zero page written: " + ' '.join(f"${z:02X}" for z in stats['zp']))
+    unlooped = []
+    for song, (_, calls, loop) in stats['reference'].items():
+        if loop:
+            report.append(f"song {song}: traced {loop[1]} frames, loops back to frame {loop[0]}")
+        else:
+            report.append(f"song {song}: no loop within {len(calls) - 1} frames")
+            unlooped.append(song)
+    traced, reachable = stats['coverage']
+    report.append(f"trace ran {traced} of {reachable} statically reachable instructions")
+    if stats['untraced']:
+        report.append(f"{len(stats['untraced'])} patched operands in code the trace never "
+                      f"ran (static analysis only, --verbose lists them)")
+
+    writes, error = verify(tune, moved, stats['reference'])
+    if error:
+        print('\n'.join(report))
+        raise SystemExit(f"check failed: {error}")
+    if unlooped:
+        report.append(f"partial check: {writes} SID writes identical for {VERIFY_FACTOR}x "
+                      f"the traced frames, but song(s) {', '.join(map(str, unlooped))} "
+                      f"never looped: later frames are unchecked")
+    else:
+        report.append(f"checked: {writes} SID writes identical through the loop of "
+                      f"{len(songs)} song(s)")
+    return offsets, stats['untraced'], report
+
+
+def cache_path(input_path, tune, base, songs, frames):
+    """Cache file for one relocation, keyed by the input's SHA-256, the
+    base, the traced songs/frames, the .bin addresses and this tool's and
+    the 6502 core's source (a fix to either re-checks every tune)."""
+    h = hashlib.sha256()
+    for path in (input_path, __file__, mos6502.__file__):
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    h.update(repr((base, songs, frames, tune.load, tune.init, tune.play)).encode())
+    return os.path.join(CACHE_DIR, f'sid_relocate_{h.hexdigest()[:16]}.json')
+
+
+def load_cached(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached(path, entry):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def auto_base(tune, replace):
+    """First page-aligned base, low byte preserved, in a free map gap."""
+    index = sid_fit.memory_map(replace)
+    size = len(tune.data)
+    for start, end in index.free(kinds=('used', 'warn')):
+        base = (start & 0xFF00) | (tune.load & 0xFF)
+        if base < start:
+            base += 0x100
+        if base + size - 1 <= end:
+            return base
+    raise ValueError(f"no free gap for {size} bytes (try --replace or --base)")
+
+
+def write_tune(path, tune):
+    """Write a .sid with updated addresses (if the input had a header) or raw .bin."""
+    if tune.header is None:
+        out = tune.data
+    else:
+        header = bytearray(tune.header)
+        if struct.unpack('>H', header[8:10])[0] == 0:
+            header[-2:] = struct.pack('<H', tune.load)
+        else:
+            header[8:10] = struct.pack('>H', tune.load)
+        header[10:14] = struct.pack('>HH', tune.init, tune.play)
+        out = bytes(header) + tune.data
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def parse_addr(text):
+    return int(text.lstrip('$'), 16)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Relocate a SID tune by whole pages and verify it by emulation.')
+    parser.add_argument('input', help='.sid file, or raw .bin (see --load/--init/--play)')
+    parser.add_argument('--base', required=True,
+                        help="new load address in hex, or 'auto' (free gap in the memory map)")
+    parser.add_argument('-o', '--output', help='output file (default: build/<name>_<base>.*)')
+    parser.add_argument('--load', type=parse_addr, help='raw .bin load address (default 9000)')
+    parser.add_argument('--init', type=parse_addr, help='raw .bin init address (default C000)')
+    parser.add_argument('--play', type=parse_addr, help='raw .bin play address (default C475)')
+    parser.add_argument('--song', type=int, default=0,
+                        help='trace only this subtune (default: all)')
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES,
+                        help=f'trace at most this many play calls per subtune, '
+                             f'stopping earlier when the song loops (default {DEFAULT_FRAMES})')
+    parser.add_argument('--replace', default=sid_fit.DEFAULT_REPLACE,
+                        help='segment the tune may overwrite with --base auto')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the cached result and trace and check again')
+    parser.add_argument('--verbose', action='store_true',
+                        help='list every patched byte and untraced operand')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    tune = load_tune(args.input, args.load, args.init, args.play)
+    try:
+        base = auto_base(tune, args.replace) if args.base == 'auto' else parse_addr(args.base)
+    except ValueError as e:
+        parser.error(str(e))
+    if base & 0xFF != tune.load & 0xFF:
+        parser.error(f"base ${base:04X} must keep the load address low byte "
+                     f"(${tune.load & 0xFF:02X})")
+    if base + len(tune.data) > 0x10000:
+        parser.error(f"tune does not fit below $FFFF at ${base:04X}")
+
+    songs = songs_to_run(tune, args.song)
+    path = cache_path(args.input, tune, base, songs, args.frames)
+    cached = None if args.force else load_cached(path)
+    if cached:
+        offsets, untraced, report = cached['offsets'], cached['untraced'], cached['report']
+        report.append("(cached result for this input and base: --force re-traces)")
+    else:
+        offsets, untraced, report = check_relocation(tune, base, songs, args.frames)
+        save_cached(path, {'offsets': offsets, 'untraced': untraced, 'report': report})
+    moved = relocate(tune, offsets, base)
+    print('\n'.join(report))
+    if args.verbose:
+        for off in offsets:
+            print(f"  ${tune.load + off:04X}: ${tune.data[off]:02X} -> ${moved.data[off]:02X}")
+        if untraced:
+            print("untraced: " + ' '.join(f"${a:04X}" for a in untraced))
+
+    output = args.output
+    if output is None:
+        stem = os.path.splitext(os.path.basename(args.input))[0]
+        ext = '.sid' if tune.header is not None else '.bin'
+        output = os.path.join(BUILD_DIR, f'{stem}_{base:04X}{ext}')
+    write_tune(output, moved)
+    print(f"-> {output} (init ${moved.init:04X}, play ${moved.play:04X}, "
+          f"{time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
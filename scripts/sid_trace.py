@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+sid_trace.py — Record SID register-write traces of the music and the
+tutor's sound effects on a headless 6502, diff them against goldens and
+render them to WAV.
+
+Usage:
+    python scripts/sid_trace.py                       # every scenario vs its golden
+    python scripts/sid_trace.py --golden              # (re)record the goldens
+    python scripts/sid_trace.py sweep beep --dump     # print the writes
+    python scripts/sid_trace.py music --frames 1500 --wav build/sid_wav
+
+Scenarios, one call per PAL frame (50 Hz, 19656 cycles):
+    music   init (A = --song - 1) then play, from assets/swamp_sollies.bin
+            at the sid_data.asm addresses (sid_relocate.load_tune)
+    sweep   MatrixRain.init_sid_sweep, update_sid_sweep for TOTAL_FRAMES
+            frames, then silence_sid: the Matrix Rain transition's voice 2
+    beep    AsmView.asm_step_beep, one single-step
+    chime   a step's beep, then AsmView.asm_step_chime 10 frames later as
+            the RTS step plays it (the chime sets no volume or ADSR itself)
+The effect scenarios run the tutor from build/main.prg on c64_machine.Machine,
+so they follow whatever the current build does.
+
+A trace is a NumPy structured array (TRACE_DTYPE), one record per write
+to $D400-$D418: frame, cycle inside that frame, register (0-24), value.
+The cycle is taken from the CPU's counter after the writing instruction,
+with each frame's call starting on its frame boundary (later, if the
+previous call overran). Goldens are .npy files in tests/sid_golden/,
+tracked in git so every checkout diffs against the same traces, and
+compare byte for byte; the first differing write is reported. A
+scenario without a golden fails: record it with --golden and commit it.
+
+--wav renders a trace through a simplified SID: per-sample register state
+from the write times, phase-accumulator oscillators (triangle, saw,
+pulse, noise; combined waveforms are averaged, sync and ring modulation
+are ignored), a linear ADSR envelope per gate segment with the SID's
+rate tables, master volume and no filter. Good enough to hear that a
+sweep sweeps or a beep beeps; not a reSID replacement.
+"""
+
+import argparse
+import functools
+import os
+import sys
+import wave
+
+import numpy as np
+
+import kick_symbols
+import sid_relocate
+from c64_machine import FRAME_CYCLES, PRG_PATH, Machine
+from mos6502 import CPUError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, 'tests', 'sid_golden')
+TUNE_PATH = os.path.join(ROOT, 'assets', 'swamp_sollies.bin')
+
+SID_BASE = 0xD400
+SID_WRITABLE = 25                     # $D400-$D418
+PAL_CLOCK = 985248                    # Hz
+SAMPLE_RATE = 44100
+MUSIC_FRAMES = 500                    # 10 s
+TAIL_FRAMES = 25                      # silence after an effect, for its release
+TRACE_DTYPE = np.dtype([('frame', '<u4'), ('cycle', '<u2'),
+                        ('reg', 'u1'), ('value', 'u1')])
+
+# SID envelope rates in ms: attack per 0 -> peak, decay / release per peak -> 0
+ATTACK_MS = (2, 8, 16, 24, 38, 56, 68, 80, 100, 250, 500, 800, 1000, 3000, 5000, 8000)
+DECAY_MS = (6, 24, 48, 72, 114, 168, 204, 240, 300, 750, 1500, 2400, 3000, 9000,
+            15000, 24000)
+
+
+# -- recording ----------------------------------------------------------------
+def record(cpu, schedule, frames):
+    """Call the routines schedule(frame) -> [addr] at the start of each
+    frame; returns (SID writes as a TRACE_DTYPE array, frames)."""
+    rows = []
+    frame = 0
+
+    def write(addr, value):
+        cpu.mem[addr] = value
+        rows.append((frame, min(cpu.cycles - frame * FRAME_CYCLES, 0xFFFF),
+                     addr - SID_BASE, value))
+
+    cpu.add_write_hook(SID_BASE, SID_BASE + SID_WRITABLE - 1, write)
+    for frame in range(frames):
+        cpu.cycles = max(cpu.cycles, frame * FRAME_CYCLES)
+        for addr in schedule(frame):
+            cpu.call(addr)
+    return np.array(rows, dtype=TRACE_DTYPE), frames
+
+
+def music(args, frames):
+    tune = sid_relocate.load_tune(args.tune)
+    cpu = sid_relocate.new_cpu(tune)
+    cpu.a, cpu.x, cpu.y = args.song - 1, 0, 0
+
+    def schedule(frame):
+        if frame == 0:
+            return [tune.init, play()]
+        return [play()]
+
+    def play():       # an RSID-style init installs its IRQ handler as the player
+        return tune.play or cpu.mem[0x0314] | (cpu.mem[0x0315] << 8)
+    return record(cpu, schedule, frames or MUSIC_FRAMES)
+
+
+@functools.lru_cache(maxsize=None)
+def load_machine(prg, sym):
+    return Machine(prg, kick_symbols.symbol_index(sym))
+
+
+def tutor(args):
+    machine = load_machine(args.prg, args.sym)
+    machine.reset()
+    return machine
+
+
+def sweep(args, frames):
+    m = tutor(args)
+    init, update, silence = (m.sym(f'MatrixRain.{name}') for name in (
+        'init_sid_sweep', 'update_sid_sweep', 'silence_sid'))
+    length = m.sym('TOTAL_FRAMES')
+
+    def schedule(frame):
+        return ([init, update] if frame == 0 else [update] if frame < length
+                else [silence] if frame == length else [])
+    return record(m.cpu, schedule, frames or length + 1 + TAIL_FRAMES)
+
+
+def effect(events):
+    """Scenario calling the routines in events {frame: [label]} on the tutor."""
+    def run(args, frames):
+        m = tutor(args)
+        calls = {frame: [m.sym(label) for label in labels]
+                 for frame, labels in events.items()}
+        return record(m.cpu, lambda frame: calls.get(frame, []),
+                      frames or max(events) + 1 + TAIL_FRAMES)
+    return run
+
+
+SCENARIOS = {
+    'music': music,
+    'sweep': sweep,
+    'beep': effect({0: ['AsmView.asm_step_beep']}),
+    'chime': effect({0: ['AsmView.asm_step_beep'], 10: ['AsmView.asm_step_chime']}),
+}
+
+
+# -- goldens ------------------------------------------------------------------
+def golden_path(name, directory=GOLDEN_DIR):
+    return os.path.join(directory, f'{name}.npy')
+
+
+def save_golden(path, trace):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, trace)
+
+
+def diff(golden, trace):
+    """None if identical, else a description of the first differing write."""
+    if golden.dtype != trace.dtype:
+        return f"golden has dtype {golden.dtype}, expected {TRACE_DTYPE}"
+    if golden.tobytes() == trace.tobytes():
+        return None
+    n = min(len(golden), len(trace))
+    differ = np.flatnonzero(golden[:n] != trace[:n])
+    i = int(differ[0]) if len(differ) else n
+    if i == n:
+        longer, what = (golden, 'golden') if len(golden) > n else (trace, 'trace')
+        return (f"{what} has {abs(len(golden) - len(trace))} more writes, "
+                f"from {write_str(longer[n])}")
+    return f"write #{i}: {write_str(trace[i])}, golden {write_str(golden[i])}"
+
+
+def write_str(w):
+    return (f"frame {int(w['frame'])} cycle {int(w['cycle'])} "
+            f"${SID_BASE + int(w['reg']):04X}=${int(w['value']):02X}")
+
+
+# -- rendering ----------------------------------------------------------------
+def register_timeline(trace, n, rate=SAMPLE_RATE):
+    """(25, n) uint8 array: every register's value at each output sample."""
+    cycles = trace['frame'].astype(np.int64) * FRAME_CYCLES + trace['cycle']
+    pos = cycles * rate // PAL_CLOCK
+    state = np.zeros((SID_WRITABLE, n), dtype=np.uint8)
+    samples = np.arange(n)
+    for reg in range(SID_WRITABLE):
+        sel = trace['reg'] == reg
+        if not sel.any():
+            continue
+        idx = np.searchsorted(pos[sel], samples, side='right') - 1
+        values = trace['value'][sel]
+        state[reg] = np.where(idx >= 0, values[np.maximum(idx, 0)], 0)
+    return state
+
+
+def oscillator(freq, pw, ctrl, rate):
+    """Waveform in -1..1 from per-sample 16-bit frequency, 12-bit pulse width
+    and control register arrays."""
+    acc = np.cumsum(freq * (PAL_CLOCK / 2 ** 24 / rate))     # periods elapsed
+    phase = acc % 1.0
+    steps = (acc * 16).astype(np.int64)                     # noise: 16 values a period
+    noise = np.random.default_rng(0).uniform(-1, 1, 4096)[steps % 4096]
+    waves = ((0x10, 1 - 4 * np.abs(phase - 0.5)), (0x20, 2 * phase - 1),
+             (0x40, np.where(phase < pw / 4096, 1.0, -1.0)), (0x80, noise))
+    out = np.zeros(len(freq))
+    count = np.zeros(len(freq))
+    for bit, wave_ in waves:
+        on = (ctrl & bit) != 0
+        out += np.where(on, wave_, 0)
+        count += on
+    out = np.divide(out, count, out=np.zeros_like(out), where=count > 0)
+    return np.where(ctrl & 0x08, 0, out)               # test bit holds the oscillator
+
+
+def envelope(gate, ad, sr, rate):
+    """Linear ADSR level 0..1 per sample, one vectorised pass per segment of
+    constant gate / AD / SR."""
+    n = len(gate)
+    level = np.zeros(n)
+    edges = np.flatnonzero((np.diff(gate) != 0) | (np.diff(ad) != 0) | (np.diff(sr) != 0)) + 1
+    start, phase = 0.0, 'release'
+    for a, b in zip(np.r_[0, edges], np.r_[edges, n]):
+        t = np.arange(b - a) * (1000 / rate)                    # ms into the segment
+        if not gate[a]:
+            phase = 'release'
+            seg = np.maximum(start - t / DECAY_MS[sr[a] & 0x0F], 0)
+        else:
+            if phase == 'release':
+                phase = 'attack'
+            rise, fall = ATTACK_MS[ad[a] >> 4], DECAY_MS[ad[a] & 0x0F]
+            sustain = (sr[a] >> 4) / 15
+            if phase == 'attack':
+                peak = (1 - start) * rise
+                seg = np.where(t < peak, start + t / rise,
+                               np.maximum(1 - (t - peak) / fall, sustain))
+                if t[-1] >= peak:
+                    phase = 'decay'
+            else:                      # the SID never climbs back up to a raised sustain
+                seg = np.maximum(start - t / fall, min(start, sustain))
+        level[a:b] = seg
+        start = float(seg[-1])
+    return level
+
+
+def render(trace, frames, rate=SAMPLE_RATE):
+    """Mono float samples in -1..1 for frames PAL frames of the trace."""
+    n = frames * FRAME_CYCLES * rate // PAL_CLOCK
+    regs = register_timeline(trace, n, rate).astype(np.int64)
+    mix = np.zeros(n)
+    for voice in range(3):
+        r = regs[voice * 7:voice * 7 + 7]
+        freq = r[0] | r[1] << 8
+        pw = r[2] | (r[3] & 0x0F) << 8
+        ctrl = r[4]
+        mix += oscillator(freq, pw, ctrl, rate) * envelope(ctrl & 1, r[5], r[6], rate)
+    return mix / 3 * (regs[0x18] & 0x0F) / 15
+
+
+def write_wav(path, samples, rate=SAMPLE_RATE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record SID write traces, diff them against goldens, render WAVs.')
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"default: all ({', '.join(SCENARIOS)})")
+    parser.add_argument('--prg', default=PRG_PATH)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH)
+    parser.add_argument('--tune', default=TUNE_PATH, help='tune for the music scenario')
+    parser.add_argument('--song', type=int, default=1)
+    parser.add_argument('--frames', type=int,
+                        help=f'frames to record (default: music {MUSIC_FRAMES}, '
+                             f'effects until {TAIL_FRAMES} frames after they end)')
+    parser.add_argument('--golden-dir', default=GOLDEN_DIR)
+    parser.add_argument('--golden', action='store_true',
+                        help='save the traces as the new goldens')
+    parser.add_argument('--wav', metavar='DIR', help='render <scenario>.wav files into DIR')
+    parser.add_argument('--dump', action='store_true', help='print every write')
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(sorted(unknown))}")
+
+    failed = False
+    for name in args.scenarios or SCENARIOS:
+        try:
+            trace, frames = SCENARIOS[name](args, args.frames)
+        except (OSError, KeyError, ValueError, CPUError) as e:
+            print(f"{name}: ERROR {e}")
+            failed = True
+            continue
+        summary = f"{name}: {len(trace)} writes, {frames} frames"
+        if args.dump:
+            for w in trace:
+                print(f"  {write_str(w)}")
+        if args.wav:
+            path = os.path.join(args.wav, f'{name}.wav')
+            write_wav(path, render(trace, frames))
+            summary += f" -> {path}"
+
+        path = golden_path(name, args.golden_dir)
+        if args.golden:
+            save_golden(path, trace)
+            print(f"{summary}, golden saved -> {path}")
+        elif not os.path.exists(path):
+            print(f"{summary}, MISSING golden {path} (record it with --golden)")
+            failed = True
+        else:
+            problem = diff(np.load(path, allow_pickle=False), trace)
+            print(f"{summary}, {'MATCH' if problem is None else 'DIFF ' + problem}")
+            failed |= problem is not None
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+step_difftest.py — Differential test of the ASM view step-through engine
+(AsmView.asm_step_execute_one) against the generated code run for real.
+
+Usage:
+    python scripts/step_difftest.py                    # all 0-1 slot programs + 5000 random
+    python scripts/step_difftest.py --exhaustive 2 -n 50000 -j 8
+    python scripts/step_difftest.py --as-built --show 5
+
+Each program is laid out at GEN_CODE_BUF / ASM_META_BUF on the headless
+C64 (scripts/c64_machine.py), then stepped two ways from the same memory:
+  tutor      asm_step_init, then asm_step_execute_one once per step,
+             with its shadow registers zp_asm_reg_a/x/y/sp/flags
+  reference  a second machine running the bytes at GEN_CODE_BUF on the
+             6502 core, from A = X = Y = 0, SP = $FF, P = the shadow flags
+Before every step the reference must sit on instruction #zp_asm_cursor of
+the generated code; after it both are compared:
+  pc        the stepper went to a different instruction than the CPU
+            (a branch it did not take, a jump it did not follow)
+  reg       A, X, Y or SP differ
+  flags     N, V, D, I, Z or C differ (B and the unused bit are ignored)
+  write     a byte the CPU stored holds a different value in the tutor,
+            or the VIC register writes of the step differ
+  end       the stepper stopped (RTS) where the CPU did not, or never did
+  crash     either side hit an unsupported opcode or did not return
+Jumps the stepper makes on purpose are followed, not reported: when it
+skips ahead over a WAIT loop the reference runs to the same instruction
+(every zero-page counter a skipped DEC touches is first set to 1, so the
+loop exits after one pass with the state it would have after all of
+them), and after the first LOOP BACK both machines get zp_stop_flag = $FF
+so the second pass takes the exit. JSR targets are opaque to the stepper;
+CHROUT is a trap on the reference too. The renderer and SID beeps are
+stubbed out, so a step costs a few hundred cycles.
+
+By default the code and metadata come from the codegen_fuzz.py Model,
+i.e. what codegen_run should emit, so only the stepper is under test
+(codegen_run's own slips, e.g. metadata offsets recorded after each
+instruction instead of at its start, are codegen_fuzz.py's to report).
+--as-built runs codegen_run and steps whatever it produced.
+
+Failures are grouped by kind and mnemonic, shortest programs first, with
+the disassembly around the first divergence.
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import kick_symbols
+from c64_machine import META_SIZE, PRG_PATH, Machine, block_types
+from codegen_fuzz import Model, all_slots, describe, param_ranges, programs, tasks
+from mos6502 import ACC, OPCODES, CPUError, disassemble
+
+FLAG_MASK = 0xCF           # N V - B D I Z C, without B and the unused bit
+UNUSED_FLAG = 0x20
+OP_RTS = 0x60
+OP_DEC_ZP = 0xC6
+STORES = {'STA', 'STX', 'STY', 'DEC', 'INC', 'ASL', 'LSR', 'ROL', 'ROR'}
+STEP_CYCLES = 10_000       # one instruction plus a trapped JSR
+SKIP_CYCLES = 200_000      # a WAIT loop with its counters cut to one pass
+STUBS = ('AsmView.asm_view_render', 'AsmView.asm_step_beep', 'AsmView.asm_step_chime')
+CONTEXT = 2
+
+
+class Divergence(Exception):
+    def __init__(self, kind, detail):
+        super().__init__(detail)
+        self.kind = kind
+        self.detail = detail
+
+
+class StepTest:
+    """A tutor and a reference Machine on the same PRG, stepped in lockstep."""
+
+    def __init__(self, prg, symbols, as_built=False):
+        self.tutor = Machine(prg, symbols)
+        self.ref = Machine(prg, symbols)
+        self.model = None if as_built else Model(symbols)
+        for name in STUBS:
+            self.tutor.stub(name)
+        sym = self.tutor.sym
+        self.init = sym('AsmView.asm_step_init')
+        self.execute_one = sym('AsmView.asm_step_execute_one')
+        self.zp_state = sym('zp_state')
+        self.zp_cursor = sym('zp_asm_cursor')
+        self.zp_regs = sym('zp_asm_reg_a')     # a, x, y, sp, flags in a row
+        self.state_stepping = sym('STATE_ASM_STEPPING')
+        self.state_view = sym('STATE_ASM_VIEW')
+        self.writes = []
+        self.ref.cpu.tracer = self._trace
+
+    def _trace(self, cpu, op, ea):
+        name, mode, _, _ = OPCODES[op]
+        if name in STORES and mode != ACC:
+            self.writes.append(ea)
+
+    # -- setup -----------------------------------------------------------
+    def prepare(self, slots):
+        """Lay out the program and run asm_step_init; (instruction addresses, meta)."""
+        t = self.tutor
+        base, mem = t.gen_code_buf, t.cpu.mem
+        if self.model:
+            t.reset()
+            t.set_slots(slots)
+            code, entries = self.model.build(slots)
+            meta = b''.join(entries)
+            mem[base:base + len(code)] = code
+            mem[t.asm_meta_buf:t.asm_meta_buf + len(meta)] = meta
+            mem[t.zp_inst_count] = len(entries)
+        else:
+            r = t.codegen(slots, execute=False, max_cycles=100_000)
+            code, meta = r.code, r.meta
+        starts, addr = [], base
+        while addr < base + len(code):
+            starts.append(addr)
+            addr += disassemble(mem, addr)[1]
+        t.call(self.init)
+        mem[self.zp_state] = self.state_stepping
+
+        ref = self.ref.cpu
+        ref.mem[:] = mem
+        ref.a = ref.x = ref.y = 0
+        ref.sp = 0xFF
+        ref.p = mem[self.zp_regs + 4] | UNUSED_FLAG
+        ref.pc = base
+        return starts, meta
+
+    # -- stepping --------------------------------------------------------
+    def step_ref(self, starts, limit=STEP_CYCLES):
+        """Run the reference until it is on an instruction of the generated code."""
+        cpu, at = self.ref.cpu, set(starts)
+        end = cpu.cycles + limit
+        cpu.step()
+        while cpu.pc not in at:
+            if cpu.cycles > end:
+                raise Divergence('crash', f"reference left the generated code "
+                                          f"(PC ${cpu.pc:04X})")
+            cpu.step()
+
+    def skip_ref(self, starts, cursor, target):
+        """Follow the stepper over a WAIT loop: run to starts[target] quickly."""
+        cpu = self.ref.cpu
+        for addr in starts[cursor:target]:
+            if cpu.mem[addr] == OP_DEC_ZP:
+                cpu.mem[cpu.mem[addr + 1]] = 1
+        end = cpu.cycles + SKIP_CYCLES
+        while cpu.pc != starts[target]:
+            if cpu.cycles > end:
+                raise Divergence('pc', f"stepper skipped to #{target}, reference "
+                                       f"does not get there (PC ${cpu.pc:04X})")
+            cpu.step()
+
+    def compare(self):
+        t, ref = self.tutor.cpu, self.ref.cpu
+        a, x, y, sp, flags = t.mem[self.zp_regs:self.zp_regs + 5]
+        got, want = (a, x, y, sp), (ref.a, ref.x, ref.y, ref.sp)
+        if got != want:
+            diff = ', '.join(f"{r} ${g:02X} (CPU ${w:02X})"
+                             for r, g, w in zip('AXYS', got, want) if g != w)
+            raise Divergence('reg', diff.replace('S $', 'SP $'))
+        if (flags ^ ref.p) & FLAG_MASK:
+            raise Divergence('flags', f"flags {flag_str(flags)} (CPU {flag_str(ref.p)})")
+        for addr in self.writes:
+            if t.mem[addr] != ref.mem[addr]:
+                raise Divergence('write', f"${addr:04X} = ${t.mem[addr]:02X} "
+                                          f"(CPU ${ref.mem[addr]:02X})")
+        got, want = self.tutor.io, self.ref.io
+        if got != want:
+            raise Divergence('write', f"VIC writes {io_str(got)} (CPU {io_str(want)})")
+
+    def run(self, slots, max_steps=1000):
+        """None if the stepper matches the CPU, else (kind, mnemonic, detail, context)."""
+        try:
+            starts, meta = self.prepare(slots)
+        except CPUError as e:
+            return 'crash', '-', f"codegen: {e}", ''
+        t, ref = self.tutor, self.ref
+        count = len(meta) // META_SIZE
+        cursor = 0
+        looped = False
+        try:
+            for _ in range(max_steps):
+                cursor = t.cpu.mem[self.zp_cursor]
+                if cursor >= min(count, len(starts)):
+                    raise Divergence('end', f"stepper ran past the last instruction "
+                                            f"without an RTS")
+                self.writes.clear()
+                t.io.clear()
+                ref.io.clear()
+                t.call(self.execute_one, max_cycles=STEP_CYCLES)
+                if t.cpu.mem[self.zp_state] == self.state_view:
+                    if ref.cpu.mem[ref.cpu.pc] != OP_RTS:
+                        raise Divergence('end', "stepper stopped on a non-RTS instruction")
+                    return None
+                if ref.cpu.mem[ref.cpu.pc] == OP_RTS:
+                    raise Divergence('end', "stepper did not stop at RTS")
+                self.step_ref(starts)
+                after = t.cpu.mem[self.zp_cursor]
+                if cursor + 1 < after < len(starts):
+                    self.skip_ref(starts, cursor + 1, after)
+                if after >= len(starts) or ref.cpu.pc != starts[after]:
+                    pc = ref.cpu.pc
+                    raise Divergence('pc', f"stepper went to #{after}, CPU to "
+                                           f"#{starts.index(pc)} (${pc:04X})")
+                self.compare()
+                if after == 0 and cursor and not looped:
+                    looped = True
+                    t.cpu.mem[t.zp_stop_flag] = ref.cpu.mem[t.zp_stop_flag] = 0xFF
+            raise Divergence('end', f"no RTS after {max_steps} steps")
+        except CPUError as e:
+            kind, detail = 'crash', str(e)
+        except Divergence as d:
+            kind, detail = d.kind, d.detail
+        mem = ref.cpu.mem
+        mn = disassemble(mem, starts[cursor])[0].split()[0] if cursor < len(starts) else '-'
+        return kind, mn, detail, context(mem, starts, meta, cursor)
+
+
+def flag_str(p):
+    return ''.join(c if p & bit else '-' for c, bit in zip('NV-BDIZC', (
+        0x80, 0x40, 0x20, 0x10, 0x08, 0x04, 0x02, 0x01)) if c not in '-B')
+
+
+def io_str(io):
+    return ' '.join(f"${a:04X}=${v:02X}" for a, v in io) or '(none)'
+
+
+def context(mem, starts, meta, cursor):
+    """Disassembly of the instructions around #cursor, with their meta entries."""
+    lines = []
+    for i in range(max(0, cursor - CONTEXT), min(len(starts), cursor + CONTEXT + 1)):
+        addr = starts[i]
+        text, size = disassemble(mem, addr)
+        entry = meta[i * META_SIZE:(i + 1) * META_SIZE].hex(' ') or '(no meta)'
+        lines.append(f"{'>' if i == cursor else ' '} #{i:<3d} ${addr:04X}  "
+                     f"{mem[addr:addr + size].hex(' '):8s}  {text:14s} meta {entry}")
+    return '\n'.join(lines)
+
+
+# -- process pool -----------------------------------------------------------
+_worker = {}
+
+
+def _init(prg, sym, as_built):
+    symbols = kick_symbols.symbol_index(sym)
+    test = StepTest(prg, symbols, as_built)
+    _worker.update(test=test, slots=all_slots(param_ranges(test.tutor)))
+
+
+def _run(task, keep=3):
+    counts = collections.Counter()
+    examples = collections.defaultdict(list)
+    checked = 0
+    for slots in programs(task, _worker['slots']):
+        checked += 1
+        result = _worker['test'].run(slots)
+        if result:
+            kind, mn, detail, ctx = result
+            key = (kind, mn)
+            counts[key] += 1
+            if len(examples[key]) < keep:
+                examples[key].append((slots, detail, ctx))
+    return checked, counts, dict(examples)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Step the ASM view engine in lockstep with a 6502 core.')
+    parser.add_argument('--prg', default=PRG_PATH)
+    parser.add_argument('--sym', default=kick_symbols.SYM_PATH)
+    parser.add_argument('--exhaustive', type=int, default=1, metavar='N',
+                        help='enumerate every program of up to N slots (default 1)')
+    parser.add_argument('-n', '--random', type=int, default=5000,
+                        help='random programs of 0-16 slots (default 5000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--as-built', action='store_true',
+                        help="step codegen_run's output instead of the model's")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--show', type=int, default=1,
+                        help='programs to print per kind and mnemonic (default 1)')
+    args = parser.parse_args()
+
+    symbols = kick_symbols.symbol_index(args.sym)
+    names = {t: n for n, t in block_types(symbols).items()}
+    try:
+        choices = len(all_slots(param_ranges(Machine(args.prg, symbols))))
+    except (OSError, KeyError, ValueError) as e:
+        sys.exit(f"cannot load {args.prg}: {e}")
+
+    t0 = time.monotonic()
+    checked, counts = 0, collections.Counter()
+    examples = collections.defaultdict(list)
+    with ProcessPoolExecutor(args.jobs, initializer=_init,
+                             initargs=(args.prg, args.sym, args.as_built)) as pool:
+        for n, c, ex in pool.map(_run, tasks(choices, args.exhaustive,
+                                             args.random, args.seed)):
+            checked += n
+            counts.update(c)
+            for key, items in ex.items():
+                examples[key].extend(items)
+    elapsed = time.monotonic() - t0
+
+    print(f"{checked} programs in {elapsed:.1f}s ({checked / max(elapsed, 1e-9):.0f}/s)"
+          f"{', as built by codegen_run' if args.as_built else ''}")
+    for (kind, mn), n in counts.most_common():
+        print(f"\n{kind} at {mn}: {n} programs")
+        shortest = sorted(examples[kind, mn], key=lambda e: len(e[0]))[:args.show]
+        for slots, detail, ctx in shortest:
+            print(f"  {describe(slots, names)}\n      {detail}")
+            for line in ctx.split('\n'):
+                print(f"      {line}")
+    sys.exit(1 if counts else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,36 +3,93 @@
 
 Usage: python strip_sid_header.py <input.sid> <output.bin>
 Output is raw C64 binary (no load address), suitable for .import binary in KickAss.
+
+parse_sid_header() / read_sid_header() decode the v1-v4 header fields
+and are shared with sid_index.py; read_sid_header() reads only the
+header and the embedded load address, never the tune data.
 """
-import struct, sys
+import os, struct, sys
+
+HEADER_READ = 0x7C + 2      # largest header + embedded load address
+
+CLOCKS = ('unknown', 'PAL', 'NTSC', 'PAL+NTSC')
+SID_MODELS = ('unknown', '6581', '8580', '6581+8580')
 
-def strip_sid(inpath, outpath):
-    with open(inpath, 'rb') as f:
-        data = f.read()
 
+def _text(raw):
+    """Decode a 32-byte NUL-padded Latin-1 header string."""
+    return raw.split(b'\0', 1)[0].decode('latin-1')
+
+
+def parse_sid_header(data, file_size=None):
+    """Parse a PSID/RSID header from the first bytes of a file.
+
+    data must hold at least the header plus 2 bytes (HEADER_READ is
+    always enough). file_size, if given, is used to compute the size of
+    the C64 data without reading it. Returns a dict; raises ValueError
+    for anything that is not a complete header.
+    """
     magic = data[0:4]
     if magic not in (b'PSID', b'RSID'):
         raise ValueError(f"Not a SID file (magic: {magic!r})")
+    if len(data) < 0x76:
+        raise ValueError(f"Truncated SID header ({len(data)} bytes)")
 
-    version = struct.unpack('>H', data[4:6])[0]
-    header_size = struct.unpack('>H', data[6:8])[0]
-    load_addr_header = struct.unpack('>H', data[8:10])[0]
-    init_addr = struct.unpack('>H', data[10:12])[0]
-    play_addr = struct.unpack('>H', data[12:14])[0]
-
-    print(f"SID v{version}, header={header_size} bytes")
-    print(f"Load=${load_addr_header:04X}, Init=${init_addr:04X}, Play=${play_addr:04X}")
-
-    payload = data[header_size:]
+    (version, header_size, load_addr_header, init_addr, play_addr,
+     songs, start_song, speed) = struct.unpack('>HHHHHHHI', data[4:22])
+    if not 0x76 <= header_size <= len(data):
+        raise ValueError(f"Bad SID header size {header_size} ({len(data)} bytes read)")
+    info = {
+        'magic': magic.decode(), 'version': version, 'header_size': header_size,
+        'load_addr_header': load_addr_header, 'init_addr': init_addr,
+        'play_addr': play_addr, 'songs': songs, 'start_song': start_song,
+        'speed': speed, 'name': _text(data[0x16:0x36]),
+        'author': _text(data[0x36:0x56]), 'released': _text(data[0x56:0x76]),
+        'flags': 0, 'start_page': 0, 'page_length': 0,
+    }
+    if version >= 2 and header_size >= 0x7C:
+        flags, start_page, page_length = struct.unpack('>HBB', data[0x76:0x7A])
+        info.update(flags=flags, start_page=start_page, page_length=page_length)
+    info['clock'] = CLOCKS[(info['flags'] >> 2) & 3]
+    info['sid_model'] = SID_MODELS[(info['flags'] >> 4) & 3]
 
     # If load address in header is 0, first 2 bytes of payload are the load address
     if load_addr_header == 0:
-        embedded_load = struct.unpack('<H', payload[0:2])[0]
-        print(f"Embedded load address: ${embedded_load:04X}")
-        raw = payload[2:]
+        if len(data) < header_size + 2:
+            raise ValueError("Truncated SID file: no load address after the header")
+        info['load_addr'] = struct.unpack('<H', data[header_size:header_size + 2])[0]
+        data_start = header_size + 2
     else:
-        embedded_load = load_addr_header
-        raw = payload
+        info['load_addr'] = load_addr_header
+        data_start = header_size
+    info['data_start'] = data_start
+    if file_size is not None:
+        info['data_size'] = max(file_size - data_start, 0)
+        info['load_end'] = info['load_addr'] + info['data_size'] - 1
+    return info
+
+
+def read_sid_header(path):
+    """Parse a .sid file's header with one bounded read."""
+    with open(path, 'rb') as f:
+        data = f.read(HEADER_READ)
+        size = os.fstat(f.fileno()).st_size
+    return parse_sid_header(data, size)
+
+
+def strip_sid(inpath, outpath):
+    with open(inpath, 'rb') as f:
+        data = f.read()
+
+    info = parse_sid_header(data, len(data))
+    print(f"SID v{info['version']}, header={info['header_size']} bytes")
+    print(f"Load=${info['load_addr_header']:04X}, Init=${info['init_addr']:04X}, "
+          f"Play=${info['play_addr']:04X}")
+
+    embedded_load = info['load_addr']
+    if info['load_addr_header'] == 0:
+        print(f"Embedded load address: ${embedded_load:04X}")
+    raw = data[info['data_start']:]
 
     print(f"Raw binary: {len(raw)} bytes (${len(raw):04X})")
     print(f"Range: ${embedded_load:04X}-${embedded_load + len(raw) - 1:04X}")
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+vice_binmon.py — Client for VICE's binary remote monitor (-binarymonitor,
+default port 6502).
+
+    mon = BinaryMonitor.connect(port=6502)
+    pc = mon.run_until(0x08A9)          # checkpoint, resume, wait for STOPPED
+    mon.mem_set(0x08, b'\\x02')
+    zp = mon.mem_get(0x02, 0x1D)         # one request, any length
+    snap = mon.snapshot()                # all of RAM in one request, cached
+    snap[0x08], snap.read(0x5000, 24)    # until the next resume
+    mon.resume()
+
+Every request carries an id and blocks only until the response with
+that id arrives; there are no fixed sleeps. Events (STOPPED, RESUMED,
+JAM, checkpoint hits, id 0xFFFFFFFF) can arrive at any time and update
+mon.running / mon.pc as they are read. Any command sent while the
+machine runs stops it (VICE enters the monitor); resume() leaves it.
+
+Protocol (API version 2), little-endian:
+    request   02 02 <body len:4> <request id:4> <command:1> <body>
+    response  02 02 <body len:4> <type:1> <error:1> <request id:4> <body>
+
+A Snapshot fetches its ranges (default: the whole 64 KB, $D000-$DFFF
+as the CPU sees it) with one request on first access and serves every
+later read from the cache. mon.epoch counts resumes; a snapshot from an
+older epoch raises instead of returning stale bytes, and mon.snapshot()
+hands out a fresh one after each stop. Writes go through to VICE and
+patch the cache.
+
+Command bodies are documented in VICE's "Binary Monitor" manual chapter;
+only the commands the test harness needs are wrapped here.
+"""
+
+import itertools
+import os
+import socket
+import struct
+import subprocess
+import time
+
+STX = 0x02
+API_VERSION = 0x02
+EVENT_ID = 0xFFFFFFFF
+DEFAULT_PORT = 6502
+
+# Command and response types
+MEM_GET = 0x01
+MEM_SET = 0x02
+CHECKPOINT_GET = 0x11
+CHECKPOINT_SET = 0x12
+CHECKPOINT_DELETE = 0x13
+REGISTERS_GET = 0x31
+REGISTERS_SET = 0x32
+DUMP = 0x41
+UNDUMP = 0x42
+ADVANCE_INSTRUCTIONS = 0x71
+PING = 0x81
+BANKS_AVAILABLE = 0x82
+REGISTERS_AVAILABLE = 0x83
+EXIT = 0xAA
+QUIT = 0xBB
+RESET = 0xCC
+AUTOSTART = 0xDD
+
+# Events
+EVENT_JAM = 0x61
+EVENT_STOPPED = 0x62
+EVENT_RESUMED = 0x63
+
+# Checkpoint CPU operations
+OP_LOAD, OP_STORE, OP_EXEC = 0x01, 0x02, 0x04
+
+MAIN_MEMSPACE = 0x00
+FULL_RANGE = ((0x0000, 0xFFFF),)
+IO_RANGE = (0xD000, 0xDFFF)
+
+ERRORS = {
+    0x01: 'object does not exist',
+    0x02: 'invalid memspace',
+    0x80: 'incorrect command length',
+    0x81: 'invalid parameter',
+    0x82: 'unsupported API version',
+    0x83: 'invalid command type',
+    0x8F: 'general failure',
+}
+
+
+class MonitorError(Exception):
+    pass
+
+
+class MonitorTimeout(MonitorError):
+    pass
+
+
+class BinaryMonitor:
+    """One connection to a VICE binary monitor."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = bytearray()
+        self.ids = itertools.count(1)
+        self.running = True
+        self.epoch = 0                 # bumped whenever the machine may run
+        self._snapshot = None
+        self.pc = None
+        self.jammed = False
+        self.checkpoint_hits = []
+        self._banks = None
+        self._registers = None
+
+    @classmethod
+    def connect(cls, host='127.0.0.1', port=DEFAULT_PORT, timeout=30.0):
+        """Connect, retrying until VICE has opened the port or timeout passes."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                sock = socket.create_connection((host, port), timeout=timeout)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise MonitorError(f"cannot connect to VICE binary monitor "
+                                       f"on {host}:{port}")
+                time.sleep(0.05)       # VICE still starting; not a per-command wait
+        # Requests are tiny and strictly request/response: don't let Nagle
+        # hold them back waiting for the previous ACK
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(sock)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- framing ------------------------------------------------------------
+    def _recv_exact(self, n, deadline):
+        while len(self.buf) < n:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                raise MonitorTimeout("timed out waiting for VICE")
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv(65536)
+            except socket.timeout:
+                raise MonitorTimeout("timed out waiting for VICE") from None
+            if not chunk:
+                raise MonitorError("VICE closed the monitor connection")
+            self.buf += chunk
+        data = bytes(self.buf[:n])
+        del self.buf[:n]
+        return data
+
+    def _read_message(self, deadline=None):
+        """Next (type, error, request id, body); events update state first."""
+        head = self._recv_exact(12, deadline)
+        stx, version, length, kind, error, req_id = struct.unpack('<BBIBBI', head)
+        if stx != STX:
+            raise MonitorError(f"bad frame start ${stx:02X}")
+        body = self._recv_exact(length, deadline)
+        if req_id == EVENT_ID:
+            self._event(kind, body)
+        return kind, error, req_id, body
+
+    def _event(self, kind, body):
+        if kind == EVENT_STOPPED:
+            self.running, self.pc = False, struct.unpack_from('<H', body)[0]
+        elif kind == EVENT_RESUMED:
+            self.running, self.pc = True, struct.unpack_from('<H', body)[0]
+            self.epoch += 1
+        elif kind == EVENT_JAM:
+            self.running, self.jammed = False, True
+            self.pc = struct.unpack_from('<H', body)[0]
+        elif kind == CHECKPOINT_GET:
+            self.checkpoint_hits.append(struct.unpack_from('<I', body)[0])
+
+    def request(self, command, body=b'', timeout=10.0):
+        """Send one command and return the body of its response."""
+        req_id = next(self.ids)
+        self.sock.sendall(struct.pack('<BBIIB', STX, API_VERSION, len(body), req_id,
+                                      command) + body)
+        deadline = time.monotonic() + timeout
+        while True:
+            kind, error, got_id, data = self._read_message(deadline)
+            if got_id != req_id:
+                continue
+            if error:
+                raise MonitorError(f"command ${command:02X}: "
+                                   f"{ERRORS.get(error, f'error ${error:02X}')}")
+            if command not in (EXIT, UNDUMP, RESET, AUTOSTART):
+                self.running = False
+            return data
+
+    # -- machine state ----------------------------------------------------------
+    def ping(self):
+        self.request(PING)
+
+    def resume(self):
+        """Leave the monitor; the machine runs until a checkpoint or command."""
+        self.running = True        # before sending: a STOPPED event may beat the reply
+        self.epoch += 1
+        self.request(EXIT)
+
+    def wait_stopped(self, timeout=20.0):
+        """Block until a STOPPED (or JAM) event; returns PC."""
+        deadline = time.monotonic() + timeout
+        while self.running:
+            self._read_message(deadline)
+        if self.jammed:
+            raise MonitorError(f"CPU jammed at ${self.pc:04X}")
+        return self.pc
+
+    def run_until(self, addr, timeout=20.0):
+        """Run to an exec checkpoint at addr; returns PC with the machine stopped.
+
+        On timeout the checkpoint is removed and MonitorTimeout raised
+        (the machine is stopped again by the delete).
+        """
+        cp = self.checkpoint_set(addr)
+        try:
+            self.resume()
+            return self.wait_stopped(timeout)
+        finally:
+            self.checkpoint_delete(cp)
+
+    def quit(self):
+        try:
+            self.request(QUIT, timeout=2.0)
+        except MonitorError:
+            pass
+
+    def reset(self, hard=False):
+        self.running = True
+        self.epoch += 1
+        self.request(RESET, bytes([1 if hard else 0]))
+
+    def autostart(self, path, run=True, index=0):
+        name = path.encode()
+        self.running = True
+        self.epoch += 1
+        self.request(AUTOSTART, struct.pack('<BHB', run, index, len(name)) + name)
+
+    # -- memory -------------------------------------------------------------------
+    def bank_id(self, name='cpu'):
+        """Bank number by name (cpu = what the CPU sees, I/O included)."""
+        if self._banks is None:
+            data = self.request(BANKS_AVAILABLE)
+            (count,), pos, self._banks = struct.unpack_from('<H', data), 2, {}
+            for _ in range(count):
+                size, bank, nlen = struct.unpack_from('<BHB', data, pos)
+                self._banks[data[pos + 4:pos + 4 + nlen].decode()] = bank
+                pos += size + 1
+        return self._banks[name]
+
+    def mem_get(self, start, end, bank='cpu', side_effects=False):
+        """Bytes start..end (inclusive) in one request."""
+        body = struct.pack('<BHHBH', side_effects, start, end, MAIN_MEMSPACE,
+                           self.bank_id(bank))
+        data = self.request(MEM_GET, body)
+        (length,) = struct.unpack_from('<H', data)
+        return data[2:2 + (length or 0x10000)]
+
+    def mem_set(self, start, data, bank='cpu', side_effects=False):
+        body = struct.pack('<BHHBH', side_effects, start, start + len(data) - 1,
+                           MAIN_MEMSPACE, self.bank_id(bank))
+        self.request(MEM_SET, body + bytes(data))
+
+    def snapshot(self, ranges=FULL_RANGE):
+        """Cached memory view for the current stop (reused until the next resume)."""
+        snap = self._snapshot
+        if snap is None or snap.epoch != self.epoch or snap.ranges != tuple(ranges):
+            snap = self._snapshot = Snapshot(self, ranges)
+        return snap
+
+    # -- checkpoints ------------------------------------------------------------------
+    def checkpoint_set(self, start, end=None, op=OP_EXEC, stop=True, temporary=False):
+        """Set a checkpoint; returns its id."""
+        body = struct.pack('<HHBBBBB', start, start if end is None else end, stop,
+                           True, op, temporary, MAIN_MEMSPACE)
+        return struct.unpack_from('<I', self.request(CHECKPOINT_SET, body))[0]
+
+    def checkpoint_delete(self, cp):
+        self.request(CHECKPOINT_DELETE, struct.pack('<I', cp))
+
+    # -- registers --------------------------------------------------------------------
+    def register_ids(self):
+        """{'PC': id, 'A': id, ...} for the main CPU."""
+        if self._registers is None:
+            data = self.request(REGISTERS_AVAILABLE, bytes([MAIN_MEMSPACE]))
+            (count,), pos, self._registers = struct.unpack_from('<H', data), 2, {}
+            for _ in range(count):
+                size, reg, _bits, nlen = struct.unpack_from('<BBBB', data, pos)
+                self._registers[data[pos + 4:pos + 4 + nlen].decode()] = reg
+                pos += size + 1
+        return self._registers
+
+    def registers(self):
+        """{'PC': value, 'A': value, ...}."""
+        names = {v: k for k, v in self.register_ids().items()}
+        data = self.request(REGISTERS_GET, bytes([MAIN_MEMSPACE]))
+        (count,), pos, regs = struct.unpack_from('<H', data), 2, {}
+        for _ in range(count):
+            size, reg, value = struct.unpack_from('<BBH', data, pos)
+            regs[names.get(reg, reg)] = value
+            pos += size + 1
+        return regs
+
+    def set_registers(self, **values):
+        ids = self.register_ids()
+        items = b''.join(struct.pack('<BBH', 3, ids[name], value)
+                         for name, value in values.items())
+        self.request(REGISTERS_SET, struct.pack('<BH', MAIN_MEMSPACE, len(values)) + items)
+
+    # -- snapshots ----------------------------------------------------------------------
+    def dump(self, path, save_roms=False, save_disks=False):
+        """Write a VICE snapshot (.vsf) of the whole machine."""
+        name = os.path.abspath(path).encode()
+        self.request(DUMP, struct.pack('<BBB', save_roms, save_disks, len(name)) + name)
+
+    def undump(self, path):
+        """Restore a snapshot; returns PC. The machine stays in the monitor."""
+        name = os.path.abspath(path).encode()
+        data = self.request(UNDUMP, bytes([len(name)]) + name)
+        self.running = False
+        self.epoch += 1
+        return struct.unpack_from('<H', data)[0]
+
+
+class Snapshot:
+    """Memory of a stopped machine, fetched one range per request on first use.
+
+    ranges are inclusive (start, end) pairs; reads outside them are
+    fetched exactly and cached too.
+    """
+
+    def __init__(self, mon, ranges=FULL_RANGE):
+        self.mon = mon
+        self.epoch = mon.epoch
+        self.ranges = tuple(ranges)
+        self.mem = bytearray(0x10000)
+        self.loaded = []               # inclusive (start, end) spans in self.mem
+
+    def _check(self):
+        if self.mon.epoch != self.epoch:
+            raise MonitorError("snapshot is stale (machine resumed since)")
+
+    def _covered(self, start, end):
+        return any(lo <= start and end <= hi for lo, hi in self.loaded)
+
+    def _ensure(self, start, end):
+        self._check()
+        if self._covered(start, end):
+            return
+        for lo, hi in self.ranges:
+            if lo <= end and start <= hi and not self._covered(max(lo, start), min(hi, end)):
+                self.mem[lo:hi + 1] = self.mon.mem_get(lo, hi)
+                self.loaded.append((lo, hi))
+        if not self._covered(start, end):
+            self.mem[start:end + 1] = self.mon.mem_get(start, end)
+            self.loaded.append((start, end))
+
+    def read(self, start, length):
+        """length bytes from start, as a memoryview into the cache."""
+        self._ensure(start, start + length - 1)
+        return memoryview(self.mem)[start:start + length]
+
+    def __getitem__(self, addr):
+        self._ensure(addr, addr)
+        return self.mem[addr]
+
+    def write(self, start, data):
+        """Write through to VICE. I/O reads back differently from what was
+        written, so a write there drops the cache instead of patching it."""
+        self._check()
+        self.mon.mem_set(start, data)
+        end = start + len(data) - 1
+        if start <= IO_RANGE[1] and IO_RANGE[0] <= end:
+            self.loaded = []
+        else:
+            self.mem[start:end + 1] = data
+
+
+def launch_vice(vice, prg=None, port=DEFAULT_PORT, warp=True, log=None, extra=()):
+    """Start x64sc with the binary monitor on 127.0.0.1:port; returns the Popen.
+
+    With prg None VICE just boots to BASIC, e.g. to undump a snapshot
+    without an autostart still typing RUN into the restored machine.
+    """
+    args = [vice]
+    if warp:
+        args.append('-warp')
+    args += ['-binarymonitor', '-binarymonitoraddress', f'127.0.0.1:{port}', *extra]
+    if prg:
+        args.append(prg)
+    return subprocess.Popen(args, stdout=log or subprocess.DEVNULL,
+                            stderr=log or subprocess.DEVNULL)
@@ -67,22 +67,8 @@ if [ ! -f "$GOLDEN" ]; then
 fi
 
 echo "[3/3] Comparing screenshot to golden..."
-RESULT=$(powershell.exe -NoProfile -Command "
-Add-Type -AssemblyName System.Drawing
-\$a = [System.Drawing.Bitmap]::FromFile((Resolve-Path '$GOLDEN'))
-\$b = [System.Drawing.Bitmap]::FromFile((Resolve-Path '$SCREENSHOT'))
-if (\$a.Width -ne \$b.Width -or \$a.Height -ne \$b.Height) {
-  Write-Output 'SIZE_MISMATCH'
-} else {
-  \$diff = 0
-  for (\$y = 0; \$y -lt \$a.Height; \$y++) {
-    for (\$x = 0; \$x -lt \$a.Width; \$x++) {
-      if (\$a.GetPixel(\$x,\$y) -ne \$b.GetPixel(\$x,\$y)) { \$diff++ }
-    }
-  }
-  Write-Output \"DIFF \$diff \$(\$a.Width * \$a.Height)\"
-}
-" 2>/dev/null | tr -d '\r')
+RESULT=$(python "$ROOT/scripts/image_diff.py" "$GOLDEN" "$SCREENSHOT" \
+  --heatmap "$ROOT/build/test_diff.png" --json "$ROOT/build/test_diff.json" 2>/dev/null)
 
 case "$RESULT" in
   "DIFF 0 "*)
@@ -2,14 +2,17 @@
 """
 test_interactive.py — Automated interactive test for C64 Block Tutor
 
-Uses VICE's text remote monitor (port 6510) with breakpoints to inject
-joystick/keyboard input AFTER input_read_joystick has already run, so
-writes to zp_joy_edge are not overwritten by the hardware poll.
+Uses VICE's binary remote monitor (port 6502, scripts/vice_binmon.py) with
+checkpoints to inject joystick/keyboard input AFTER input_read_joystick has
+already run, so writes to zp_joy_edge are not overwritten by the hardware
+poll. Every monitor call is one request/response; nothing sleeps.
 
 Strategy:
   - Breakpoint at state_palette / state_program / state_edit_param
   - When breakpoint fires (VICE pauses), write zp_joy_edge or zp_last_key
   - Continue; handler processes the input; next breakpoint verifies result
+  - Every case restores its fixture snapshot first (cached per PRG hash in
+    build/fixtures/) and runs on whichever of the -j VICE instances is free
 
 Tests:
   1.  Init state
@@ -22,14 +25,20 @@ Tests:
   8.  DEL key — removes block, shifts slot array
   9.  SHOW SPRITE codegen — $D015 bit 0 set, $D000/$D001 = X/Y
   10. LOOP BACK stop flag read/write
+  11. PRINT codegen — exact bytes in GEN_CODE_BUF
+  12. WAIT codegen — SEI prefix, outer loop count, CLI/RTS
+  13. LOOP BACK execution — stop flag injected at $5000
 
-Usage:   python test_interactive.py
-Env:     VICE=path/to/x64sc.exe   MONITOR_PORT=6510
+Usage:   python test_interactive.py [-j N] [--no-warp]
+Env:     VICE=path/to/x64sc.exe   MONITOR_PORT=6502 (first port; default auto)
 """
 
-import io, os, re, socket, subprocess, sys, time
+import argparse, hashlib, io, os, queue, re, shutil, socket, subprocess, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import kick_symbols
+from vice_binmon import BinaryMonitor, MonitorError, MonitorTimeout, launch_vice
 
-WARP = "--no-warp" not in sys.argv
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 
 # ── Config ────────────────────────────────────────────────────────────────────
@@ -44,90 +53,90 @@ def _find_vice():
 VICE    = _find_vice()
 ROOT    = os.path.dirname(os.path.abspath(__file__))
 PRG     = os.path.join(ROOT, "build", "main.prg")
-PORT    = int(os.environ.get("MONITOR_PORT", "6510"))
-LOGFILE = os.path.join(ROOT, "build", "test_interactive.log")
-
-# ZP addresses (from constants.asm)
-ZP_STATE      = 0x02;  ZP_PAL_CURSOR = 0x03;  ZP_PGM_CURSOR = 0x04
-ZP_SLOTS_USED = 0x05;  ZP_JOY_EDGE   = 0x08;  ZP_EDIT_VAL   = 0x09
-ZP_EDIT_SLOT  = 0x0A;  ZP_LAST_KEY   = 0x10;  ZP_STOP_FLAG  = 0x11
-
-# Hardware registers
-VIC_BORDER    = 0xD020   # border colour
-VIC_BG        = 0xD021   # background colour
-VIC_SPR_ENA   = 0xD015   # sprite enable bits
-VIC_SPR0_X    = 0xD000   # sprite 0 X
-VIC_SPR0_Y    = 0xD001   # sprite 0 Y
-VIC_SPR0_COL  = 0xD027   # sprite 0 colour
-SPRITE0_PTR   = 0x07F8   # sprite 0 data pointer ($2000/64 = 128)
-SPRITE0_DATA  = 0x2000   # sprite 0 bitmap (64 bytes)
+PORT    = int(os.environ.get("MONITOR_PORT", "0"))   # 0 = auto-allocate per worker
+SHARDS  = os.path.join(ROOT, "build", "test_shards")  # per-worker VICE logs
 
-SLOT_ARRAY    = 0x4000   # 16 slots x 3 bytes
-GEN_CODE_BUF  = 0x5000   # generated machine code buffer
+# Addresses and constants by name: build/main.sym plus the .label lines in
+# src/ (scripts/kick_symbols.py), cached in build/symbols.json until either
+# changes, so a rebuild that moves code needs no edits here
+SYMBOLS = kick_symbols.symbol_index()
 
-JOY_UP=0x01; JOY_DOWN=0x02; JOY_LEFT=0x04; JOY_RIGHT=0x08; JOY_FIRE=0x10
-STATE_PALETTE=0; STATE_PROGRAM=1; STATE_EDIT_PARAM=2; STATE_RUNNING=3
-
-# Addresses from build/main.sym
-MAIN_LOOP_ADDR       = 0x0880
-STATE_PALETTE_ADDR   = 0x08A9
-STATE_PROGRAM_ADDR   = 0x091F
-STATE_EDIT_ADDR      = 0x09AB
+def sym(name):
+    try:
+        return kick_symbols.lookup(SYMBOLS, name)
+    except KeyError as e:
+        sys.exit(f"symbol {e.args[0]} — build with -symbolfile and move main.sym to build/")
 
-PASS=0; FAIL=0
+# ZP addresses
+ZP_STATE      = sym("zp_state");       ZP_PAL_CURSOR = sym("zp_pal_cursor")
+ZP_PGM_CURSOR = sym("zp_pgm_cursor");  ZP_SLOTS_USED = sym("zp_slots_used")
+ZP_JOY_EDGE   = sym("zp_joy_edge");    ZP_EDIT_VAL   = sym("zp_edit_val")
+ZP_EDIT_SLOT  = sym("zp_edit_slot");   ZP_LAST_KEY   = sym("zp_last_key")
+ZP_STOP_FLAG  = sym("zp_stop_flag")
 
-def ok(msg):  global PASS; PASS+=1; print(f"  OK  {msg}")
-def err(msg): global FAIL; FAIL+=1; print(f"  ERR {msg}")
+# Hardware registers
+VIC_BORDER    = sym("VIC_BORDER")       # border colour
+VIC_BG        = sym("VIC_BG0")          # background colour
+VIC_SPR_ENA   = sym("VIC_SPR_ENA")      # sprite enable bits
+VIC_SPR0_X    = sym("VIC_SPR0_X")       # sprite 0 X
+VIC_SPR0_Y    = sym("VIC_SPR0_Y")       # sprite 0 Y
+VIC_SPR0_COL  = sym("VIC_SPR0_COLOR")   # sprite 0 colour
+SPRITE0_PTR   = sym("SPRITE0_PTR")      # sprite 0 data pointer ($2000/64 = 128)
+SPRITE0_DATA  = sym("sprite0_data")     # sprite 0 bitmap (64 bytes)
+
+SLOT_ARRAY    = sym("SLOT_ARRAY")       # 16 slots x 3 bytes
+GEN_CODE_BUF  = sym("GEN_CODE_BUF")     # generated machine code buffer
+
+JOY_UP    = sym("JOY_UP");    JOY_DOWN  = sym("JOY_DOWN");  JOY_LEFT = sym("JOY_LEFT")
+JOY_RIGHT = sym("JOY_RIGHT"); JOY_FIRE  = sym("JOY_FIRE")
+STATE_PALETTE    = sym("STATE_PALETTE");    STATE_PROGRAM = sym("STATE_PROGRAM")
+STATE_EDIT_PARAM = sym("STATE_EDIT_PARAM"); STATE_RUNNING = sym("STATE_RUNNING")
+
+# Code labels (only in build/main.sym)
+MAIN_LOOP_ADDR       = sym("Main.main_loop")
+STATE_PALETTE_ADDR   = sym("Main.state_palette")
+STATE_PROGRAM_ADDR   = sym("Main.state_program")
+STATE_EDIT_ADDR      = sym("Main.state_edit_param")
+
+# Checks record into the running case (one per worker thread); the runner
+# prints and totals them when the case finishes
+_case = threading.local()
+
+def ok(msg):  _case.passed += 1; _case.log.append(f"  OK  {msg}")
+def err(msg): _case.failed += 1; _case.log.append(f"  ERR {msg}")
 
 # ── Monitor comms ─────────────────────────────────────────────────────────────
+# Binary monitor (scripts/vice_binmon.py): each call is one request/response,
+# and breakpoints wait on VICE's STOPPED event — no sleeps or prompt polling.
+# Reads go through a Snapshot: the first read after a stop fetches all of
+# memory in one request, every other read until the next resume is cached.
 
-def connect(retries=30):
-    for _ in range(retries):
-        try:
-            s = socket.socket(); s.connect(("127.0.0.1", PORT)); s.settimeout(0.5)
-            time.sleep(0.4); _drain(s); return s
-        except (ConnectionRefusedError, OSError): time.sleep(0.4)
-    raise RuntimeError(f"Cannot connect to VICE monitor on port {PORT}")
-
-def _drain(s):
-    buf = b""
-    try:
-        while True: buf += s.recv(4096)
-    except socket.timeout: pass
-    return buf.decode(errors="replace")
-
-def _send(s, line): s.sendall((line+"\n").encode())
-
-def _wait_for_prompt(s, timeout=20):
-    buf = b""; deadline = time.time()+timeout; s.settimeout(0.3)
-    while time.time() < deadline:
-        try:
-            chunk = s.recv(4096)
-            if chunk: buf += chunk
-        except socket.timeout: pass
-        if re.search(rb"\(C:\$[0-9a-fA-F]{4}\)", buf): return buf.decode(errors="replace")
-    return buf.decode(errors="replace")
+def read_range(s, addr, length):
+    return bytes(s.snapshot().read(addr, length))
 
-def cmd(s, line, wait=0.15):
-    _send(s, line); time.sleep(wait); return _drain(s)
+def write_range(s, addr, data):
+    s.snapshot().write(addr, data)
 
 def read_byte(s, addr):
-    resp = cmd(s, f"m {addr:04x} {addr:04x}", wait=0.2)
-    m = re.search(rf"{addr:04x}\s+([0-9a-fA-F]{{2}})", resp, re.IGNORECASE)
-    return int(m.group(1), 16) if m else None
+    return s.snapshot()[addr]
 
-def write_byte(s, addr, val): cmd(s, f"> {addr:04x} {val:02x}", wait=0.1)
+def write_byte(s, addr, val):
+    write_range(s, addr, bytes([val]))
 
-def run_and_break(s, timeout=20):
-    _send(s, "g"); return _wait_for_prompt(s, timeout)
+def run_to(s, addr, timeout=20):
+    """Resume until PC reaches addr (VICE paused there); False on timeout."""
+    try:
+        s.run_until(addr, timeout)
+        return True
+    except MonitorTimeout:
+        err(f"timeout: ${addr:04x} not reached within {timeout}s")
+        return False
 
 # ── Input injection ───────────────────────────────────────────────────────────
 
-def at_state(s, handler_addr, joy_bit=None, last_key=None):
-    """Set breakpoint, run until handler fires (VICE paused), optionally inject input."""
-    cmd(s, f"bk {handler_addr:04x}", wait=0.05)
-    run_and_break(s)
-    cmd(s, "del", wait=0.05)
+def at_state(s, handler_addr, joy_bit=None, last_key=None, timeout_override=20):
+    """Run until handler fires (VICE paused), optionally inject input."""
+    run_to(s, handler_addr, timeout_override)
     if joy_bit  is not None: write_byte(s, ZP_JOY_EDGE, joy_bit)
     if last_key is not None: write_byte(s, ZP_LAST_KEY, last_key)
 
@@ -166,23 +175,125 @@ def run_program(s):
     # Use a generous timeout — WAIT blocks need real time in warp
     at_state(s, STATE_PALETTE_ADDR, timeout_override=30)
 
-def at_state(s, handler_addr, joy_bit=None, last_key=None, timeout_override=20):
-    cmd(s, f"bk {handler_addr:04x}", wait=0.05)
-    run_and_break(s, timeout=timeout_override)
-    cmd(s, "del", wait=0.05)
-    if joy_bit  is not None: write_byte(s, ZP_JOY_EDGE, joy_bit)
-    if last_key is not None: write_byte(s, ZP_LAST_KEY, last_key)
+# ── Fixtures ──────────────────────────────────────────────────────────────────
+# Named machine states, each built once from its parent by a few presses and
+# saved as a VICE snapshot in build/fixtures/<PRG hash>/<name>.vsf. Every
+# fixture ends with VICE paused at state_palette. Runs restore them with one
+# undump; a new PRG gets a new hash directory (old ones are pruned).
+# A build that logs an error or ends in the wrong state raises FixtureError
+# and is not saved, so a bad snapshot can't outlive the run that made it.
+# After editing FIXTURES, run once with --refresh-fixtures.
+
+class FixtureError(Exception):
+    """A fixture build failed; nothing was saved."""
+
+def blocks(*indices):
+    """Fixture setup: add palette blocks in order."""
+    def setup(s):
+        for i in indices: add_block_at_cursor(s, i)
+    setup.indices = indices
+    return setup
+
+# name: (parent, setup) — "booted" is the root, built by Fixtures.boot
+FIXTURES = {
+    "booted":       (None, None),                 # palette, empty program, cursor 0
+    "border_block": ("booted", blocks(0)),
+    "bg_block":     ("booted", blocks(1)),
+    "sprite_block": ("booted", blocks(3)),
+    "print_block":  ("booted", blocks(2)),
+    "wait_block":   ("booted", blocks(4)),
+    "three_blocks": ("booted", blocks(0, 1, 2)),
+    "border_loop":  ("border_block", blocks(5)),
+}
+
+def fixture_state(name):
+    """(zp_state, zp_slots_used, zp_pal_cursor) fixture `name` must end in."""
+    used, cursor = 0, None
+    while name != "booted":
+        name, setup = FIXTURES[name]
+        used += len(setup.indices)
+        if cursor is None: cursor = setup.indices[-1]
+    return STATE_PALETTE, used, cursor or 0
+
+def fixture(name):
+    """Case decorator: start the case from fixture `name` (default "booted")."""
+    assert name in FIXTURES, name
+    def mark(case):
+        case.fixture = name
+        return case
+    return mark
+
+def prg_hash(path=PRG):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+class Fixtures:
+    """Snapshot cache shared by all workers; builds are serialised per name."""
+
+    def __init__(self, refresh=False):
+        root = os.path.join(ROOT, "build", "fixtures")
+        self.dir = os.path.join(root, prg_hash())
+        if refresh: shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+        for old in os.listdir(root):
+            if os.path.join(root, old) != self.dir:
+                shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        self.locks = {name: threading.Lock() for name in FIXTURES}
+        self.built = []
+
+    def path(self, name):
+        return os.path.join(self.dir, f"{name}.vsf")
+
+    def _save(self, s, name):
+        """Dump fixture `name` once VICE is in the state it promises."""
+        got = (read_byte(s, ZP_STATE), read_byte(s, ZP_SLOTS_USED),
+               read_byte(s, ZP_PAL_CURSOR))
+        if got != fixture_state(name):
+            raise FixtureError(f"fixture {name}: state/slots_used/pal_cursor = {got}, "
+                               f"expected {fixture_state(name)}")
+        tmp = self.path(name) + f".{threading.get_ident()}.tmp"
+        s.dump(tmp)
+        os.replace(tmp, self.path(name))
+        self.built.append(name)
+
+    def launch(self, port, warp, log):
+        """Start a VICE for a worker; autostarts the PRG only if "booted"
+        still has to be captured (returns (proc, monitor)). Only that
+        capture is serialised; with the snapshot cached, workers boot
+        their VICEs in parallel."""
+        if not os.path.exists(self.path("booted")):
+            with self.locks["booted"]:
+                if not os.path.exists(self.path("booted")):
+                    proc = launch_vice(VICE, PRG, port, warp, log)
+                    s = BinaryMonitor.connect(port=port)
+                    s.run_until(MAIN_LOOP_ADDR)
+                    s.run_until(STATE_PALETTE_ADDR)
+                    self._save(s, "booted")
+                    return proc, s
+        proc = launch_vice(VICE, None, port, warp, log)
+        return proc, BinaryMonitor.connect(port=port)
+
+    def restore(self, s, name):
+        """Undump fixture `name`, building it (and its parents) if missing."""
+        with self.locks[name]:
+            if not os.path.exists(self.path(name)):
+                parent, setup = FIXTURES[name]
+                self.restore(s, parent)
+                failed = _case.failed
+                setup(s)
+                if _case.failed > failed:
+                    raise FixtureError(f"fixture {name}: setup failed, not saved")
+                self._save(s, name)
+                return
+        s.undump(self.path(name))
 
 # ── Tests ─────────────────────────────────────────────────────────────────────
+# Each case starts from its fixture (default "booted") and shares no state.
 
-def run_tests(s):
-
-    # ── 1. Init ───────────────────────────────────────────────────────────────
-    print("\n[1] Init...")
-    cmd(s, f"bk {MAIN_LOOP_ADDR:04x}", wait=0.05)
-    run_and_break(s, timeout=20); cmd(s, "del", wait=0.05)
-    at_state(s, STATE_PALETTE_ADDR)   # advance to first handler entry
+# ── 1. Init ───────────────────────────────────────────────────────────────────
 
+def case_init(s):
+    """Init"""
     st = read_byte(s, ZP_STATE); pal = read_byte(s, ZP_PAL_CURSOR)
     used = read_byte(s, ZP_SLOTS_USED)
     if st == STATE_PALETTE: ok(f"init: state=PALETTE({st})")
@@ -190,8 +301,10 @@ def run_tests(s):
     if pal == 0 and used == 0: ok(f"init: pal_cursor={pal} slots_used={used}")
     else: err(f"init: pal_cursor={pal} slots_used={used}")
 
-    # ── 2. Palette cursor ─────────────────────────────────────────────────────
-    print("\n[2] Palette cursor...")
+# ── 2. Palette cursor ─────────────────────────────────────────────────────────
+
+def case_palette_cursor(s):
+    """Palette cursor"""
     palette_press(s, JOY_DOWN)
     pal = read_byte(s, ZP_PAL_CURSOR)
     if pal == 1: ok(f"DOWN: pal_cursor={pal}")
@@ -207,11 +320,10 @@ def run_tests(s):
     if pal == 1: ok(f"UP: pal_cursor={pal}")
     else: err(f"UP: pal_cursor={pal} (expected 1)")
 
-    # back to top
-    palette_press(s, JOY_UP)
+# ── 3. Add blocks ─────────────────────────────────────────────────────────────
 
-    # ── 3. Add blocks ─────────────────────────────────────────────────────────
-    print("\n[3] Add blocks (FIRE)...")
+def case_add_blocks(s):
+    """Add blocks"""
     palette_press(s, JOY_FIRE)   # add SET BORDER (block 0)
     used = read_byte(s, ZP_SLOTS_USED)
     if used == 1: ok(f"FIRE adds block: slots_used={used}")
@@ -222,8 +334,10 @@ def run_tests(s):
     if used == 2: ok(f"second block: slots_used={used}")
     else: err(f"second add: slots_used={used}")
 
-    # ── 4. Panel switch ───────────────────────────────────────────────────────
-    print("\n[4] Panel switch...")
+# ── 4. Panel switch ───────────────────────────────────────────────────────────
+
+def case_panel_switch(s):
+    """Panel switch"""
     palette_press(s, JOY_RIGHT)
     at_state(s, STATE_PROGRAM_ADDR)   # now in program panel
     st = read_byte(s, ZP_STATE)
@@ -236,12 +350,11 @@ def run_tests(s):
     if st == STATE_PALETTE: ok(f"LEFT -> palette: state={st}")
     else: err(f"LEFT failed: state={st}")
 
-    # ── 5. Codegen: SET BORDER changes $D020 ─────────────────────────────────
-    print("\n[5] Codegen: SET BORDER ($D020)...")
-    clear_all_blocks(s)
+# ── 5. Codegen: SET BORDER changes $D020 ──────────────────────────────────────
 
-    # Add SET BORDER (block 0, default param = color 0 = BLACK)
-    add_block_at_cursor(s, 0)    # ensure cursor=0, add SET BORDER
+@fixture("border_block")         # SET BORDER, default param = color 0 = BLACK
+def case_set_border(s):
+    """Codegen: SET BORDER changes $D020"""
     used = read_byte(s, ZP_SLOTS_USED)
     if used != 1: err(f"setup: slots_used={used} (expected 1)"); return
 
@@ -259,12 +372,11 @@ def run_tests(s):
     else:
         err(f"SET BORDER: $D020={border_after:#04x} (expected color 0=black, got {border_after & 0x0F})")
 
-    # ── 6. Codegen: SET BG changes $D021 ─────────────────────────────────────
-    print("\n[6] Codegen: SET BG ($D021)...")
-    clear_all_blocks(s)
+# ── 6. Codegen: SET BG changes $D021 ──────────────────────────────────────────
 
-    # Navigate to SET BG (block 1)
-    add_block_at_cursor(s, 1)   # block 1 = SET BG, default = 5 (green)
+@fixture("bg_block")             # block 1 = SET BG, default = 5 (green)
+def case_set_bg(s):
+    """Codegen: SET BG changes $D021"""
     used = read_byte(s, ZP_SLOTS_USED)
     if used != 1: err(f"setup: slots_used={used}"); return
 
@@ -279,13 +391,11 @@ def run_tests(s):
     else:
         err(f"SET BG: $D021={bg_after:#04x} (expected color 5=green, got {bg_after & 0x0F})")
 
-    # ── 7. Param editor ───────────────────────────────────────────────────────
-    print("\n[7] Param editor...")
-    clear_all_blocks(s)
-
-    # Add SET BORDER (block 0, default color=0=black)
-    add_block_at_cursor(s, 0)    # ensure cursor=0 before FIRE
+# ── 7. Param editor ───────────────────────────────────────────────────────────
 
+@fixture("border_block")         # SET BORDER, default color=0=black
+def case_param_editor(s):
+    """Param editor"""
     # Switch to program panel
     palette_press(s, JOY_RIGHT)
     at_state(s, STATE_PROGRAM_ADDR)
@@ -345,15 +455,11 @@ def run_tests(s):
     else:
         err(f"run with edited param: $D020={border:#04x} (expected color {slot0_param})")
 
-    # ── 8. DEL removes block ──────────────────────────────────────────────────
-    print("\n[8] DEL removes block...")
-    clear_all_blocks(s)
-
-    # Add 3 blocks: SET BORDER(0), SET BG(1), PRINT(2)
-    add_block_at_cursor(s, 0)    # slot 0: SET BORDER (explicit cursor=0)
-    add_block_at_cursor(s, 1)    # slot 1: SET BG
-    add_block_at_cursor(s, 2)    # slot 2: PRINT
+# ── 8. DEL removes block ──────────────────────────────────────────────────────
 
+@fixture("three_blocks")         # SET BORDER(0), SET BG(1), PRINT(2)
+def case_del(s):
+    """DEL removes block"""
     used = read_byte(s, ZP_SLOTS_USED)
     if used == 3: ok(f"setup: 3 blocks added")
     else: err(f"setup: slots_used={used} (expected 3)")
@@ -373,8 +479,9 @@ def run_tests(s):
     at_state(s, STATE_PROGRAM_ADDR)
 
     used = read_byte(s, ZP_SLOTS_USED)
-    slot0_type = read_byte(s, SLOT_ARRAY)       # should still be SET BORDER (0)
-    slot1_type = read_byte(s, SLOT_ARRAY + 3)   # should now be PRINT (2, shifted down)
+    slots = read_range(s, SLOT_ARRAY, 6)
+    slot0_type = slots[0]   # should still be SET BORDER (0)
+    slot1_type = slots[3]   # should now be PRINT (2, shifted down)
     if used == 2: ok(f"DEL: slots_used={used}")
     else: err(f"DEL: slots_used={used} (expected 2)")
     if slot0_type == 0: ok(f"DEL: slot 0 still SET BORDER ({slot0_type})")
@@ -382,22 +489,17 @@ def run_tests(s):
     if slot1_type == 2: ok(f"DEL: slot 1 shifted to PRINT ({slot1_type})")
     else: err(f"DEL: slot 1 type={slot1_type} (expected 2=PRINT)")
 
-    # ── 9. SHOW SPRITE sets $D015/$D000/$D001 ────────────────────────────────
-    print("\n[9] SHOW SPRITE codegen...")
-    # Switch back to palette first
-    at_state(s, STATE_PROGRAM_ADDR, joy_bit=JOY_LEFT)
-    at_state(s, STATE_PALETTE_ADDR)
-    clear_all_blocks(s)
+# ── 9. SHOW SPRITE sets $D015/$D000/$D001 ─────────────────────────────────────
 
-    # Navigate to SHOW SPRITE (block 3)
-    add_block_at_cursor(s, 3)
+@fixture("sprite_block")         # block 3 = SHOW SPRITE
+def case_show_sprite(s):
+    """SHOW SPRITE sets $D015/$D000/$D001"""
     used = read_byte(s, ZP_SLOTS_USED)
     if used != 1: err(f"setup: slots_used={used}"); return
 
     # Clear sprite registers first
     write_byte(s, VIC_SPR_ENA, 0x00)
-    write_byte(s, VIC_SPR0_X, 0x00)
-    write_byte(s, VIC_SPR0_Y, 0x00)
+    write_range(s, VIC_SPR0_X, bytes([0x00, 0x00]))   # X, Y
 
     write_byte(s, ZP_LAST_KEY, 0x85)   # F1
     at_state(s, STATE_PALETTE_ADDR, timeout_override=15)
@@ -423,14 +525,16 @@ def run_tests(s):
     else: err(f"SHOW SPRITE: $D027={spr_col:#04x} (expected colour 14=light blue)")
 
     # Spot-check bitmap at $2000 — row 0 is head top: %00000000 %00111100 %00000000
-    bm = [read_byte(s, SPRITE0_DATA + i) for i in range(3)]
+    bm = list(read_range(s, SPRITE0_DATA, 3))
     if bm == [0x00, 0x3C, 0x00]:
         ok(f"SPRITE bitmap row 0: {' '.join(f'{b:02x}' for b in bm)} (head top)")
     else:
         err(f"SPRITE bitmap row 0: {' '.join(f'{b:02x}' for b in bm)} (expected 00 3c 00)")
 
-    # ── 10. LOOP BACK stop flag ───────────────────────────────────────────────
-    print("\n[10] LOOP BACK stop flag...")
+# ── 10. LOOP BACK stop flag ───────────────────────────────────────────────────
+
+def case_stop_flag(s):
+    """LOOP BACK stop flag"""
     write_byte(s, ZP_STOP_FLAG, 0xFF)
     val = read_byte(s, ZP_STOP_FLAG)
     if val == 0xFF: ok(f"stop flag set: {val:#04x}")
@@ -440,27 +544,27 @@ def run_tests(s):
     if val == 0x00: ok(f"stop flag cleared: {val:#04x}")
     else: err(f"stop flag clear failed: {val}")
 
-    # ── 11. PRINT codegen ────────────────────────────────────────────────────
-    print("\n[11] PRINT codegen...")
-    clear_all_blocks(s)
-    add_block_at_cursor(s, 2)   # block 2 = PRINT, default char $48 = 'H' PETSCII
+# ── 11. PRINT codegen ─────────────────────────────────────────────────────────
 
+@fixture("print_block")          # block 2 = PRINT, default char $48 = 'H' PETSCII
+def case_print(s):
+    """PRINT codegen"""
     write_byte(s, ZP_LAST_KEY, 0x85)   # F1
     at_state(s, STATE_PALETTE_ADDR, timeout_override=10)
 
     # Expected: SEI, LDA #$48, JSR $FFD2, CLI, RTS
     expected = [0x78, 0xA9, 0x48, 0x20, 0xD2, 0xFF, 0x58, 0x60]
-    actual   = [read_byte(s, GEN_CODE_BUF + i) for i in range(8)]
+    actual   = list(read_range(s, GEN_CODE_BUF, 8))
     if actual == expected:
         ok(f"PRINT codegen: {' '.join(f'{b:02x}' for b in actual)}")
     else:
         err(f"PRINT codegen: got {' '.join(f'{b:02x}' for b in actual)}, expected {' '.join(f'{b:02x}' for b in expected)}")
 
-    # ── 12. WAIT codegen ─────────────────────────────────────────────────────
-    print("\n[12] WAIT codegen...")
-    clear_all_blocks(s)
-    add_block_at_cursor(s, 4)   # block 4 = WAIT, default n=2
+# ── 12. WAIT codegen ──────────────────────────────────────────────────────────
 
+@fixture("wait_block")           # block 4 = WAIT, default n=2
+def case_wait(s):
+    """WAIT codegen"""
     write_byte(s, ZP_LAST_KEY, 0x85)   # F1 (warp: 2s wait completes immediately)
     at_state(s, STATE_PALETTE_ADDR, timeout_override=15)
 
@@ -468,7 +572,7 @@ def run_tests(s):
     # Layout: [0]=SEI [1..20]=WAIT(n=2) [21]=CLI [22]=RTS
     # Wait code: A9 00 85 FE A9 <outer_hi> 85 FF A2 FF CA D0 FD C6 FE D0 F7 C6 FF D0 F3
     # outer_hi = n*3 = 2*3 = 6 → at offset 6
-    gen = [read_byte(s, GEN_CODE_BUF + i) for i in range(24)]
+    gen = read_range(s, GEN_CODE_BUF, 24)
     if gen[0] == 0x78: ok(f"WAIT codegen: SEI at $5000 ({gen[0]:#04x})")
     else: err(f"WAIT codegen: expected SEI(0x78) at $5000, got {gen[0]:#04x}")
     if gen[6] == 0x06: ok(f"WAIT codegen: outer_hi=6 for n=2 ({gen[6]:#04x})")
@@ -479,17 +583,14 @@ def run_tests(s):
     else:
         err(f"WAIT codegen: expected CLI($58)/RTS($60) at end, got {gen[22]:#04x} {gen[23]:#04x}")
 
-    # ── 13. LOOP BACK execution ───────────────────────────────────────────────
-    print("\n[13] LOOP BACK execution...")
-    clear_all_blocks(s)
-    add_block_at_cursor(s, 0)   # SET BORDER (default color=0)
-    add_block_at_cursor(s, 5)   # LOOP BACK
+# ── 13. LOOP BACK execution ───────────────────────────────────────────────────
 
+@fixture("border_loop")          # SET BORDER (default color=0), LOOP BACK
+def case_loop_back(s):
+    """LOOP BACK execution"""
     # Break at $5000 — do_run clears stop_flag first, then JSR $5000
-    cmd(s, f"bk {GEN_CODE_BUF:04x}", wait=0.05)
     write_byte(s, ZP_LAST_KEY, 0x85)   # F1
-    run_and_break(s, timeout=10)        # pauses at $5000 (stop_flag is now 0)
-    cmd(s, "del", wait=0.05)
+    run_to(s, GEN_CODE_BUF, timeout=10)  # pauses at $5000 (stop_flag is now 0)
 
     # Inject stop flag — LOOP BACK will see it and exit instead of looping
     write_byte(s, ZP_STOP_FLAG, 0xFF)
@@ -504,28 +605,109 @@ def run_tests(s):
     if border & 0x0F == 0: ok(f"LOOP BACK: SET BORDER ran ($D020={border:#04x} → color 0)")
     else: err(f"LOOP BACK: $D020={border:#04x} (expected color 0, SET BORDER should have run)")
 
+CASES = [
+    case_init,
+    case_palette_cursor,
+    case_add_blocks,
+    case_panel_switch,
+    case_set_border,
+    case_set_bg,
+    case_param_editor,
+    case_del,
+    case_show_sprite,
+    case_stop_flag,
+    case_print,
+    case_wait,
+    case_loop_back,
+]
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+# N workers, each owning one VICE on its own port, pull cases off a shared
+# queue. Before every case the worker restores the case's fixture, so a
+# failing case can't leak state into the next.
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class Worker(threading.Thread):
+    def __init__(self, index, cases, results, fixtures, warp, lock):
+        super().__init__(daemon=True)
+        self.index, self.cases, self.results = index, cases, results
+        self.fixtures, self.warp, self.lock = fixtures, warp, lock
+        self.proc = self.mon = None
+
+    def boot(self):
+        port = PORT + self.index if PORT else free_port()
+        with open(os.path.join(SHARDS, f"vice_{self.index}.log"), "w") as log:
+            self.proc, self.mon = self.fixtures.launch(port, self.warp, log)
+
+    def shutdown(self):
+        if self.mon:
+            self.mon.quit(); self.mon.close()
+        if self.proc:
+            self.proc.terminate()
+            try: self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired: self.proc.kill()
+        self.proc = self.mon = None
+
+    def run_case(self, case):
+        _case.passed = _case.failed = 0; _case.log = []
+        t0 = time.monotonic()
+        try:
+            if self.mon is None: self.boot()
+            self.fixtures.restore(self.mon, getattr(case, "fixture", "booted"))
+            case(self.mon)
+        except (MonitorError, OSError, FixtureError) as e:
+            err(f"aborted: {e}")
+            self.shutdown()          # next case gets a fresh VICE
+        return _case.passed, _case.failed, _case.log, time.monotonic() - t0
+
+    def run(self):
+        try:
+            while True:
+                try: num, case = self.cases.get_nowait()
+                except queue.Empty: return
+                passed, failed, log, secs = self.run_case(case)
+                self.results[num] = (passed, failed)
+                with self.lock:
+                    print(f"\n[{num}] {case.__doc__}... (worker {self.index}, {secs:.1f}s)")
+                    print("\n".join(log))
+        finally:
+            self.shutdown()
+
 # ── Main ──────────────────────────────────────────────────────────────────────
 
 def main():
-    print(f"VICE:  {VICE}\nPRG:   {PRG}\n")
-    with open(LOGFILE, "w") as log:
-        vice_args = [VICE]
-        if WARP:
-            vice_args.append("-warp")
-        vice_args += ["-remotemonitor", "-remotemonitoraddress", f"127.0.0.1:{PORT}", PRG]
-        proc = subprocess.Popen(vice_args, stdout=log, stderr=log)
-    try:
-        print("Connecting to VICE remote monitor...")
-        s = connect()
-        print(f"Connected on port {PORT}\n")
-        run_tests(s)
-        s.close()
-    finally:
-        proc.terminate()
-        try: proc.wait(timeout=5)
-        except subprocess.TimeoutExpired: proc.kill()
-
-    print()
+    parser = argparse.ArgumentParser(description="Interactive VICE test suite.")
+    parser.add_argument("--no-warp", dest="warp", action="store_false",
+                        help="real C64 speed (use with run_and_record.sh); implies -j 1")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="VICE instances in parallel (default: one per core, max one per case)")
+    parser.add_argument("--refresh-fixtures", action="store_true",
+                        help="rebuild the build/fixtures snapshots for this PRG")
+    args = parser.parse_args()
+    jobs = 1 if not args.warp else args.jobs or min(os.cpu_count() or 1, len(CASES))
+
+    print(f"VICE:  {VICE}\nPRG:   {PRG}\nJobs:  {jobs}")
+    os.makedirs(SHARDS, exist_ok=True)
+    t0 = time.monotonic()
+    fixtures = Fixtures(args.refresh_fixtures)
+    cases = queue.Queue()
+    for num, case in enumerate(CASES, 1):
+        cases.put((num, case))
+    results, lock = {}, threading.Lock()
+    workers = [Worker(i, cases, results, fixtures, args.warp, lock) for i in range(jobs)]
+    for w in workers: w.start()
+    for w in workers: w.join()
+
+    missing = [num for num in range(1, len(CASES) + 1) if num not in results]
+    PASS = sum(p for p, _ in results.values())
+    FAIL = sum(f for _, f in results.values()) + len(missing)
+    if missing: print(f"\nnot run: {', '.join(map(str, missing))}")
+    if fixtures.built: print(f"\nfixtures built: {', '.join(fixtures.built)} -> {fixtures.dir}")
+    print(f"\n{time.monotonic() - t0:.1f}s")
     total = PASS + FAIL
     if FAIL == 0: print(f"PASS  ({PASS}/{total} checks)"); sys.exit(0)
     else: print(f"FAIL  ({FAIL} error(s), {PASS}/{total} passed)"); sys.exit(1)